@@ -14,6 +14,9 @@ from app.core.security import api_key_matches, decode_access_token
 from app.models.knowledge_base import KnowledgeBase
 from app.models.knowledge_base_member import KnowledgeBaseMember
 from app.models.user import User
+from app.services.answer_cache import AnswerCache, get_shared_answer_cache
+from app.services.embedding_cache import QueryEmbeddingCache, get_shared_query_embedding_cache
+from app.services.vector_store_service import VectorStoreService, get_shared_vector_store
 
 
 ROLE_ORDER = {"viewer": 1, "member": 2, "admin": 3, "owner": 4}
@@ -29,6 +32,18 @@ def get_db() -> Generator[Session, None, None]:
     yield from get_db_session(settings)
 
 
+def get_vector_store() -> VectorStoreService:
+    return get_shared_vector_store(get_settings())
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    return get_shared_query_embedding_cache(get_settings())
+
+
+def get_answer_cache() -> AnswerCache:
+    return get_shared_answer_cache(get_settings())
+
+
 http_bearer = HTTPBearer(auto_error=False)
 
 
@@ -3,7 +3,7 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_settings, require_auth, require_kb_access
+from app.api.deps import get_db, get_settings, get_vector_store, require_auth, require_kb_access
 from app.models.user import User
 from app.repositories.chunk_repository import ChunkRepository
 from app.repositories.document_repository import DocumentRepository
@@ -22,12 +22,14 @@ router = APIRouter(
 )
 
 
-def get_service(db: Session = Depends(get_db)) -> DocumentService:
+def get_service(
+    db: Session = Depends(get_db),
+    vector_store: VectorStoreService = Depends(get_vector_store),
+) -> DocumentService:
     settings = get_settings()
     doc_repo = DocumentRepository(db)
     kb_repo = KnowledgeBaseRepository(db)
     chunk_repo = ChunkRepository(db)
-    vector_store = VectorStoreService(settings)
     return DocumentService(doc_repo, kb_repo, chunk_repo, vector_store, settings)
 
 
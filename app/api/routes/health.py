@@ -1,5 +1,15 @@
 from fastapi import APIRouter
 
+from app.core.database import get_pool_stats
+from app.services.answer_cache import get_answer_cache_stats
+from app.services.embedding_batcher import get_embedding_batch_stats
+from app.services.embedding_cache import get_query_embedding_cache_stats
+from app.services.embedding_dispatcher import get_embedding_dispatcher_stats
+from app.services.extraction_pool import get_extraction_pool_stats
+from app.services.ingestion_pipeline import get_ingestion_pipeline_stats
+from app.services.openai_service import get_openai_client_stats
+from app.services.vector_store_service import get_vector_store_stats
+
 
 router = APIRouter()
 
@@ -12,3 +22,18 @@ def root() -> dict[str, str]:
 @router.get("/health")
 def health() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/metrics")
+def metrics() -> dict[str, dict]:
+    return {
+        "db_pool": get_pool_stats(),
+        "vector_store": get_vector_store_stats(),
+        "openai_http": get_openai_client_stats(),
+        "query_embedding_cache": get_query_embedding_cache_stats(),
+        "answer_cache": get_answer_cache_stats(),
+        "ingestion_pipeline": get_ingestion_pipeline_stats(),
+        "embedding_batches": get_embedding_batch_stats(),
+        "embedding_dispatcher": get_embedding_dispatcher_stats(),
+        "extraction_pool": get_extraction_pool_stats(),
+    }
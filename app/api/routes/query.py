@@ -1,13 +1,28 @@
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+import json
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_settings, require_auth, require_kb_access
+from app.api.deps import (
+    get_answer_cache,
+    get_db,
+    get_query_embedding_cache,
+    get_settings,
+    get_vector_store,
+    require_auth,
+    require_kb_access,
+)
 from app.models.knowledge_base import KnowledgeBase
 from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
 from app.repositories.query_log_repository import QueryLogRepository
 from app.schemas.query import QueryRequest, QueryResponse
+from app.services.answer_cache import AnswerCache
+from app.services.embedding_cache import QueryEmbeddingCache
 from app.services.openai_service import OpenAIService
 from app.services.rag_service import RagService
 from app.services.vector_store_service import VectorStoreService
@@ -21,27 +36,61 @@ router = APIRouter(
 )
 
 
-def get_service(db: Session = Depends(get_db)) -> RagService:
+def get_service(
+    db: Session = Depends(get_db),
+    vector_store: VectorStoreService = Depends(get_vector_store),
+    embedding_cache: QueryEmbeddingCache = Depends(get_query_embedding_cache),
+    answer_cache: AnswerCache = Depends(get_answer_cache),
+) -> RagService:
     settings = get_settings()
     kb_repo = KnowledgeBaseRepository(db)
     query_log_repo = QueryLogRepository(db)
     openai = OpenAIService(settings)
-    vector_store = VectorStoreService(settings)
-    return RagService(settings, kb_repo, openai, vector_store, query_log_repo)
+    return RagService(settings, kb_repo, openai, vector_store, query_log_repo, embedding_cache, answer_cache)
 
 
 @router.post("/query", response_model=QueryResponse)
-def query_knowledge_base(
+async def query_knowledge_base(
     knowledge_base_id: UUID,
     payload: QueryRequest,
     db: Session = Depends(get_db),
     current_user: User | None = Depends(require_auth),
     service: RagService = Depends(get_service),
 ) -> QueryResponse:
-    require_kb_access(knowledge_base_id, db, current_user, "viewer")
+    await run_in_threadpool(require_kb_access, knowledge_base_id, db, current_user, "viewer")
 
     try:
         user_id = current_user.id if current_user else None
-        return service.query(str(knowledge_base_id), payload, user_id=user_id)
+        return await service.aquery(str(knowledge_base_id), payload, user_id=user_id)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def format_sse(event: str, data) -> str:
+    if event == "sources":
+        data = [source.model_dump() for source in data]
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/query/stream")
+async def stream_query_knowledge_base(
+    knowledge_base_id: UUID,
+    payload: QueryRequest,
+    db: Session = Depends(get_db),
+    current_user: User | None = Depends(require_auth),
+    service: RagService = Depends(get_service),
+) -> StreamingResponse:
+    await run_in_threadpool(require_kb_access, knowledge_base_id, db, current_user, "viewer")
+    user_id = current_user.id if current_user else None
+
+    async def events() -> AsyncIterator[str]:
+        # aclosing: on disconnect the service stream is closed right away, so its query log is written.
+        async with aclosing(service.astream_query(str(knowledge_base_id), payload, user_id=user_id)) as stream:
+            async for event, data in stream:
+                yield format_sse(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
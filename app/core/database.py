@@ -1,19 +1,153 @@
 from collections.abc import Generator
+import threading
+import time
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from app.core.config import Settings
 
 
-def get_engine(settings: Settings | None = None):
-    resolved = settings or Settings()
-    return create_engine(resolved.database_url, pool_pre_ping=True)
+class PoolMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
 
+    def reset(self) -> None:
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.wait_ms_total = 0.0
+            self.wait_ms_max = 0.0
 
-def get_session_factory(settings: Settings | None = None):
-    engine = get_engine(settings)
-    return sessionmaker(bind=engine, autoflush=False, autocommit=False, class_=Session)
+    def record_wait(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            if timed_out:
+                self.timeouts += 1
+
+    def increment(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_ms_total": round(self.wait_ms_total, 3),
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        # Time spent here is the wait for a free (or newly opened) connection.
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            pool_metrics.record_wait((time.perf_counter() - started) * 1000, timed_out=timed_out)
+
+
+_engine: Engine | None = None
+_session_factory: sessionmaker | None = None
+_lock = threading.Lock()
+
+
+def _register_pool_events(engine: Engine) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        pool_metrics.increment("connects")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        pool_metrics.increment("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record) -> None:
+        pool_metrics.increment("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception) -> None:
+        pool_metrics.increment("invalidations")
+
+
+def create_db_engine(settings: Settings) -> Engine:
+    engine = create_engine(
+        settings.database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_pre_ping=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_timeout=settings.db_pool_timeout_seconds,
+    )
+    _register_pool_events(engine)
+    return engine
+
+
+def init_engine(settings: Settings | None = None) -> Engine:
+    global _engine, _session_factory
+    with _lock:
+        if _engine is None:
+            _engine = create_db_engine(settings or Settings())
+            _session_factory = sessionmaker(bind=_engine, autoflush=False, autocommit=False, class_=Session)
+        return _engine
+
+
+def dispose_engine() -> None:
+    global _engine, _session_factory
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _session_factory = None
+
+
+def get_engine(settings: Settings | None = None) -> Engine:
+    # One engine (and connection pool) per process; settings only apply on first use.
+    if _engine is None:
+        return init_engine(settings)
+    return _engine
+
+
+def get_session_factory(settings: Settings | None = None) -> sessionmaker:
+    if _session_factory is None:
+        init_engine(settings)
+    return _session_factory
+
+
+def get_pool_stats() -> dict:
+    stats = pool_metrics.snapshot()
+    engine = _engine
+    if engine is not None and isinstance(engine.pool, QueuePool):
+        stats.update(
+            {
+                "size": engine.pool.size(),
+                "checked_out": engine.pool.checkedout(),
+                "overflow": engine.pool.overflow(),
+                "checked_in": engine.pool.checkedin(),
+            }
+        )
+    return stats
 
 
 def get_db_session(settings: Settings | None = None) -> Generator[Session, None, None]:
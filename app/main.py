@@ -1,3 +1,6 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -12,6 +15,10 @@ from app.api.routes.messages import router as messages_router
 from app.api.routes.analytics import router as analytics_router
 from app.api.routes.members import router as members_router
 from app.core.config import Settings
+from app.core.database import dispose_engine, init_engine
+from app.services.embedding_dispatcher import close_embedding_dispatcher
+from app.services.openai_service import aclose_openai_clients, init_async_openai_client, init_openai_client
+from app.services.vector_store_service import close_vector_store, init_vector_store
 from app.core.logging import configure_logging
 
 from alembic import command
@@ -34,9 +41,25 @@ def run_migrations() -> None:
     command.upgrade(config, "head")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    settings = Settings()
+    init_engine(settings)
+    init_vector_store(settings)
+    init_openai_client(settings)
+    init_async_openai_client(settings)
+    try:
+        yield
+    finally:
+        close_embedding_dispatcher()
+        await aclose_openai_clients()
+        close_vector_store()
+        dispose_engine()
+
+
 def create_app() -> FastAPI:
     configure_logging()
-    app = FastAPI(title="Enterprise Knowledge Service", version="0.1.0")
+    app = FastAPI(title="Enterprise Knowledge Service", version="0.1.0", lifespan=lifespan)
     run_migrations()
 
     app.add_middleware(
@@ -1,7 +1,9 @@
 from app.models.base import Base
 from app.models.chunk import Chunk
+from app.models.chunk_embedding import ChunkEmbedding
 from app.models.calendar_event import CalendarEvent
 from app.models.document import Document
+from app.models.ingest_job import IngestJob
 from app.models.ingest_run import IngestRun
 from app.models.ingestion import Ingestion
 from app.models.knowledge_base import KnowledgeBase
@@ -14,7 +16,9 @@ __all__ = [
     "Base",
     "CalendarEvent",
     "Chunk",
+    "ChunkEmbedding",
     "Document",
+    "IngestJob",
     "IngestRun",
     "Ingestion",
     "KnowledgeBase",
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -10,6 +10,8 @@ from app.models.base import Base
 
 class Chunk(Base):
     __tablename__ = "chunks"
+    # Serves per-document lookups/deletes, the ON DELETE CASCADE from documents, and position diffs.
+    __table_args__ = (Index("ix_chunks_document_id_position", "document_id", "position"),)
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     document_id: Mapped[uuid.UUID] = mapped_column(
@@ -18,6 +20,12 @@ class Chunk(Base):
     position: Mapped[int] = mapped_column(Integer, nullable=False)
     text: Mapped[str] = mapped_column(Text, nullable=False)
     hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    # 1-based source pages (PDF) or slides (PPTX) the chunk spans.
+    page_start: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    page_end: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Raw [start, end) byte span in the source file, for streamed plain-text files.
+    byte_start: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    byte_end: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     document = relationship("Document", back_populates="chunks")
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import JSON, BigInteger, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -10,6 +10,10 @@ from app.models.base import Base
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_kb_id_created_at", "knowledge_base_id", "created_at"),
+        Index("ix_documents_kb_id_filename", "knowledge_base_id", "filename"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     knowledge_base_id: Mapped[uuid.UUID] = mapped_column(
@@ -23,6 +27,15 @@ class Document(Base):
     size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
     content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
     last_ingested_at: Mapped[str | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # "size:mtime_ns:inode" of the file content_hash was computed from; lets re-ingest skip hashing.
+    file_fingerprint: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    content_verified_at: Mapped[str | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Cheap structural counts, e.g. {"sheet_count": 3}, captured at upload; PDF page counts at first ingest.
+    file_metadata: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # Resume point of an interrupted streamed ingest; only valid for this content hash.
+    ingest_checkpoint_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    ingest_checkpoint_offset: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    ingest_checkpoint_chunk_index: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     knowledge_base = relationship("KnowledgeBase", back_populates="documents")
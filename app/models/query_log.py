@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -10,10 +10,12 @@ from app.models.base import Base
 
 class QueryLog(Base):
     __tablename__ = "query_logs"
+    # Analytics filter by knowledge base and scan a created_at range.
+    __table_args__ = (Index("ix_query_logs_kb_id_created_at", "knowledge_base_id", "created_at"),)
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     knowledge_base_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("knowledge_bases.id", ondelete="CASCADE"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("knowledge_bases.id", ondelete="CASCADE"), nullable=False
     )
     user_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True
@@ -23,6 +25,7 @@ class QueryLog(Base):
     embed_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
     retrieve_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
     generate_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    ttft_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
     retrieved_k: Mapped[int | None] = mapped_column(Integer, nullable=True)
     retrieved_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
     prompt_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
@@ -31,6 +34,8 @@ class QueryLog(Base):
     cost_usd: Mapped[float | None] = mapped_column(nullable=True)
     model: Mapped[str | None] = mapped_column(String(128), nullable=True)
     embedding_model: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    embedding_cache_hit: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
+    answer_cache_hit: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="false")
     vector_db: Mapped[str | None] = mapped_column(String(64), nullable=True)
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,47 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.chunk_embedding import ChunkEmbedding
+from app.utils.vectors import pack_vector, unpack_vector
+
+
+# Keeps each multi-row INSERT well under the driver's bind parameter limit.
+_INSERT_BATCH_SIZE = 1000
+
+
+class ChunkEmbeddingRepository:
+    def __init__(self, db: Session) -> None:
+        self._db = db
+
+    def commit(self) -> None:
+        self._db.commit()
+
+    def get_many(self, embed_model: str, chunk_hashes: list[str]) -> dict[str, list[float]]:
+        if not chunk_hashes:
+            return {}
+        rows = self._db.execute(
+            select(ChunkEmbedding.chunk_hash, ChunkEmbedding.dtype, ChunkEmbedding.vector).where(
+                ChunkEmbedding.embed_model == embed_model,
+                ChunkEmbedding.chunk_hash.in_(set(chunk_hashes)),
+            )
+        ).all()
+        return {row.chunk_hash: unpack_vector(row.vector, row.dtype) for row in rows}
+
+    def put_many(self, embed_model: str, embeddings: dict[str, list[float]], dtype: str = "float32") -> None:
+        # Flushed with the caller's transaction; concurrent writers of the same hash are harmless.
+        if not embeddings:
+            return
+        rows = [
+            {
+                "embed_model": embed_model,
+                "chunk_hash": chunk_hash,
+                "dtype": dtype,
+                "dimensions": len(vector),
+                "vector": pack_vector(vector, dtype),
+            }
+            for chunk_hash, vector in embeddings.items()
+        ]
+        for start in range(0, len(rows), _INSERT_BATCH_SIZE):
+            batch = rows[start : start + _INSERT_BATCH_SIZE]
+            self._db.execute(insert(ChunkEmbedding).values(batch).on_conflict_do_nothing())
@@ -1,31 +1,114 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
 from uuid import UUID
 
 from sqlalchemy.orm import Session
-from sqlalchemy import delete, select
+from sqlalchemy import delete, insert, select
 
 from app.models.chunk import Chunk
 
 
+# Below this many rows a multi-row INSERT beats setting up a COPY.
+COPY_MIN_ROWS = 200
+DELETE_BATCH_SIZE = 5000
+
+_COPY_COLUMNS = ("id", "document_id", "position", "text", "hash", "page_start", "page_end", "byte_start", "byte_end")
+
+
+@dataclass(slots=True)
+class ChunkRecord:
+    # Plain row for bulk writes: no identity map or unit-of-work state per chunk.
+    id: UUID
+    document_id: UUID
+    position: int
+    text: str
+    hash: str
+    page_start: int | None = None
+    page_end: int | None = None
+    byte_start: int | None = None
+    byte_end: int | None = None
+
+
 class ChunkRepository:
     def __init__(self, db: Session) -> None:
         self._db = db
 
-    def create_many(self, chunks: list[Chunk], commit: bool = True) -> None:
+    def create_many(self, chunks: Sequence[ChunkRecord], commit: bool = True) -> None:
+        # Bypasses the ORM: rows go straight to Core executemany, or COPY on psycopg for large
+        # batches. Runs in the session's transaction, so commit=False still rolls back cleanly.
         if not chunks:
             return
-        self._db.add_all(chunks)
+        if len(chunks) >= COPY_MIN_ROWS and self._supports_copy():
+            self._copy_rows(chunks)
+        else:
+            self._db.execute(
+                insert(Chunk.__table__),
+                [
+                    {
+                        "id": chunk.id,
+                        "document_id": chunk.document_id,
+                        "position": chunk.position,
+                        "text": chunk.text,
+                        "hash": chunk.hash,
+                        "page_start": chunk.page_start,
+                        "page_end": chunk.page_end,
+                        "byte_start": chunk.byte_start,
+                        "byte_end": chunk.byte_end,
+                    }
+                    for chunk in chunks
+                ],
+            )
         if commit:
             self._db.commit()
-        else:
-            self._db.flush()
+
+    def _supports_copy(self) -> bool:
+        dialect = self._db.get_bind().dialect
+        return dialect.name == "postgresql" and dialect.driver == "psycopg"
+
+    def _copy_rows(self, chunks: Sequence[ChunkRecord]) -> None:
+        raw_connection = self._db.connection().connection.driver_connection
+        statement = f"COPY {Chunk.__tablename__} ({', '.join(_COPY_COLUMNS)}) FROM STDIN"
+        with raw_connection.cursor() as cursor, cursor.copy(statement) as copy:
+            for chunk in chunks:
+                copy.write_row(
+                    (
+                        chunk.id,
+                        chunk.document_id,
+                        chunk.position,
+                        chunk.text,
+                        chunk.hash,
+                        chunk.page_start,
+                        chunk.page_end,
+                        chunk.byte_start,
+                        chunk.byte_end,
+                    )
+                )
 
     def commit(self) -> None:
         self._db.commit()
 
+    def rollback(self) -> None:
+        self._db.rollback()
+
     def list_ids_by_document(self, document_id: UUID) -> list[str]:
         rows = self._db.execute(select(Chunk.id).where(Chunk.document_id == document_id)).all()
         return [str(row[0]) for row in rows]
 
+    def list_positions_by_document(self, document_id: UUID, from_position: int = 0) -> list[tuple[str, int]]:
+        rows = self._db.execute(
+            select(Chunk.id, Chunk.position).where(Chunk.document_id == document_id, Chunk.position >= from_position)
+        ).all()
+        return [(str(row[0]), row[1]) for row in rows]
+
+    def delete_many(self, chunk_ids: list[str], commit: bool = True) -> None:
+        # Core delete on the table: no ORM session synchronisation per statement.
+        table = Chunk.__table__
+        ids = [UUID(str(chunk_id)) for chunk_id in chunk_ids]
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            self._db.execute(delete(table).where(table.c.id.in_(ids[start : start + DELETE_BATCH_SIZE])))
+        if commit:
+            self._db.commit()
+
     def delete_by_document(self, document_id: UUID) -> None:
         self._db.execute(delete(Chunk).where(Chunk.document_id == document_id))
         self._db.commit()
@@ -54,10 +54,52 @@ class DocumentRepository:
         self._db.delete(document)
         self._db.commit()
 
-    def update_ingestion_state(self, document_id: UUID, content_hash: str, ingested_at: datetime) -> None:
+    def update_ingestion_state(
+        self,
+        document_id: UUID,
+        content_hash: str,
+        ingested_at: datetime,
+        file_fingerprint: str | None = None,
+        file_metadata: dict | None = None,
+    ) -> None:
         document = self._db.get(Document, document_id)
         if not document:
             return
+        if file_metadata is not None:
+            document.file_metadata = file_metadata
         document.content_hash = content_hash
         document.last_ingested_at = ingested_at
+        document.file_fingerprint = file_fingerprint
+        document.content_verified_at = ingested_at
+        document.ingest_checkpoint_hash = None
+        document.ingest_checkpoint_offset = None
+        document.ingest_checkpoint_chunk_index = None
+        self._db.commit()
+
+    def mark_content_verified(self, document_id: UUID, file_fingerprint: str, verified_at: datetime) -> None:
+        # The file was re-hashed and its content is unchanged; only the stat fingerprint moved.
+        document = self._db.get(Document, document_id)
+        if not document:
+            return
+        document.file_fingerprint = file_fingerprint
+        document.content_verified_at = verified_at
+        self._db.commit()
+
+    def save_ingest_checkpoint(
+        self,
+        document_id: UUID,
+        content_hash: str | None,
+        offset: int,
+        chunk_index: int,
+        file_fingerprint: str | None = None,
+    ) -> None:
+        # Committed together with the chunk batch it covers.
+        document = self._db.get(Document, document_id)
+        if not document:
+            return
+        document.ingest_checkpoint_hash = content_hash
+        document.ingest_checkpoint_offset = offset
+        document.ingest_checkpoint_chunk_index = chunk_index
+        # While a checkpoint is pending the fingerprint identifies the file it was recorded for.
+        document.file_fingerprint = file_fingerprint
         self._db.commit()
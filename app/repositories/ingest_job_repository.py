@@ -0,0 +1,123 @@
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.models.ingest_job import IngestJob
+
+
+class IngestJobRepository:
+    def __init__(self, db: Session) -> None:
+        self._db = db
+
+    def enqueue(
+        self,
+        knowledge_base_id: uuid.UUID,
+        ingest_run_id: uuid.UUID,
+        user_id: uuid.UUID | None,
+        max_attempts: int,
+    ) -> IngestJob:
+        job = IngestJob(
+            knowledge_base_id=knowledge_base_id,
+            ingest_run_id=ingest_run_id,
+            user_id=user_id,
+            status="queued",
+            attempts=0,
+            max_attempts=max(1, max_attempts),
+        )
+        self._db.add(job)
+        self._db.commit()
+        self._db.refresh(job)
+        return job
+
+    def lease(self, worker_id: str, lease_seconds: float) -> IngestJob | None:
+        # SKIP LOCKED lets any number of workers poll the same table without blocking each
+        # other; a running job whose lease lapsed (worker died) is picked up again.
+        now = func.now()
+        job = self._db.execute(
+            select(IngestJob)
+            .where(
+                or_(
+                    and_(IngestJob.status == "queued", IngestJob.available_at <= now),
+                    and_(
+                        IngestJob.status == "running",
+                        IngestJob.lease_expires_at < now,
+                        IngestJob.attempts < IngestJob.max_attempts,
+                    ),
+                )
+            )
+            .order_by(IngestJob.available_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            self._db.commit()
+            return None
+        job.status = "running"
+        job.attempts += 1
+        job.lease_owner = worker_id
+        job.heartbeat_at = now
+        job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+        self._db.commit()
+        self._db.refresh(job)
+        return job
+
+    def heartbeat(self, job_id: uuid.UUID, worker_id: str, lease_seconds: float) -> bool:
+        result = self._db.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id, IngestJob.lease_owner == worker_id, IngestJob.status == "running")
+            .values(heartbeat_at=func.now(), lease_expires_at=func.now() + timedelta(seconds=lease_seconds))
+        )
+        self._db.commit()
+        return result.rowcount == 1
+
+    def complete(self, job_id: uuid.UUID, worker_id: str) -> None:
+        self._db.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id, IngestJob.lease_owner == worker_id)
+            .values(status="completed", finished_at=func.now(), lease_expires_at=None, last_error=None)
+        )
+        self._db.commit()
+
+    def fail(self, job_id: uuid.UUID, worker_id: str, error: str, retry_delay_seconds: float) -> bool:
+        job = self._db.get(IngestJob, job_id, with_for_update=True)
+        if job is None or job.lease_owner != worker_id:
+            self._db.commit()
+            return False
+        job.last_error = error
+        job.lease_expires_at = None
+        retry = job.attempts < job.max_attempts
+        if retry:
+            job.status = "queued"
+            # Linear backoff: later attempts wait longer before becoming available again.
+            job.available_at = func.now() + timedelta(seconds=retry_delay_seconds * job.attempts)
+        else:
+            job.status = "failed"
+            job.finished_at = func.now()
+        self._db.commit()
+        return retry
+
+    def fail_abandoned(self) -> list[IngestJob]:
+        # Jobs whose worker vanished on the final attempt are never leased again; close them out.
+        now = func.now()
+        jobs = (
+            self._db.execute(
+                select(IngestJob)
+                .where(
+                    IngestJob.status == "running",
+                    IngestJob.lease_expires_at < now,
+                    IngestJob.attempts >= IngestJob.max_attempts,
+                )
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        for job in jobs:
+            job.status = "failed"
+            job.finished_at = now
+            job.last_error = "Ingestion worker stopped sending heartbeats"
+        self._db.commit()
+        return list(jobs)
@@ -11,11 +11,14 @@ class IngestRunRepository:
     def __init__(self, db: Session) -> None:
         self._db = db
 
-    def create(self, knowledge_base_id: uuid.UUID, user_id: uuid.UUID | None) -> IngestRun:
+    def create(self, knowledge_base_id: uuid.UUID, user_id: uuid.UUID | None, commit: bool = True) -> IngestRun:
         run = IngestRun(knowledge_base_id=knowledge_base_id, user_id=user_id, status="processing")
         self._db.add(run)
-        self._db.commit()
-        self._db.refresh(run)
+        if commit:
+            self._db.commit()
+            self._db.refresh(run)
+        else:
+            self._db.flush()
         return run
 
     def get(self, run_id: uuid.UUID) -> IngestRun | None:
@@ -34,6 +37,16 @@ class IngestRunRepository:
         run.chunks_created = chunks_created
         self._db.commit()
 
+    def reopen(self, run_id: uuid.UUID) -> None:
+        # A retried job reuses its run, so clear the previous attempt's outcome.
+        run = self._db.get(IngestRun, run_id)
+        if not run:
+            raise ValueError("Ingest run not found")
+        run.status = "processing"
+        run.error_message = None
+        run.finished_at = None
+        self._db.commit()
+
     def complete(
         self,
         run_id: uuid.UUID,
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from uuid import UUID
 
-from sqlalchemy import or_, select
+from sqlalchemy import or_, select, update
 from sqlalchemy.orm import Session
 
 from app.models.knowledge_base import KnowledgeBase
@@ -49,3 +49,11 @@ class KnowledgeBaseRepository:
     def delete(self, knowledge_base: KnowledgeBase) -> None:
         self._db.delete(knowledge_base)
         self._db.commit()
+
+    def bump_content_version(self, knowledge_base_id: UUID) -> None:
+        self._db.execute(
+            update(KnowledgeBase)
+            .where(KnowledgeBase.id == knowledge_base_id)
+            .values(content_version=KnowledgeBase.content_version + 1)
+        )
+        self._db.commit()
@@ -12,6 +12,7 @@ class DocumentRead(BaseModel):
     size_bytes: int
     source: str | None = None
     status: str | None = None
+    file_metadata: dict | None = None
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+import threading
+import time
+
+from app.core.config import Settings
+from app.schemas.query import QueryResponse
+from app.services.embedding_cache import normalize_question
+
+
+AnswerCacheKey = tuple[str, int, str, int, str]
+
+
+def build_answer_cache_key(
+    knowledge_base_id: str,
+    content_version: int,
+    question: str,
+    top_k: int,
+    gen_model: str,
+) -> AnswerCacheKey:
+    # The content version is bumped by ingestion/deletes, so stale entries simply stop matching.
+    return (str(knowledge_base_id), content_version, normalize_question(question), top_k, gen_model)
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[AnswerCacheKey, tuple[float, QueryResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0
+
+    def get(self, key: AnswerCacheKey) -> QueryResponse | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: AnswerCacheKey, response: QueryResponse) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl_seconds, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_shared_cache: AnswerCache | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_answer_cache(settings: Settings) -> AnswerCache:
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = AnswerCache(
+                    max_entries=settings.answer_cache_max_entries,
+                    ttl_seconds=settings.answer_cache_ttl_seconds,
+                )
+    return _shared_cache
+
+
+def get_answer_cache_stats() -> dict:
+    if _shared_cache is None:
+        return {}
+    return _shared_cache.get_stats()
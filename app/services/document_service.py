@@ -1,3 +1,4 @@
+from datetime import datetime
 import os
 import uuid
 from pathlib import Path
@@ -11,7 +12,9 @@ from app.repositories.chunk_repository import ChunkRepository
 from app.repositories.document_repository import DocumentRepository
 from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
 from app.services.vector_store_service import VectorStoreService
+from app.utils.documents import read_document_metadata
 from app.utils.files import ensure_directory, sanitize_filename, save_upload_file
+from app.utils.hashing import file_fingerprint
 
 
 class DocumentService:
@@ -56,6 +59,7 @@ class DocumentService:
                 except OSError:
                     pass
             self._document_repo.delete_by_filename(knowledge_base_id, filename)
+            self._knowledge_base_repo.bump_content_version(knowledge_base_id)
 
         max_bytes = self._settings.file_size_limit_mb * 1024 * 1024
         kb_folder = os.path.join(self._settings.storage_path, str(knowledge_base_id))
@@ -75,9 +79,14 @@ class DocumentService:
         storage_filename = f"{document_id}_{filename}"
         storage_path = os.path.join(kb_folder, storage_filename)
 
-        size_bytes = save_upload_file(upload, storage_path, max_bytes)
+        saved = save_upload_file(upload, storage_path, max_bytes, buffer_size=self._settings.upload_buffer_bytes)
         document.storage_path = storage_path
-        document.size_bytes = size_bytes
+        document.size_bytes = saved.size_bytes
+        # Hashed during the write: the first ingest trusts it for as long as the file is untouched.
+        document.content_hash = saved.content_hash
+        document.file_fingerprint = file_fingerprint(storage_path)
+        document.content_verified_at = datetime.utcnow()
+        document.file_metadata = read_document_metadata(storage_path, document.content_type) or None
 
         return self._document_repo.create(document)
 
@@ -156,4 +165,5 @@ class DocumentService:
             pass
 
         self._document_repo.delete(document)
+        self._knowledge_base_repo.bump_content_version(knowledge_base_id)
         return True
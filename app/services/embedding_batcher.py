@@ -0,0 +1,113 @@
+from collections.abc import Callable, Iterable, Iterator
+import math
+import threading
+from typing import TypeVar
+
+from app.core.config import Settings
+
+
+T = TypeVar("T")
+
+# Conservative (~3 chars per token) so packed requests stay under the API limit without a tokenizer.
+_CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / _CHARS_PER_TOKEN))
+
+
+class EmbeddingBatchSizer:
+    # Token budget per embedding request. Starts at the configured maximum, halves when a
+    # request is slow or fails and grows back gradually while requests stay fast.
+    def __init__(
+        self,
+        max_tokens: int,
+        max_items: int,
+        min_tokens: int,
+        target_latency_ms: float,
+    ) -> None:
+        self.max_tokens = max(1, max_tokens)
+        self.max_items = max(1, max_items)
+        self.min_tokens = max(1, min(min_tokens, self.max_tokens))
+        self._target_latency_seconds = target_latency_ms / 1000
+        self._token_budget = self.max_tokens
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens = 0
+        self.shrinks = 0
+
+    @property
+    def token_budget(self) -> int:
+        return self._token_budget
+
+    def observe(self, tokens: int, latency_seconds: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.tokens += tokens
+            if self._target_latency_seconds <= 0:
+                return
+            if latency_seconds > self._target_latency_seconds:
+                self._shrink()
+            elif latency_seconds < self._target_latency_seconds / 2 and tokens >= self._token_budget // 2:
+                # Only grow when the batch actually used the budget; small tail batches say nothing.
+                self._token_budget = min(self.max_tokens, int(self._token_budget * 1.25) + 1)
+
+    def observe_failure(self) -> None:
+        with self._lock:
+            self._shrink()
+
+    def _shrink(self) -> None:
+        self._token_budget = max(self.min_tokens, self._token_budget // 2)
+        self.shrinks += 1
+
+    def batches(self, items: Iterable[T], text_of: Callable[[T], str]) -> Iterator[list[T]]:
+        # Packs items in order; a batch is closed before an item that would overflow it, and an
+        # item that alone exceeds the budget is sent on its own.
+        batch: list[T] = []
+        batch_tokens = 0
+        for item in items:
+            tokens = estimate_tokens(text_of(item))
+            if batch and (batch_tokens + tokens > self._token_budget or len(batch) >= self.max_items):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(item)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "token_budget": self._token_budget,
+                "max_tokens": self.max_tokens,
+                "max_items": self.max_items,
+                "requests": self.requests,
+                "avg_tokens_per_request": round(self.tokens / self.requests, 1) if self.requests else 0.0,
+                "shrinks": self.shrinks,
+            }
+
+
+_shared_sizer: EmbeddingBatchSizer | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_embedding_batch_sizer(settings: Settings) -> EmbeddingBatchSizer:
+    # Shared so every ingest worker adapts to the same observed API latency.
+    global _shared_sizer
+    if _shared_sizer is None:
+        with _shared_lock:
+            if _shared_sizer is None:
+                _shared_sizer = EmbeddingBatchSizer(
+                    max_tokens=settings.embed_batch_max_tokens,
+                    max_items=settings.embed_batch_max_items,
+                    min_tokens=settings.embed_batch_min_tokens,
+                    target_latency_ms=settings.embed_batch_target_latency_ms,
+                )
+    return _shared_sizer
+
+
+def get_embedding_batch_stats() -> dict:
+    if _shared_sizer is None:
+        return {}
+    return _shared_sizer.get_stats()
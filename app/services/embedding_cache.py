@@ -0,0 +1,112 @@
+from array import array
+from collections import OrderedDict
+import threading
+import time
+
+from app.core.config import Settings
+from app.utils.text import normalize_whitespace
+
+
+# Rough per-entry bookkeeping cost (key tuple, OrderedDict node, array header).
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_question(question: str) -> str:
+    return normalize_whitespace(question).casefold()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float) -> None:
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl_seconds = ttl_seconds
+        # key -> (expires_at, float32 vector); ordered oldest-used first.
+        self._entries: OrderedDict[tuple[str, str], tuple[float, array]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0 and self._max_bytes > 0
+
+    def _entry_size(self, key: tuple[str, str], vector: array) -> int:
+        return len(key[1]) + vector.itemsize * len(vector) + _ENTRY_OVERHEAD_BYTES
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        _, vector = self._entries.pop(key)
+        self._bytes -= self._entry_size(key, vector)
+
+    def get(self, model: str, question: str) -> list[float] | None:
+        if not self.enabled:
+            return None
+        key = (model, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, vector = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector.tolist()
+
+    def put(self, model: str, question: str, embedding: list[float]) -> None:
+        if not self.enabled:
+            return
+        key = (model, normalize_question(question))
+        vector = array("f", embedding)
+        size = self._entry_size(key, vector)
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self._ttl_seconds, vector)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self._max_entries or self._bytes > self._max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_shared_cache: QueryEmbeddingCache | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_query_embedding_cache(settings: Settings) -> QueryEmbeddingCache:
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = QueryEmbeddingCache(
+                    max_entries=settings.query_embedding_cache_max_entries,
+                    max_bytes=settings.query_embedding_cache_max_mb * 1024 * 1024,
+                    ttl_seconds=settings.query_embedding_cache_ttl_seconds,
+                )
+    return _shared_cache
+
+
+def get_query_embedding_cache_stats() -> dict:
+    if _shared_cache is None:
+        return {}
+    return _shared_cache.get_stats()
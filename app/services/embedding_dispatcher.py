@@ -0,0 +1,285 @@
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+import heapq
+import itertools
+import threading
+import time
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from app.core.config import Settings
+
+
+# Lower value is dispatched first. Query embeddings normally bypass the queue (see
+# OpenAIService), so the heap mostly orders bulk ingestion work.
+QUERY_PRIORITY = 0
+INGEST_PRIORITY = 1
+
+# Used when a 429 carries no usable retry-after header.
+_BASE_BACKOFF_SECONDS = 1.0
+_MAX_BACKOFF_SECONDS = 60.0
+# Dispatched calls run with SDK retries off, so connection errors, timeouts and 5xx are retried
+# here with the SDK's default schedule.
+_TRANSIENT_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError)
+_TRANSIENT_RETRIES = 2
+_TRANSIENT_BACKOFF_SECONDS = 0.5
+_MAX_TRANSIENT_BACKOFF_SECONDS = 8.0
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float) -> None:
+        # A non-positive limit disables the bucket. Capacity is one minute of budget.
+        self.capacity = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self._rate
+
+    def take(self, amount: float, now: float) -> None:
+        if not self.enabled:
+            return
+        self._refill(now)
+        self._tokens -= min(amount, self.capacity)
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    sequence: int
+    call: Callable[[], object] = field(compare=False)
+    tokens: int = field(compare=False)
+    future: Future = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+def _retry_after_seconds(exc: RateLimitError) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingDispatcher:
+    def __init__(
+        self,
+        concurrency: int,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_retries: int,
+    ) -> None:
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._max_retries = max(0, max_retries)
+        self._heap: list[_Job] = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        # After a 429 nothing is dispatched until this monotonic time.
+        self._cooldown_until = 0.0
+        self._closed = False
+        self._in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.transient_retries = 0
+        self.direct_requests = 0
+        self.throttled_seconds = 0.0
+        self._workers = [
+            threading.Thread(target=self._run, name=f"embed-dispatch-{index}", daemon=True)
+            for index in range(max(1, concurrency))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, call: Callable[[], object], tokens: int, priority: int = INGEST_PRIORITY) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Embedding dispatcher is closed")
+            heapq.heappush(self._heap, _Job(priority, next(self._sequence), call, tokens, future))
+            self._cond.notify()
+        return future
+
+    def charge(self, tokens: int) -> None:
+        # Records a request made outside the queue (query embeddings) against the shared budget,
+        # without waiting: queued ingestion work absorbs the resulting delay instead.
+        with self._cond:
+            now = time.monotonic()
+            self._requests.take(1, now)
+            self._tokens.take(tokens, now)
+            self.direct_requests += 1
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            pending, self._heap = self._heap, []
+            self._cond.notify_all()
+        for job in pending:
+            job.future.cancel()
+
+    def _admission_delay(self, job: _Job, now: float) -> float:
+        return max(
+            self._cooldown_until - now,
+            self._requests.delay(1, now),
+            self._tokens.delay(job.tokens, now),
+        )
+
+    def _next_job(self) -> _Job | None:
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                # Only the head (highest priority, oldest) is admitted, so a query that arrives
+                # while bulk work waits on the budget is considered first on the next wake-up.
+                now = time.monotonic()
+                delay = self._admission_delay(self._heap[0], now)
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    self.throttled_seconds += time.monotonic() - now
+                    continue
+                job = heapq.heappop(self._heap)
+                self._requests.take(1, now)
+                self._tokens.take(job.tokens, now)
+                self._in_flight += 1
+                return job
+
+    def _run(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                # A job requeued after a 429 is already marked running.
+                if job.future.running() or job.future.set_running_or_notify_cancel():
+                    self._execute(job)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+
+    def _call(self, job: _Job) -> object:
+        attempt = 0
+        while True:
+            try:
+                return job.call()
+            except _TRANSIENT_ERRORS:
+                if attempt >= _TRANSIENT_RETRIES or self._closed:
+                    raise
+            with self._cond:
+                self.transient_retries += 1
+            time.sleep(min(_MAX_TRANSIENT_BACKOFF_SECONDS, _TRANSIENT_BACKOFF_SECONDS * 2**attempt))
+            attempt += 1
+
+    def _execute(self, job: _Job) -> None:
+        try:
+            result = self._call(job)
+        except RateLimitError as exc:
+            if getattr(exc, "code", None) == "insufficient_quota":
+                # Out of quota, not over the rate: waiting will not help, so fail right away.
+                with self._cond:
+                    self.failed += 1
+                job.future.set_exception(exc)
+                return
+            retry_after = _retry_after_seconds(exc)
+            if retry_after is None:
+                retry_after = min(_MAX_BACKOFF_SECONDS, _BASE_BACKOFF_SECONDS * 2**job.attempts)
+            with self._cond:
+                self.rate_limited += 1
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + retry_after)
+                if job.attempts < self._max_retries and not self._closed:
+                    job.attempts += 1
+                    # Requeued with its original sequence so it keeps its place in line.
+                    heapq.heappush(self._heap, job)
+                    self._cond.notify_all()
+                    return
+                self.failed += 1
+            job.future.set_exception(exc)
+        except BaseException as exc:  # noqa: BLE001
+            with self._cond:
+                self.failed += 1
+            job.future.set_exception(exc)
+        else:
+            with self._cond:
+                self.completed += 1
+            job.future.set_result(result)
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._heap),
+                "queued_queries": sum(1 for job in self._heap if job.priority == QUERY_PRIORITY),
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rate_limited": self.rate_limited,
+                "transient_retries": self.transient_retries,
+                "direct_requests": self.direct_requests,
+                "throttled_ms": int(self.throttled_seconds * 1000),
+                "cooldown_ms": max(0, int((self._cooldown_until - time.monotonic()) * 1000)),
+            }
+
+
+_shared_dispatcher: EmbeddingDispatcher | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_embedding_dispatcher(settings: Settings) -> EmbeddingDispatcher:
+    # One rate budget per process: ingest workers and query traffic all draw from it.
+    global _shared_dispatcher
+    if _shared_dispatcher is None:
+        with _shared_lock:
+            if _shared_dispatcher is None:
+                _shared_dispatcher = EmbeddingDispatcher(
+                    concurrency=settings.embed_dispatch_concurrency,
+                    requests_per_minute=settings.openai_embed_rpm,
+                    tokens_per_minute=settings.openai_embed_tpm,
+                    max_retries=settings.embed_rate_limit_max_retries,
+                )
+    return _shared_dispatcher
+
+
+def get_embedding_dispatcher_stats() -> dict:
+    if _shared_dispatcher is None:
+        return {}
+    return _shared_dispatcher.get_stats()
+
+
+def close_embedding_dispatcher() -> None:
+    global _shared_dispatcher
+    with _shared_lock:
+        if _shared_dispatcher is not None:
+            _shared_dispatcher.close()
+        _shared_dispatcher = None
@@ -0,0 +1,242 @@
+from collections.abc import Callable, Iterator
+import multiprocessing
+from multiprocessing.connection import Connection
+import os
+import threading
+import time
+
+from app.core.config import Settings
+from app.utils.documents import extract_text_from_file
+
+
+ExtractFn = Callable[[str, str | None], str]
+
+
+def _worker_main(conn: Connection, memory_limit_bytes: int) -> None:
+    if memory_limit_bytes > 0:
+        try:
+            import resource
+
+            # Address-space cap: a runaway parser gets MemoryError instead of pushing the node into OOM.
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        except (ImportError, ValueError, OSError):
+            pass
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        fn, args, streaming = job
+        try:
+            if streaming:
+                # Sends block once the pipe is full, so the consumer's pace bounds memory here.
+                for item in fn(*args):
+                    conn.send(("item", item))
+                conn.send(("ok", None))
+            else:
+                conn.send(("ok", fn(*args)))
+        except MemoryError:
+            conn.send(("memory", None))
+        except Exception as exc:  # noqa: BLE001
+            conn.send(("error", str(exc) or type(exc).__name__))
+
+
+class _Worker:
+    def __init__(self, context, memory_limit_bytes: int) -> None:
+        self._conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit_bytes), name="ingest-extract", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def submit(self, fn: Callable, args: tuple, streaming: bool) -> None:
+        self._conn.send((fn, args, streaming))
+
+    def receive(self, timeout_seconds: float) -> tuple[str, object]:
+        if not self._conn.poll(timeout_seconds if timeout_seconds > 0 else None):
+            return "timeout", None
+        try:
+            return self._conn.recv()
+        except EOFError:
+            return "died", None
+
+    def stop(self) -> None:
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self._conn.close()
+
+
+# CPU-bound parsers (pypdf, python-docx, python-pptx, openpyxl) hold the GIL, so extraction runs
+# in separate processes. Each worker is a long-lived process handling one document at a time;
+# a worker that overruns the time limit, exhausts its memory cap or crashes is killed and
+# replaced, failing only its own document.
+class ExtractionPool:
+    def __init__(
+        self,
+        workers: int,
+        timeout_seconds: float,
+        memory_limit_mb: int,
+        extract_fn: ExtractFn = extract_text_from_file,
+    ) -> None:
+        self.workers = max(1, workers)
+        self._timeout_seconds = timeout_seconds
+        self._memory_limit_bytes = max(0, memory_limit_mb) * 1024 * 1024
+        self._extract_fn = extract_fn
+        # Forking a threaded process can copy held locks into the child; forkserver/spawn cannot.
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+        self._idle: list[_Worker] = []
+        self._all: set[_Worker] = set()
+        self._closed = False
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.memory_exceeded = 0
+        self.crashed = 0
+        self.busy_seconds = 0.0
+
+    def extract(self, path: str, content_type: str | None) -> str:
+        return self.run(self._extract_fn, path, content_type)
+
+    def run(self, fn: Callable, *args) -> object:
+        # Runs fn(*args) in a worker process under the same time and memory limits as extraction.
+        with self._slots:
+            worker = self._checkout()
+            started = time.perf_counter()
+            worker.submit(fn, args, streaming=False)
+            status, payload = worker.receive(self._timeout_seconds)
+            self._finish(worker, status, time.perf_counter() - started)
+        return self._result(worker, status, payload)
+
+    def iter_extract(self, fn: Callable[..., Iterator], *args) -> Iterator:
+        # Streams fn(*args) from a worker process. The time limit applies to each item, since
+        # the consumer (embedding, writes) sets the overall pace.
+        with self._slots:
+            worker = self._checkout()
+            started = time.perf_counter()
+            status, payload = "died", None
+            try:
+                worker.submit(fn, args, streaming=True)
+                while True:
+                    status, payload = worker.receive(self._timeout_seconds)
+                    if status != "item":
+                        break
+                    yield payload
+            finally:
+                # A consumer that stops early leaves the worker mid-stream ("item"): it is replaced.
+                self._finish(worker, status, time.perf_counter() - started)
+        self._result(worker, status, payload)
+
+    def _finish(self, worker: _Worker, status: str, elapsed: float) -> None:
+        # Only a worker that finished its job cleanly is trusted with the next one.
+        self._checkin(worker, healthy=status in {"ok", "error"})
+        with self._lock:
+            self.busy_seconds += elapsed
+            if status == "ok":
+                self.completed += 1
+            elif status != "item":
+                self.failed += 1
+                if status == "timeout":
+                    self.timed_out += 1
+                elif status == "memory":
+                    self.memory_exceeded += 1
+                elif status == "died":
+                    self.crashed += 1
+
+    def _result(self, worker: _Worker, status: str, payload: object) -> object:
+        if status == "ok":
+            return payload
+        if status == "timeout":
+            raise ValueError(f"Text extraction timed out after {self._timeout_seconds:g}s")
+        if status == "memory":
+            limit_mb = self._memory_limit_bytes // (1024 * 1024)
+            raise ValueError(f"Text extraction exceeded the {limit_mb} MB memory limit")
+        if status == "died":
+            raise ValueError(f"Text extraction process exited unexpectedly (code {worker.process.exitcode})")
+        raise ValueError(payload)
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Extraction pool is closed")
+            if self._idle:
+                return self._idle.pop()
+        worker = _Worker(self._context, self._memory_limit_bytes)
+        with self._lock:
+            self._all.add(worker)
+        return worker
+
+    def _checkin(self, worker: _Worker, healthy: bool) -> None:
+        with self._lock:
+            if healthy and not self._closed:
+                self._idle.append(worker)
+                return
+            self._all.discard(worker)
+        worker.kill()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            workers, self._all, self._idle = list(self._all), set(), []
+        for worker in workers:
+            worker.stop()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "processes": len(self._all),
+                "idle": len(self._idle),
+                "completed": self.completed,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "memory_exceeded": self.memory_exceeded,
+                "crashed": self.crashed,
+                "busy_ms": int(self.busy_seconds * 1000),
+            }
+
+
+_shared_pool: ExtractionPool | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_extraction_pool(settings: Settings) -> ExtractionPool:
+    # Worker processes start lazily, on the first document that needs one.
+    global _shared_pool
+    if _shared_pool is None:
+        with _shared_lock:
+            if _shared_pool is None:
+                _shared_pool = ExtractionPool(
+                    workers=settings.extract_process_workers or os.cpu_count() or 1,
+                    timeout_seconds=settings.extract_timeout_seconds,
+                    memory_limit_mb=settings.extract_memory_limit_mb,
+                )
+    return _shared_pool
+
+
+def get_extraction_pool_stats() -> dict:
+    if _shared_pool is None:
+        return {}
+    return _shared_pool.get_stats()
+
+
+def close_extraction_pool() -> None:
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+        _shared_pool = None
@@ -0,0 +1,29 @@
+import uuid
+
+from app.core.config import Settings
+from app.models.ingest_run import IngestRun
+from app.repositories.ingest_job_repository import IngestJobRepository
+from app.repositories.ingest_run_repository import IngestRunRepository
+
+
+class IngestJobService:
+    def __init__(
+        self,
+        settings: Settings,
+        ingest_run_repo: IngestRunRepository,
+        ingest_job_repo: IngestJobRepository,
+    ) -> None:
+        self._settings = settings
+        self._ingest_run_repo = ingest_run_repo
+        self._ingest_job_repo = ingest_job_repo
+
+    def enqueue(self, knowledge_base_id: uuid.UUID, user_id: uuid.UUID | None = None) -> IngestRun:
+        # The run and its job are committed together, so a run never exists without work queued.
+        run = self._ingest_run_repo.create(knowledge_base_id, user_id, commit=False)
+        self._ingest_job_repo.enqueue(
+            knowledge_base_id,
+            run.id,
+            user_id,
+            max_attempts=self._settings.ingest_job_max_attempts,
+        )
+        return run
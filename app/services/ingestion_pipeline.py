@@ -0,0 +1,185 @@
+from collections.abc import Callable, Iterable, Iterator
+import queue
+import threading
+import time
+
+
+# Marks the end of a stage's output on its queue.
+_END = object()
+# How often blocked stages re-check whether the pipeline was aborted.
+_POLL_SECONDS = 0.1
+
+Stage = tuple[str, Callable[[Iterable], Iterable]]
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+class StageStats:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items = 0
+        self.elapsed_seconds = 0.0
+        # Waiting on an empty input queue vs. waiting for room in a full output queue.
+        self.blocked_in_seconds = 0.0
+        self.blocked_out_seconds = 0.0
+
+    @property
+    def busy_seconds(self) -> float:
+        return max(0.0, self.elapsed_seconds - self.blocked_in_seconds - self.blocked_out_seconds)
+
+
+class PipelineMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: dict[str, dict[str, float]] = {}
+
+    def record(self, stats: StageStats) -> None:
+        with self._lock:
+            totals = self._stages.setdefault(
+                stats.name, {"items": 0, "busy_seconds": 0.0, "blocked_in_seconds": 0.0, "blocked_out_seconds": 0.0}
+            )
+            totals["items"] += stats.items
+            totals["busy_seconds"] += stats.busy_seconds
+            totals["blocked_in_seconds"] += stats.blocked_in_seconds
+            totals["blocked_out_seconds"] += stats.blocked_out_seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "items": int(totals["items"]),
+                    "items_per_busy_second": (
+                        round(totals["items"] / totals["busy_seconds"], 2) if totals["busy_seconds"] else 0.0
+                    ),
+                    "busy_ms": int(totals["busy_seconds"] * 1000),
+                    "blocked_in_ms": int(totals["blocked_in_seconds"] * 1000),
+                    "blocked_out_ms": int(totals["blocked_out_seconds"] * 1000),
+                }
+                for name, totals in self._stages.items()
+            }
+
+
+pipeline_metrics = PipelineMetrics()
+
+
+def get_ingestion_pipeline_stats() -> dict:
+    return pipeline_metrics.snapshot()
+
+
+# Source and transform stages each run on their own thread, linked by bounded queues. A
+# transform receives an iterator over the previous stage's output and yields its own, so it
+# may filter or batch. The sink runs on the calling thread so it can own the DB session.
+class StagedPipeline:
+    def __init__(self, queue_size: int, metrics: PipelineMetrics | None = None) -> None:
+        self._queue_size = max(1, queue_size)
+        self._metrics = metrics if metrics is not None else pipeline_metrics
+        self._aborted = threading.Event()
+        self._errors: list[BaseException] = []
+        self.stats: list[StageStats] = []
+
+    def run(
+        self,
+        source: tuple[str, Iterable],
+        stages: list[Stage],
+        sink: tuple[str, Callable[[object], None]],
+    ) -> None:
+        queues = [queue.Queue(maxsize=self._queue_size) for _ in range(len(stages) + 1)]
+        source_stats = StageStats(source[0])
+        threads = [
+            threading.Thread(
+                target=self._run_stage,
+                args=(source_stats, lambda _: source[1], None, queues[0]),
+                name=f"ingest-{source[0]}",
+                daemon=True,
+            )
+        ]
+        self.stats = [source_stats]
+        for index, (name, transform) in enumerate(stages):
+            stats = StageStats(name)
+            self.stats.append(stats)
+            threads.append(
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(stats, transform, queues[index], queues[index + 1]),
+                    name=f"ingest-{name}",
+                    daemon=True,
+                )
+            )
+        sink_stats = StageStats(sink[0])
+        self.stats.append(sink_stats)
+
+        for thread in threads:
+            thread.start()
+        started = time.perf_counter()
+        try:
+            for item in self._drain(queues[-1], sink_stats):
+                sink[1](item)
+                sink_stats.items += 1
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            sink_stats.elapsed_seconds = time.perf_counter() - started
+            if self._errors:
+                self._aborted.set()
+            for thread in threads:
+                thread.join()
+            for stats in self.stats:
+                self._metrics.record(stats)
+
+        if self._errors:
+            raise self._errors[0]
+
+    def _run_stage(
+        self,
+        stats: StageStats,
+        transform: Callable[[Iterable], Iterable],
+        inbox: queue.Queue | None,
+        outbox: queue.Queue,
+    ) -> None:
+        started = time.perf_counter()
+        try:
+            items = self._drain(inbox, stats) if inbox is not None else ()
+            for item in transform(items):
+                stats.items += 1
+                self._put(outbox, item, stats)
+            self._put(outbox, _END, stats)
+        except PipelineAborted:
+            pass
+        except BaseException as exc:  # noqa: BLE001
+            self._fail(exc)
+        finally:
+            stats.elapsed_seconds = time.perf_counter() - started
+
+    def _drain(self, inbox: queue.Queue, stats: StageStats) -> Iterator:
+        while True:
+            waited = time.perf_counter()
+            while True:
+                if self._aborted.is_set():
+                    raise PipelineAborted()
+                try:
+                    item = inbox.get(timeout=_POLL_SECONDS)
+                    break
+                except queue.Empty:
+                    continue
+            stats.blocked_in_seconds += time.perf_counter() - waited
+            if item is _END:
+                return
+            yield item
+
+    def _put(self, outbox: queue.Queue, item: object, stats: StageStats) -> None:
+        waited = time.perf_counter()
+        while True:
+            if self._aborted.is_set():
+                raise PipelineAborted()
+            try:
+                outbox.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        stats.blocked_out_seconds += time.perf_counter() - waited
+
+    def _fail(self, exc: BaseException) -> None:
+        self._errors.append(exc)
+        self._aborted.set()
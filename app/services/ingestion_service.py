@@ -1,19 +1,157 @@
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass
+import logging
+import threading
 import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import sessionmaker
 
 from app.core.config import Settings
-from app.models.chunk import Chunk
+from app.models.document import Document
 from app.models.ingest_run import IngestRun
-from app.repositories.chunk_repository import ChunkRepository
+from app.repositories.chunk_embedding_repository import ChunkEmbeddingRepository
+from app.repositories.chunk_repository import ChunkRecord, ChunkRepository
 from app.repositories.document_repository import DocumentRepository
 from app.repositories.ingest_run_repository import IngestRunRepository
 from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
+from app.services.embedding_batcher import EmbeddingBatchSizer, estimate_tokens, get_shared_embedding_batch_sizer
+from app.services.extraction_pool import ExtractionPool, get_shared_extraction_pool
+from app.services.ingestion_pipeline import StagedPipeline
 from app.services.openai_service import OpenAIService
 from app.services.vector_store_service import VectorStoreService
-from app.utils.documents import extract_text_from_file, iter_streamable_chunks
-from app.utils.hashing import sha256_file, sha256_text
-from app.utils.text import chunk_text, normalize_whitespace
+from app.utils.documents import (
+    TextPart,
+    extract_text_from_file,
+    iter_streamable_chunks,
+    read_pdf_metadata,
+    run_inline,
+)
+from app.utils.hashing import file_fingerprint, sha256_file, sha256_text
+from app.utils.text import iter_text_windows, normalize_whitespace
+
+
+logger = logging.getLogger(__name__)
+
+# How often the coordinating thread flushes worker progress to the ingest run row.
+PROGRESS_FLUSH_SECONDS = 1.0
+# Keep the run's error message readable when many documents fail.
+MAX_REPORTED_FAILURES = 10
+
+
+@dataclass(frozen=True, slots=True)
+class DocumentSnapshot:
+    # Plain copy of the fields ingestion needs, so worker threads never lazy-load through
+    # the coordinating thread's ORM session.
+    id: uuid.UUID
+    filename: str
+    content_type: str
+    storage_path: str
+    content_hash: str | None
+    last_ingested_at: datetime | None
+    file_fingerprint: str | None
+    content_verified_at: datetime | None
+    ingest_checkpoint_hash: str | None
+    ingest_checkpoint_offset: int | None
+    ingest_checkpoint_chunk_index: int | None
+    file_metadata: dict | None
+
+    @classmethod
+    def from_model(cls, document: Document) -> "DocumentSnapshot":
+        return cls(
+            id=document.id,
+            filename=document.filename,
+            content_type=document.content_type,
+            storage_path=document.storage_path,
+            content_hash=document.content_hash,
+            last_ingested_at=document.last_ingested_at,
+            file_fingerprint=document.file_fingerprint,
+            content_verified_at=document.content_verified_at,
+            ingest_checkpoint_hash=document.ingest_checkpoint_hash,
+            ingest_checkpoint_offset=document.ingest_checkpoint_offset,
+            ingest_checkpoint_chunk_index=document.ingest_checkpoint_chunk_index,
+            file_metadata=dict(document.file_metadata) if document.file_metadata else None,
+        )
+
+
+@dataclass(slots=True)
+class PreparedDocument:
+    document: DocumentSnapshot
+    # Resolves once the background hash finishes; parsing does not wait for it.
+    content_hash: Future[str]
+    fingerprint: str
+    # Resume offsets are only known for streamed files.
+    parts: Iterable[TextPart]
+    streamed: bool
+    start_offset: int = 0
+    start_index: int = 0
+    # Set when ingest measured counts the upload left out (PDF pages).
+    file_metadata: dict | None = None
+
+
+@dataclass(slots=True)
+class ChunkBatch:
+    chunks: list[ChunkRecord]
+    stale_ids: list[str]
+    # (byte offset, next chunk index) to resume from once this batch is committed.
+    checkpoint: tuple[int | None, int]
+    embeddings: list[list[float]] | None = None
+
+
+class IngestCancelled(Exception):
+    # Raised when the caller gave up on the run, e.g. the worker lost its job lease to another worker.
+    pass
+
+
+@dataclass(slots=True)
+class IngestionRepositories:
+    document_repo: DocumentRepository
+    chunk_repo: ChunkRepository
+    chunk_embedding_repo: ChunkEmbeddingRepository | None
+
+
+RepositoryScope = Callable[[], AbstractContextManager[IngestionRepositories]]
+
+
+def session_repository_scope(session_factory: sessionmaker) -> RepositoryScope:
+    # Each document worker gets its own session (and pooled connection) for its transaction.
+    @contextmanager
+    def scope() -> Iterator[IngestionRepositories]:
+        db = session_factory()
+        try:
+            yield IngestionRepositories(DocumentRepository(db), ChunkRepository(db), ChunkEmbeddingRepository(db))
+        finally:
+            db.close()
+
+    return scope
+
+
+class IngestProgress:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.documents_processed = 0
+        self.chunks_created = 0
+        self._dirty = False
+
+    def add(self, documents: int = 0, chunks: int = 0) -> None:
+        with self._lock:
+            self.documents_processed += documents
+            self.chunks_created += chunks
+            self._dirty = True
+
+    def add_chunks(self, count: int) -> None:
+        self.add(chunks=count)
+
+    def pop_update(self) -> tuple[int, int] | None:
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            return self.documents_processed, self.chunks_created
 
 
 class IngestionService:
@@ -26,6 +164,10 @@ class IngestionService:
         ingest_run_repo: IngestRunRepository,
         openai_service: OpenAIService,
         vector_store: VectorStoreService,
+        chunk_embedding_repo: ChunkEmbeddingRepository | None = None,
+        repository_scope: RepositoryScope | None = None,
+        batch_sizer: EmbeddingBatchSizer | None = None,
+        extraction_pool: ExtractionPool | None = None,
     ) -> None:
         self._settings = settings
         self._knowledge_base_repo = knowledge_base_repo
@@ -34,12 +176,20 @@ class IngestionService:
         self._ingest_run_repo = ingest_run_repo
         self._openai = openai_service
         self._vector_store = vector_store
+        self._chunk_embedding_repo = chunk_embedding_repo
+        # Without a scope there is only the caller's session, so documents are synced one at a time.
+        self._repository_scope = repository_scope
+        self._batch_sizer = batch_sizer or get_shared_embedding_batch_sizer(settings)
+        if extraction_pool is None and settings.extract_process_pool_enabled:
+            extraction_pool = get_shared_extraction_pool(settings)
+        self._extraction_pool = extraction_pool
 
     def ingest(
         self,
         knowledge_base_id: uuid.UUID,
         user_id: uuid.UUID | None = None,
         run_id: uuid.UUID | None = None,
+        cancel: threading.Event | None = None,
     ) -> IngestRun:
         knowledge_base = self._knowledge_base_repo.get(knowledge_base_id)
         if not knowledge_base:
@@ -52,143 +202,505 @@ class IngestionService:
         else:
             run = self._ingest_run_repo.create(knowledge_base_id, user_id)
         start_time = time.perf_counter()
-        documents_processed = 0
-        chunks_created = 0
+        progress = IngestProgress()
+        cancel = cancel or threading.Event()
+        content_changed = False
 
         try:
-            documents = self._document_repo.list_by_knowledge_base(knowledge_base_id)
-            for document in documents:
-                content_hash = sha256_file(document.storage_path)
-                # Idempotency guard: skip if file contents match the last ingested hash.
-                if document.content_hash == content_hash and document.last_ingested_at:
-                    continue
-
-                stream = iter_streamable_chunks(
-                    document.storage_path,
-                    document.content_type,
-                    self._settings.chunk_size,
-                )
-                if stream is not None:
-                    existing_ids = self._chunk_repo.list_ids_by_document(document.id)
-                    if existing_ids:
-                        self._vector_store.delete_embeddings(str(knowledge_base_id), ids=existing_ids)
-                        self._chunk_repo.delete_by_document(document.id)
-
-                    batch_chunks: list[Chunk] = []
-                    batch_texts: list[str] = []
-                    index = 0
-                    for part in stream:
-                        normalized = normalize_whitespace(part)
-                        if not normalized:
-                            continue
-                        chunk_text_hash = sha256_text(normalized)
-                        chunk_id = uuid.uuid5(
-                            uuid.NAMESPACE_URL,
-                            f"{knowledge_base_id}:{document.id}:{index}:{chunk_text_hash}",
-                        )
-                        batch_chunks.append(
-                            Chunk(
-                                id=chunk_id,
-                                document_id=document.id,
-                                position=index,
-                                text=normalized,
-                                hash=chunk_text_hash,
-                            )
-                        )
-                        batch_texts.append(normalized)
-                        index += 1
-
-                        if len(batch_chunks) >= 10:
-                            self._chunk_repo.create_many(batch_chunks, commit=False)
-                            embeddings = self._openai.embed_texts(batch_texts)
-                            self._vector_store.add_embeddings(
-                                str(knowledge_base_id),
-                                batch_chunks,
-                                embeddings,
-                                document.filename,
-                            )
-                            self._chunk_repo.commit()
-                            chunks_created += len(batch_chunks)
-                            self._ingest_run_repo.update_progress(run.id, documents_processed, chunks_created)
-                            batch_chunks = []
-                            batch_texts = []
-
-                    if batch_chunks:
-                        self._chunk_repo.create_many(batch_chunks, commit=False)
-                        embeddings = self._openai.embed_texts(batch_texts)
-                        self._vector_store.add_embeddings(
-                            str(knowledge_base_id),
-                            batch_chunks,
-                            embeddings,
-                            document.filename,
-                        )
-                        self._chunk_repo.commit()
-                        chunks_created += len(batch_chunks)
-                        self._ingest_run_repo.update_progress(run.id, documents_processed, chunks_created)
-
-                    documents_processed += 1
-                    self._ingest_run_repo.update_progress(run.id, documents_processed, chunks_created)
-                    self._document_repo.update_ingestion_state(document.id, content_hash, datetime.utcnow())
-                    continue
-
-                raw_text = extract_text_from_file(document.storage_path, document.content_type)
-                normalized = normalize_whitespace(raw_text)
-                if not normalized:
-                    continue
-
-                parts = chunk_text(normalized, self._settings.chunk_size, self._settings.chunk_overlap)
-                chunks: list[Chunk] = []
-                for index, part in enumerate(parts):
-                    chunk_text_hash = sha256_text(part)
-                    # Deterministic chunk IDs keep vector IDs stable across re-ingests.
-                    chunk_id = uuid.uuid5(
-                        uuid.NAMESPACE_URL,
-                        f"{knowledge_base_id}:{document.id}:{index}:{chunk_text_hash}",
-                    )
-                    chunks.append(
-                        Chunk(
-                            id=chunk_id,
-                            document_id=document.id,
-                            position=index,
-                            text=part,
-                            hash=chunk_text_hash,
-                        )
-                    )
-
-                existing_ids = self._chunk_repo.list_ids_by_document(document.id)
-                if existing_ids:
-                    self._vector_store.delete_embeddings(str(knowledge_base_id), ids=existing_ids)
-                    self._chunk_repo.delete_by_document(document.id)
-
-                if chunks:
-                    self._chunk_repo.create_many(chunks, commit=False)
-                    embeddings = self._openai.embed_texts([chunk.text for chunk in chunks])
-                    self._vector_store.add_embeddings(str(knowledge_base_id), chunks, embeddings, document.filename)
-                    self._chunk_repo.commit()
-
-                documents_processed += 1
-                chunks_created += len(chunks)
-                self._ingest_run_repo.update_progress(run.id, documents_processed, chunks_created)
-                self._document_repo.update_ingestion_state(document.id, content_hash, datetime.utcnow())
+            documents = [
+                DocumentSnapshot.from_model(document)
+                for document in self._document_repo.list_by_knowledge_base(knowledge_base_id)
+            ]
+            content_changed, failures = self._ingest_documents(
+                knowledge_base_id, documents, run.id, progress, cancel
+            )
+            if cancel.is_set():
+                raise IngestCancelled("Ingest run was cancelled")
 
+            if content_changed:
+                self._knowledge_base_repo.bump_content_version(knowledge_base_id)
             duration_ms = int((time.perf_counter() - start_time) * 1000)
+            error_message = None
+            if failures:
+                error_message = f"{len(failures)} of {len(documents)} documents failed: " + "; ".join(
+                    failures[:MAX_REPORTED_FAILURES]
+                )
             run = self._ingest_run_repo.complete(
                 run.id,
-                status="completed",
-                documents_processed=documents_processed,
-                chunks_created=chunks_created,
+                status="failed" if failures else "completed",
+                documents_processed=progress.documents_processed,
+                chunks_created=progress.chunks_created,
                 duration_ms=duration_ms,
+                error_message=error_message,
             )
+        except IngestCancelled:
+            if content_changed:
+                self._knowledge_base_repo.bump_content_version(knowledge_base_id)
+            # Whoever cancelled the run owns its row now, so it is left as is.
+            raise
         except Exception as exc:  # noqa: BLE001
+            if content_changed:
+                # A partially re-indexed KB must not keep serving answers cached before the run.
+                self._knowledge_base_repo.bump_content_version(knowledge_base_id)
             duration_ms = int((time.perf_counter() - start_time) * 1000)
             run = self._ingest_run_repo.complete(
                 run.id,
                 status="failed",
-                documents_processed=documents_processed,
-                chunks_created=chunks_created,
+                documents_processed=progress.documents_processed,
+                chunks_created=progress.chunks_created,
                 duration_ms=duration_ms,
                 error_message=str(exc),
             )
             raise
 
         return run
+
+    def _ingest_documents(
+        self,
+        knowledge_base_id: uuid.UUID,
+        documents: list[DocumentSnapshot],
+        run_id: uuid.UUID,
+        progress: IngestProgress,
+        cancel: threading.Event,
+    ) -> tuple[bool, list[str]]:
+        # Hashing/extraction (CPU) and diff/embed/write (I/O) run on separate pools; a failing
+        # document is rolled back and reported without stopping the others. Once `cancel` is set no
+        # further document is started and in-flight ones stop before their next batch.
+        hash_workers = max(1, self._settings.ingest_extract_workers)
+        extract_workers = hash_workers
+        if self._extraction_pool is not None:
+            # Enough threads to keep every extraction process busy. Hashing stays at the configured
+            # width: it is disk-bound, and more concurrent whole-file reads only contend for the disk.
+            extract_workers = max(extract_workers, self._extraction_pool.workers)
+        embed_workers = max(1, self._settings.ingest_embed_workers) if self._repository_scope else 1
+        content_changed = False
+        failures: list[str] = []
+
+        with (
+            ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix="ingest-extract") as extract_pool,
+            ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="ingest-hash") as hash_pool,
+        ):
+            if embed_workers == 1:
+                shared = IngestionRepositories(self._document_repo, self._chunk_repo, self._chunk_embedding_repo)
+
+                def on_chunks_written(count: int) -> None:
+                    progress.add_chunks(count)
+                    self._flush_progress(run_id, progress)
+
+                # Extract up to `extract_workers` documents ahead of the one being embedded.
+                lookahead: deque[tuple[DocumentSnapshot, Future]] = deque()
+                queued = iter(documents)
+                for document in queued:
+                    lookahead.append((document, extract_pool.submit(self._prepare_document, document, hash_pool)))
+                    if len(lookahead) > extract_workers:
+                        break
+                while lookahead and not cancel.is_set():
+                    document, prepared = lookahead.popleft()
+                    next_document = next(queued, None)
+                    if next_document is not None:
+                        lookahead.append(
+                            (next_document, extract_pool.submit(self._prepare_document, next_document, hash_pool))
+                        )
+                    try:
+                        content_changed |= self._process_document(
+                            knowledge_base_id, prepared, shared, on_chunks_written, progress, cancel
+                        )
+                    except IngestCancelled:
+                        content_changed = True
+                    except Exception as exc:  # noqa: BLE001
+                        content_changed = True
+                        failures.append(f"{document.filename}: {exc}")
+                    self._flush_progress(run_id, progress)
+                return content_changed, failures
+
+            with ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix="ingest-embed") as document_pool:
+                queued = iter(documents)
+                pending: dict[Future, DocumentSnapshot] = {}
+
+                def submit_next() -> bool:
+                    document = next(queued, None) if not cancel.is_set() else None
+                    if document is None:
+                        return False
+                    prepared = extract_pool.submit(self._prepare_document, document, hash_pool)
+                    pending[
+                        document_pool.submit(self._process_in_scope, knowledge_base_id, prepared, progress, cancel)
+                    ] = document
+                    return True
+
+                # Extraction runs up to `extract_workers` documents ahead of the embedding workers,
+                # without holding every extracted document in memory at once.
+                while len(pending) < embed_workers + extract_workers and submit_next():
+                    pass
+                while pending:
+                    done, _ = wait(pending, timeout=PROGRESS_FLUSH_SECONDS, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        document = pending.pop(future)
+                        try:
+                            content_changed |= future.result()
+                        except IngestCancelled:
+                            content_changed = True
+                        except Exception as exc:  # noqa: BLE001
+                            content_changed = True
+                            failures.append(f"{document.filename}: {exc}")
+                        submit_next()
+                    # Only this thread writes the run row; workers just bump the shared counters.
+                    self._flush_progress(run_id, progress)
+        return content_changed, failures
+
+    def _process_in_scope(
+        self,
+        knowledge_base_id: uuid.UUID,
+        prepared: Future,
+        progress: IngestProgress,
+        cancel: threading.Event,
+    ) -> bool:
+        with self._repository_scope() as repos:
+            return self._process_document(knowledge_base_id, prepared, repos, progress.add_chunks, progress, cancel)
+
+    def _process_document(
+        self,
+        knowledge_base_id: uuid.UUID,
+        prepared: Future,
+        repos: IngestionRepositories,
+        on_chunks_written: Callable[[int], None],
+        progress: IngestProgress,
+        cancel: threading.Event,
+    ) -> bool:
+        document = prepared.result()
+        if document is None:
+            return False
+        # IDs upserted into the vector store whose rows are not committed yet.
+        uncommitted_vectors: list[str] = []
+        try:
+            changed = self._sync_document(
+                repos, knowledge_base_id, document, on_chunks_written, cancel, uncommitted_vectors
+            )
+        except Exception:
+            # The rows roll back, so their vectors must go too: a later diff only sees rows.
+            self._discard_vectors(knowledge_base_id, uncommitted_vectors)
+            repos.chunk_repo.rollback()
+            raise
+        if changed:
+            progress.add(documents=1)
+        return changed
+
+    def _discard_vectors(self, knowledge_base_id: uuid.UUID, ids: list[str]) -> None:
+        if not ids:
+            return
+        try:
+            self._vector_store.delete_embeddings(str(knowledge_base_id), ids=ids)
+        except Exception:  # noqa: BLE001
+            # The document's own failure is the one reported; this only leaves orphaned vectors.
+            logger.exception("Failed to delete %s uncommitted vectors", len(ids))
+
+    def _flush_progress(self, run_id: uuid.UUID, progress: IngestProgress) -> None:
+        update = progress.pop_update()
+        if update is not None:
+            self._ingest_run_repo.update_progress(run_id, *update)
+
+    def _prepare_document(self, document: DocumentSnapshot, hash_pool: ThreadPoolExecutor) -> PreparedDocument | None:
+        fingerprint = file_fingerprint(document.storage_path)
+        same_file = document.file_fingerprint == fingerprint
+        # Idempotency guard: an untouched, fully ingested file is skipped without reading it.
+        if (
+            same_file
+            and document.content_hash
+            and document.last_ingested_at
+            and document.ingest_checkpoint_offset is None
+            and not self._deep_verify_due(document)
+        ):
+            return None
+
+        # A checkpoint only applies to the exact file it was recorded for. It carries the file's hash
+        # unless it was saved before the background hash finished.
+        start_offset, start_index = 0, 0
+        if same_file and document.ingest_checkpoint_offset is not None:
+            start_offset = document.ingest_checkpoint_offset
+            start_index = document.ingest_checkpoint_chunk_index or 0
+            if document.ingest_checkpoint_hash:
+                content_hash: Future[str] = Future()
+                content_hash.set_result(document.ingest_checkpoint_hash)
+            else:
+                content_hash = hash_pool.submit(sha256_file, document.storage_path)
+        elif same_file and document.content_hash and not document.last_ingested_at:
+            # Hashed while the upload was written and untouched since.
+            content_hash = Future()
+            content_hash.set_result(document.content_hash)
+        else:
+            # Hashing a multi-GB file takes as long as reading it, so it overlaps parsing below.
+            content_hash = hash_pool.submit(sha256_file, document.storage_path)
+        file_metadata = self._measure_pdf(document)
+        runner = run_inline
+        if self._extraction_pool is not None:
+            # Office and PDF files are parsed in an extraction process and streamed back.
+            runner = self._extraction_pool.iter_extract
+        stream = iter_streamable_chunks(
+            document.storage_path,
+            document.content_type,
+            self._settings.chunk_size,
+            start_offset=start_offset,
+            chunk_overlap=self._settings.chunk_overlap,
+            runner=runner,
+        )
+        if stream is not None:
+            # Streamed files are parsed lazily by the pipeline's extract stage.
+            return PreparedDocument(
+                document,
+                content_hash,
+                fingerprint,
+                stream,
+                streamed=True,
+                start_offset=start_offset,
+                start_index=start_index,
+                file_metadata=file_metadata,
+            )
+        if self._extraction_pool is not None:
+            text = self._extraction_pool.extract(document.storage_path, document.content_type)
+        else:
+            text = extract_text_from_file(document.storage_path, document.content_type)
+        windows = iter_text_windows((text,), self._settings.chunk_size, self._settings.chunk_overlap)
+        parts = [TextPart(window.text, hash=window.hash) for window in windows]
+        return PreparedDocument(document, content_hash, fingerprint, parts, streamed=False, file_metadata=file_metadata)
+
+    def _measure_pdf(self, document: DocumentSnapshot) -> dict | None:
+        # Counting pages parses the PDF's page tree, so it happens here rather than in the upload request.
+        is_pdf = document.content_type == "application/pdf" or document.storage_path.lower().endswith(".pdf")
+        if not is_pdf or "page_count" in (document.file_metadata or {}):
+            return None
+        if self._extraction_pool is None:
+            metadata = read_pdf_metadata(document.storage_path)
+        else:
+            try:
+                metadata = self._extraction_pool.run(read_pdf_metadata, document.storage_path)
+            except ValueError:
+                # Best effort, as at upload: a broken PDF is reported by its extraction.
+                metadata = {}
+        return {**(document.file_metadata or {}), **metadata} if metadata else None
+
+    def _deep_verify_due(self, document: DocumentSnapshot) -> bool:
+        # Stat fingerprints miss in-place edits that restore mtime; a periodic re-hash catches them.
+        interval_hours = self._settings.ingest_deep_verify_hours
+        if interval_hours <= 0:
+            return False
+        verified_at = document.content_verified_at
+        if verified_at is None:
+            return True
+        if verified_at.tzinfo is not None:
+            verified_at = verified_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return datetime.utcnow() - verified_at >= timedelta(hours=interval_hours)
+
+    def _sync_document(
+        self,
+        repos: IngestionRepositories,
+        knowledge_base_id: uuid.UUID,
+        prepared: PreparedDocument,
+        on_chunks_written: Callable[[int], None],
+        cancel: threading.Event,
+        uncommitted_vectors: list[str],
+    ) -> bool:
+        # Diff mode: chunk IDs are deterministic, so unchanged chunks keep their rows and
+        # vectors; only new IDs are embedded/inserted and only replaced or vanished IDs are
+        # deleted. Rows before a resume checkpoint were already reconciled by the earlier run.
+        document = prepared.document
+        existing: dict[int, set[str]] = {}
+        for chunk_id, position in repos.chunk_repo.list_positions_by_document(
+            document.id, from_position=prepared.start_index
+        ):
+            existing.setdefault(position, set()).add(str(chunk_id))
+        # Without a repository scope the embed stage's cache lookups share the writer's session.
+        session_lock = threading.Lock()
+        # Owned by the chunk stage thread until the pipeline has finished.
+        checkpoint: tuple[int | None, int] = (prepared.start_offset, prepared.start_index)
+        pending_stale: list[str] = []
+        removed_ids: list[str] = []
+        uncommitted = 0
+        batches_written = 0
+
+        def content_unchanged() -> bool:
+            # Blocks on the background hash. Only a fully ingested document can turn out to be a no-op.
+            return (
+                document.last_ingested_at is not None
+                and document.ingest_checkpoint_offset is None
+                and prepared.content_hash.result() == document.content_hash
+            )
+
+        def new_chunks(parts: Iterable[TextPart]) -> Iterator[ChunkRecord]:
+            nonlocal checkpoint
+            resume_at = checkpoint
+            for chunk, resume_offset in self._build_chunks(knowledge_base_id, document, parts, prepared.start_index):
+                # Safe resume point for as long as this chunk is not part of an emitted batch. A
+                # streamed part without a resume offset leaves the previous one in force.
+                checkpoint = resume_at
+                if resume_offset is not None or not prepared.streamed:
+                    resume_at = (resume_offset, chunk.position + 1)
+                chunk_id = str(chunk.id)
+                position_ids = existing.pop(chunk.position, set())
+                pending_stale.extend(sorted(position_ids - {chunk_id}))
+                if chunk_id not in position_ids:
+                    yield chunk
+            checkpoint = resume_at
+
+        def normalized(parts: Iterable[TextPart]) -> Iterator[TextPart]:
+            for part in parts:
+                part.text = normalize_whitespace(part.text)
+                yield part
+
+        def chunk_stage(parts: Iterable[TextPart]) -> Iterator[ChunkBatch]:
+            if prepared.streamed:
+                parts = normalized(parts)
+            # Packed by estimated tokens rather than a fixed count, so short CSV rows share a request.
+            for batch in self._batch_sizer.batches(new_chunks(parts), lambda chunk: chunk.text):
+                stale = pending_stale[:]
+                pending_stale.clear()
+                yield ChunkBatch(batch, stale, checkpoint)
+
+        def embed_stage(batches: Iterable[ChunkBatch]) -> Iterator[ChunkBatch]:
+            if self._repository_scope is None:
+                for batch in batches:
+                    batch.embeddings = self._embed_chunks(batch.chunks, repos.chunk_embedding_repo, session_lock)
+                    yield batch
+                return
+            # Own session for the embedding cache, so no session is shared across pipeline threads.
+            # Cache rows commit per batch: they stay valid even if this document's write fails.
+            with self._repository_scope() as embed_repos:
+                cache_repo = embed_repos.chunk_embedding_repo
+                for batch in batches:
+                    batch.embeddings = self._embed_chunks(batch.chunks, cache_repo)
+                    if cache_repo is not None:
+                        cache_repo.commit()
+                    yield batch
+
+        def write_stage(batch: ChunkBatch) -> None:
+            nonlocal uncommitted, batches_written
+            if cancel.is_set():
+                raise IngestCancelled("Ingest run was cancelled")
+            with session_lock:
+                repos.chunk_repo.create_many(batch.chunks, commit=False)
+                if batch.stale_ids:
+                    repos.chunk_repo.delete_many(batch.stale_ids, commit=False)
+            # Recorded first: a failed upsert may still have stored some of the batch.
+            uncommitted_vectors.extend(str(chunk.id) for chunk in batch.chunks)
+            self._vector_store.add_embeddings(str(knowledge_base_id), batch.chunks, batch.embeddings, document.filename)
+            batches_written += 1
+            if not prepared.streamed:
+                uncommitted += len(batch.chunks)
+                removed_ids.extend(batch.stale_ids)
+                return
+            # Vectors go before the commit: if the delete fails the rows roll back with it, so a
+            # later run still finds the stale IDs and deletes them then.
+            if batch.stale_ids:
+                self._vector_store.delete_embeddings(str(knowledge_base_id), ids=batch.stale_ids)
+            # Streamed files can be multi-GB, so each batch commits together with the checkpoint
+            # it advances; a failed run resumes from the last one instead of byte 0.
+            # The hash is attached once the background hash is done; writes never wait for it.
+            offset, next_index = batch.checkpoint
+            content_hash = prepared.content_hash.result() if prepared.content_hash.done() else None
+            with session_lock:
+                repos.document_repo.save_ingest_checkpoint(
+                    document.id, content_hash, offset, next_index, prepared.fingerprint
+                )
+            uncommitted_vectors.clear()
+            on_chunks_written(len(batch.chunks))
+
+        StagedPipeline(self._settings.ingest_pipeline_queue_size).run(
+            ("extract", prepared.parts),
+            [("chunk", chunk_stage), ("embed", embed_stage)],
+            ("write", write_stage),
+        )
+
+        # Leftovers: replaced rows not yet attached to a batch, and positions past the new end.
+        final_stale = pending_stale + sorted(chunk_id for ids in existing.values() for chunk_id in ids)
+        # The hash is only compared now, so parsing never waits for it: a touched but byte-identical
+        # file produced the same chunk IDs, so the diff above had nothing to write.
+        if not batches_written and not final_stale and content_unchanged():
+            repos.document_repo.mark_content_verified(document.id, prepared.fingerprint, datetime.utcnow())
+            return False
+
+        if final_stale:
+            repos.chunk_repo.delete_many(final_stale, commit=False)
+        removed_ids.extend(final_stale)
+        # Before the commit, for the same reason as in write_stage: a failed delete leaves the
+        # rows (and the old content hash) in place for the next run to reconcile.
+        if removed_ids:
+            self._vector_store.delete_embeddings(str(knowledge_base_id), ids=removed_ids)
+        # Commits the remaining inserts, the deletes and the new content hash together.
+        repos.document_repo.update_ingestion_state(
+            document.id,
+            prepared.content_hash.result(),
+            datetime.utcnow(),
+            prepared.fingerprint,
+            file_metadata=prepared.file_metadata,
+        )
+        uncommitted_vectors.clear()
+        if uncommitted:
+            on_chunks_written(uncommitted)
+        return True
+
+    def _build_chunks(
+        self,
+        knowledge_base_id: uuid.UUID,
+        document: DocumentSnapshot,
+        parts: Iterable[TextPart],
+        start_index: int = 0,
+    ) -> Iterator[tuple[ChunkRecord, int | None]]:
+        index = start_index
+        for part in parts:
+            if not part.text:
+                continue
+            chunk_text_hash = part.hash or sha256_text(part.text)
+            # Deterministic chunk IDs keep vector IDs stable across re-ingests. The position is part
+            # of the ID, so a chunk inserted early in a document re-keys (and rewrites) every later one.
+            chunk_id = uuid.uuid5(
+                uuid.NAMESPACE_URL,
+                f"{knowledge_base_id}:{document.id}:{index}:{chunk_text_hash}",
+            )
+            chunk = ChunkRecord(
+                id=chunk_id,
+                document_id=document.id,
+                position=index,
+                text=part.text,
+                hash=chunk_text_hash,
+                page_start=part.page_start,
+                page_end=part.page_end,
+                byte_start=part.byte_start,
+                byte_end=part.byte_end,
+            )
+            yield chunk, part.resume_offset
+            index += 1
+
+    def _embed_chunks(
+        self,
+        chunks: list[ChunkRecord],
+        chunk_embedding_repo: ChunkEmbeddingRepository | None,
+        session_lock: AbstractContextManager = nullcontext(),
+    ) -> list[list[float]]:
+        # Identical chunk text (same hash) is only ever embedded once per embed model.
+        if chunk_embedding_repo is None or not self._settings.chunk_embedding_cache_enabled:
+            return self._embed_texts([chunk.text for chunk in chunks])
+
+        embed_model = self._settings.openai_embed_model
+        with session_lock:
+            known = chunk_embedding_repo.get_many(embed_model, [chunk.hash for chunk in chunks])
+        missing: dict[str, str] = {}
+        for chunk in chunks:
+            if chunk.hash not in known and chunk.hash not in missing:
+                missing[chunk.hash] = chunk.text
+
+        if missing:
+            vectors = self._embed_texts(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            with session_lock:
+                chunk_embedding_repo.put_many(embed_model, fresh, dtype=self._settings.chunk_embedding_cache_dtype)
+            known.update(fresh)
+
+        return [known[chunk.hash] for chunk in chunks]
+
+    def _embed_texts(self, texts: list[str]) -> list[list[float]]:
+        started = time.perf_counter()
+        try:
+            vectors = self._openai.embed_texts(texts)
+        except Exception:
+            self._batch_sizer.observe_failure()
+            raise
+        self._batch_sizer.observe(sum(estimate_tokens(text) for text in texts), time.perf_counter() - started)
+        return vectors
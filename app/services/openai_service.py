@@ -1,22 +1,236 @@
-from openai import OpenAI
+from collections.abc import AsyncIterator
+import importlib.util
+import threading
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
 
 from app.core.config import Settings
+from app.services.embedding_batcher import estimate_tokens
+from app.services.embedding_dispatcher import (
+    INGEST_PRIORITY,
+    QUERY_PRIORITY,
+    EmbeddingDispatcher,
+    get_shared_embedding_dispatcher,
+)
+
+
+class HttpPoolMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.responses = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def increment(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def trace(self, event_name: str, info: dict) -> None:
+        # httpcore only emits connect/TLS events when a new connection is opened.
+        if event_name == "connection.connect_tcp.complete":
+            self.increment("connections_opened")
+        elif event_name == "connection.start_tls.complete":
+            self.increment("tls_handshakes")
+
+    async def atrace(self, event_name: str, info: dict) -> None:
+        self.trace(event_name, info)
+
+    def on_request(self, request: httpx.Request) -> None:
+        self.increment("requests")
+        request.extensions["trace"] = self.trace
+
+    def on_response(self, response: httpx.Response) -> None:
+        self.increment("responses")
+
+    async def aon_request(self, request: httpx.Request) -> None:
+        self.increment("requests")
+        request.extensions["trace"] = self.atrace
+
+    async def aon_response(self, response: httpx.Response) -> None:
+        self.increment("responses")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "responses": self.responses,
+                "connections_opened": self.connections_opened,
+                "connections_reused": max(0, self.requests - self.connections_opened),
+                "tls_handshakes": self.tls_handshakes,
+            }
+
+
+http_pool_metrics = HttpPoolMetrics()
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def _http_client_options(settings: Settings) -> dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+            keepalive_expiry=settings.openai_keepalive_expiry_seconds,
+        ),
+        "http2": settings.openai_http2 and _http2_available(),
+        "timeout": httpx.Timeout(
+            settings.openai_generate_read_timeout_seconds,
+            connect=settings.openai_connect_timeout_seconds,
+        ),
+        "follow_redirects": True,
+    }
+
+
+def build_http_client(settings: Settings) -> httpx.Client:
+    return httpx.Client(
+        **_http_client_options(settings),
+        event_hooks={"request": [http_pool_metrics.on_request], "response": [http_pool_metrics.on_response]},
+    )
+
+
+def build_async_http_client(settings: Settings) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        **_http_client_options(settings),
+        event_hooks={"request": [http_pool_metrics.aon_request], "response": [http_pool_metrics.aon_response]},
+    )
+
+
+_shared_client: OpenAI | None = None
+_shared_async_client: AsyncOpenAI | None = None
+_shared_lock = threading.Lock()
+
+
+def init_openai_client(settings: Settings) -> OpenAI | None:
+    global _shared_client
+    if not settings.openai_api_key:
+        return None
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = OpenAI(
+                api_key=settings.openai_api_key,
+                http_client=build_http_client(settings),
+            )
+        return _shared_client
+
+
+def get_shared_openai_client(settings: Settings) -> OpenAI:
+    # One keep-alive connection pool per process; settings only apply on first use.
+    if _shared_client is None:
+        client = init_openai_client(settings)
+        if client is None:
+            raise ValueError("OPENAI_API_KEY is not set")
+        return client
+    return _shared_client
+
+
+def init_async_openai_client(settings: Settings) -> AsyncOpenAI | None:
+    global _shared_async_client
+    if not settings.openai_api_key:
+        return None
+    with _shared_lock:
+        if _shared_async_client is None:
+            _shared_async_client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                http_client=build_async_http_client(settings),
+            )
+        return _shared_async_client
+
+
+def get_shared_async_openai_client(settings: Settings) -> AsyncOpenAI:
+    if _shared_async_client is None:
+        client = init_async_openai_client(settings)
+        if client is None:
+            raise ValueError("OPENAI_API_KEY is not set")
+        return client
+    return _shared_async_client
+
+
+def get_openai_client_stats() -> dict:
+    return http_pool_metrics.snapshot()
+
+
+def close_openai_client() -> None:
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+        _shared_client = None
+
+
+async def aclose_openai_clients() -> None:
+    global _shared_async_client
+    close_openai_client()
+    with _shared_lock:
+        client = _shared_async_client
+        _shared_async_client = None
+    if client is not None:
+        await client.close()
 
 
 class OpenAIService:
-    def __init__(self, settings: Settings) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        client: OpenAI | None = None,
+        async_client: AsyncOpenAI | None = None,
+        dispatcher: EmbeddingDispatcher | None = None,
+    ) -> None:
         if not settings.openai_api_key:
             raise ValueError("OPENAI_API_KEY is not set")
-        self._client = OpenAI(api_key=settings.openai_api_key)
+        self._settings = settings
+        self._client = client or get_shared_openai_client(settings)
+        self._async_client = async_client
+        self._dispatcher = dispatcher or get_shared_embedding_dispatcher(settings)
         self._embed_model = settings.openai_embed_model
         self._gen_model = settings.openai_gen_model
+        self._embed_timeout = httpx.Timeout(
+            settings.openai_embed_read_timeout_seconds,
+            connect=settings.openai_connect_timeout_seconds,
+        )
+        self._generate_timeout = httpx.Timeout(
+            settings.openai_generate_read_timeout_seconds,
+            connect=settings.openai_connect_timeout_seconds,
+        )
 
-    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+    def embed_texts(self, texts: list[str], priority: int = INGEST_PRIORITY) -> list[list[float]]:
         if not texts:
             return []
-        response = self._client.embeddings.create(model=self._embed_model, input=texts)
+        if priority == QUERY_PRIORITY:
+            # Query lane: called directly so a question never waits behind bulk ingest batches
+            # on the dispatcher's workers; the request still counts against the shared budget.
+            self._dispatcher.charge(self._estimate_tokens(texts))
+            response = self._client.embeddings.create(model=self._embed_model, input=texts, timeout=self._embed_timeout)
+            return [item.embedding for item in response.data]
+        return self._dispatch_embed(texts, priority).result()
+
+    async def aembed_texts(self, texts: list[str]) -> list[list[float]]:
+        # Query lane on the async client, like embed_texts(priority=QUERY_PRIORITY).
+        if not texts:
+            return []
+        self._dispatcher.charge(self._estimate_tokens(texts))
+        response = await self._get_async_client().embeddings.create(
+            model=self._embed_model, input=texts, timeout=self._embed_timeout
+        )
         return [item.embedding for item in response.data]
 
+    def _dispatch_embed(self, texts: list[str], priority: int):
+        # The dispatcher retries 429s (with a shared cooldown) and transient errors itself, so the
+        # SDK's own retries are turned off for queued calls.
+        client = self._client.with_options(max_retries=0)
+
+        def call() -> list[list[float]]:
+            response = client.embeddings.create(model=self._embed_model, input=texts, timeout=self._embed_timeout)
+            return [item.embedding for item in response.data]
+
+        return self._dispatcher.submit(call, self._estimate_tokens(texts), priority)
+
+    def _estimate_tokens(self, texts: list[str]) -> int:
+        return sum(estimate_tokens(text) for text in texts)
+
     def generate_answer(self, system_prompt: str, user_prompt: str) -> tuple[str, dict | None]:
         if not self._gen_model:
             raise ValueError("OPENAI_GEN_MODEL is not set")
@@ -27,13 +241,60 @@ class OpenAIService:
                 {"role": "user", "content": user_prompt},
             ],
             temperature=0.2,
+            timeout=self._generate_timeout,
         )
+        return self._parse_completion(response)
+
+    async def agenerate_answer(self, system_prompt: str, user_prompt: str) -> tuple[str, dict | None]:
+        if not self._gen_model:
+            raise ValueError("OPENAI_GEN_MODEL is not set")
+        response = await self._get_async_client().chat.completions.create(
+            model=self._gen_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0.2,
+            timeout=self._generate_timeout,
+        )
+        return self._parse_completion(response)
+
+    async def astream_answer(self, system_prompt: str, user_prompt: str) -> AsyncIterator[tuple[str, object]]:
+        # Yields ("token", text) deltas as they arrive, then ("usage", dict) when reported.
+        if not self._gen_model:
+            raise ValueError("OPENAI_GEN_MODEL is not set")
+        stream = await self._get_async_client().chat.completions.create(
+            model=self._gen_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0.2,
+            timeout=self._generate_timeout,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for event in stream:
+            if event.choices:
+                delta = event.choices[0].delta.content
+                if delta:
+                    yield "token", delta
+            if event.usage:
+                yield "usage", self._parse_usage(event.usage)
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        if self._async_client is None:
+            self._async_client = get_shared_async_openai_client(self._settings)
+        return self._async_client
+
+    def _parse_completion(self, response) -> tuple[str, dict | None]:
         content = response.choices[0].message.content or ""
-        usage = None
-        if response.usage:
-            usage = {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens,
-            }
+        usage = self._parse_usage(response.usage) if response.usage else None
         return content.strip(), usage
+
+    def _parse_usage(self, usage) -> dict:
+        return {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+        }
@@ -1,14 +1,43 @@
-from app.core.config import Settings
-from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
+import asyncio
+from collections.abc import AsyncIterator
 import time
 
+from app.core.config import Settings
+from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
 from app.models.query_log import QueryLog
 from app.repositories.query_log_repository import QueryLogRepository
 from app.schemas.query import QueryRequest, QueryResponse, QuerySource
+from app.services.answer_cache import AnswerCache, AnswerCacheKey, build_answer_cache_key
+from app.services.embedding_cache import QueryEmbeddingCache
+from app.services.embedding_dispatcher import QUERY_PRIORITY
 from app.services.openai_service import OpenAIService
 from app.services.vector_store_service import VectorStoreService
 
 
+NO_ANSWER = "I don't have enough information in the provided documents."
+
+SYSTEM_PROMPT = (
+    "You are a precise assistant answering questions using only the provided context. "
+    "If the context is insufficient, say: 'I don't have enough information in the provided documents.'"
+)
+
+
+def _elapsed_ms(start: float) -> int:
+    return int((time.perf_counter() - start) * 1000)
+
+
+def _new_timings() -> dict:
+    return {
+        "embed_ms": None,
+        "retrieve_ms": None,
+        "generate_ms": None,
+        "ttft_ms": None,
+        "retrieved_count": 0,
+        "embedding_cache_hit": None,
+        "answer_cache_hit": False,
+    }
+
+
 class RagService:
     def __init__(
         self,
@@ -17,12 +46,16 @@ class RagService:
         openai_service: OpenAIService,
         vector_store: VectorStoreService,
         query_log_repo: QueryLogRepository,
+        embedding_cache: QueryEmbeddingCache | None = None,
+        answer_cache: AnswerCache | None = None,
     ) -> None:
         self._settings = settings
         self._knowledge_base_repo = knowledge_base_repo
         self._openai = openai_service
         self._vector_store = vector_store
         self._query_log_repo = query_log_repo
+        self._embedding_cache = embedding_cache
+        self._answer_cache = answer_cache
 
     def query(self, knowledge_base_id: str, payload: QueryRequest, user_id) -> QueryResponse:
         knowledge_base = self._knowledge_base_repo.get(knowledge_base_id)
@@ -30,158 +63,305 @@ class RagService:
             raise ValueError("Knowledge base not found")
 
         started = time.perf_counter()
-        embed_ms = retrieve_ms = generate_ms = None
-        retrieved_count = 0
-        error_message = None
+        timings = _new_timings()
+        cache_key = self._answer_cache_key(knowledge_base, knowledge_base_id, payload)
+        cached = self._cached_answer(cache_key, timings)
+        if cached is not None:
+            self._query_log_repo.create(self._build_log(knowledge_base_id, payload, user_id, started, timings))
+            return cached
 
         try:
             embed_start = time.perf_counter()
-            embedding = self._openai.embed_texts([payload.question])[0]
-            embed_ms = int((time.perf_counter() - embed_start) * 1000)
+            embedding = self._embed_question(payload.question, timings)
+            timings["embed_ms"] = _elapsed_ms(embed_start)
 
             retrieve_start = time.perf_counter()
             results = self._vector_store.query(str(knowledge_base_id), embedding, payload.top_k)
-            retrieve_ms = int((time.perf_counter() - retrieve_start) * 1000)
-
-            documents = results.get("documents", [[]])[0]
-            metadatas = results.get("metadatas", [[]])[0]
-            distances = results.get("distances", [[]])[0]
-            retrieved_count = len(documents)
-
-            sources: list[QuerySource] = []
-            context_blocks: list[str] = []
-
-            for idx, text in enumerate(documents):
-                metadata = metadatas[idx] if idx < len(metadatas) else {}
-                distance = distances[idx] if idx < len(distances) else None
-                score = 0.0
-                if isinstance(distance, (int, float)):
-                    # Convert distance to a "higher is better" score for UI display.
-                    score = max(0.0, 1.0 - float(distance))
-
-                chunk_id = metadata.get("chunk_id", "")
-                document_id = metadata.get("document_id", "")
-                filename = metadata.get("filename", "")
-                excerpt = (text or "")[:240]
-
-                sources.append(
-                    QuerySource(
-                        chunk_id=chunk_id,
-                        document_id=document_id,
-                        filename=filename,
-                        score=score,
-                        excerpt=excerpt,
-                    )
-                )
-                context_blocks.append(f"[{idx + 1}] {text}")
+            timings["retrieve_ms"] = _elapsed_ms(retrieve_start)
+
+            sources, context_blocks = self._build_sources(results)
+            timings["retrieved_count"] = len(sources)
 
             if not context_blocks:
-                response = QueryResponse(
-                    answer="I don't have enough information in the provided documents.",
-                    sources=[],
-                )
-                total_ms = int((time.perf_counter() - started) * 1000)
-                self._query_log_repo.create(
-                    QueryLog(
-                        knowledge_base_id=knowledge_base_id,
-                        user_id=user_id,
-                        query_text=payload.question,
-                        latency_ms=total_ms,
-                        embed_ms=embed_ms,
-                        retrieve_ms=retrieve_ms,
-                        generate_ms=generate_ms,
-                        retrieved_k=payload.top_k,
-                        retrieved_count=retrieved_count,
-                        prompt_tokens=None,
-                        completion_tokens=None,
-                        total_tokens=None,
-                        cost_usd=None,
-                        model=self._settings.openai_gen_model or None,
-                        embedding_model=self._settings.openai_embed_model,
-                        vector_db="chroma",
-                        error=None,
-                    )
-                )
+                response = QueryResponse(answer=NO_ANSWER, sources=[])
+                self._remember_answer(cache_key, response)
+                self._query_log_repo.create(self._build_log(knowledge_base_id, payload, user_id, started, timings))
                 return response
 
-            system_prompt = (
-                "You are a precise assistant answering questions using only the provided context. "
-                "If the context is insufficient, say: 'I don't have enough information in the provided documents.'"
+            generate_start = time.perf_counter()
+            answer, usage = self._openai.generate_answer(SYSTEM_PROMPT, self._build_user_prompt(payload, context_blocks))
+            timings["generate_ms"] = _elapsed_ms(generate_start)
+
+            response = QueryResponse(answer=answer or NO_ANSWER, sources=sources)
+            self._remember_answer(cache_key, response)
+            self._query_log_repo.create(
+                self._build_log(knowledge_base_id, payload, user_id, started, timings, usage=usage)
             )
-            user_prompt = (
-                "Answer the question using only the context below. "
-                "Cite sources inline using [1], [2], etc.\n\n"
-                f"Context:\n{chr(10).join(context_blocks)}\n\n"
-                f"Question: {payload.question}"
+            return response
+        except Exception as exc:  # noqa: BLE001
+            self._query_log_repo.create(
+                self._build_log(knowledge_base_id, payload, user_id, started, timings, error=str(exc))
             )
+            raise
+
+    async def aquery(self, knowledge_base_id: str, payload: QueryRequest, user_id) -> QueryResponse:
+        # Same pipeline as query(), but OpenAI calls are awaited on the async client and
+        # blocking Chroma/Postgres work is pushed off the event loop.
+        knowledge_base = await asyncio.to_thread(self._knowledge_base_repo.get, knowledge_base_id)
+        if not knowledge_base:
+            raise ValueError("Knowledge base not found")
+
+        started = time.perf_counter()
+        timings = _new_timings()
+        cache_key = self._answer_cache_key(knowledge_base, knowledge_base_id, payload)
+        cached = self._cached_answer(cache_key, timings)
+        if cached is not None:
+            await self._awrite_log(self._build_log(knowledge_base_id, payload, user_id, started, timings))
+            return cached
+
+        try:
+            embed_start = time.perf_counter()
+            embedding = await self._aembed_question(payload.question, timings)
+            timings["embed_ms"] = _elapsed_ms(embed_start)
+
+            retrieve_start = time.perf_counter()
+            results = await self._vector_store.aquery(str(knowledge_base_id), embedding, payload.top_k)
+            timings["retrieve_ms"] = _elapsed_ms(retrieve_start)
+
+            sources, context_blocks = self._build_sources(results)
+            timings["retrieved_count"] = len(sources)
+
+            if not context_blocks:
+                response = QueryResponse(answer=NO_ANSWER, sources=[])
+                self._remember_answer(cache_key, response)
+                await self._awrite_log(self._build_log(knowledge_base_id, payload, user_id, started, timings))
+                return response
 
             generate_start = time.perf_counter()
-            answer, usage = self._openai.generate_answer(system_prompt, user_prompt)
-            generate_ms = int((time.perf_counter() - generate_start) * 1000)
-            if not answer:
-                answer = "I don't have enough information in the provided documents."
-
-            prompt_tokens = usage.get("prompt_tokens") if usage else None
-            completion_tokens = usage.get("completion_tokens") if usage else None
-            total_tokens = usage.get("total_tokens") if usage else None
-            cost_usd = None
-            if (
-                usage
-                and self._settings.openai_prompt_cost_per_1k
-                and self._settings.openai_completion_cost_per_1k
-            ):
-                # Cost is derived from token usage when pricing is configured.
-                cost_usd = (
-                    (prompt_tokens or 0) * self._settings.openai_prompt_cost_per_1k
-                    + (completion_tokens or 0) * self._settings.openai_completion_cost_per_1k
-                ) / 1000
-
-            response = QueryResponse(answer=answer, sources=sources)
-            total_ms = int((time.perf_counter() - started) * 1000)
-            self._query_log_repo.create(
-                QueryLog(
-                    knowledge_base_id=knowledge_base_id,
-                    user_id=user_id,
-                    query_text=payload.question,
-                    latency_ms=total_ms,
-                    embed_ms=embed_ms,
-                    retrieve_ms=retrieve_ms,
-                    generate_ms=generate_ms,
-                    retrieved_k=payload.top_k,
-                    retrieved_count=retrieved_count,
-                    prompt_tokens=prompt_tokens,
-                    completion_tokens=completion_tokens,
-                    total_tokens=total_tokens,
-                    cost_usd=cost_usd,
-                    model=self._settings.openai_gen_model or None,
-                    embedding_model=self._settings.openai_embed_model,
-                    vector_db="chroma",
-                    error=None,
-                )
+            answer, usage = await self._openai.agenerate_answer(
+                SYSTEM_PROMPT, self._build_user_prompt(payload, context_blocks)
             )
+            timings["generate_ms"] = _elapsed_ms(generate_start)
+
+            response = QueryResponse(answer=answer or NO_ANSWER, sources=sources)
+            self._remember_answer(cache_key, response)
+            await self._awrite_log(self._build_log(knowledge_base_id, payload, user_id, started, timings, usage=usage))
             return response
         except Exception as exc:  # noqa: BLE001
-            total_ms = int((time.perf_counter() - started) * 1000)
-            error_message = str(exc)
-            self._query_log_repo.create(
-                QueryLog(
-                    knowledge_base_id=knowledge_base_id,
-                    user_id=user_id,
-                    query_text=payload.question,
-                    latency_ms=total_ms,
-                    embed_ms=embed_ms,
-                    retrieve_ms=retrieve_ms,
-                    generate_ms=generate_ms,
-                    retrieved_k=payload.top_k,
-                    retrieved_count=retrieved_count,
-                    prompt_tokens=None,
-                    completion_tokens=None,
-                    total_tokens=None,
-                    cost_usd=None,
-                    model=self._settings.openai_gen_model or None,
-                    embedding_model=self._settings.openai_embed_model,
-                    vector_db="chroma",
-                    error=error_message,
-                )
+            await self._awrite_log(
+                self._build_log(knowledge_base_id, payload, user_id, started, timings, error=str(exc))
             )
             raise
+
+    async def astream_query(
+        self, knowledge_base_id: str, payload: QueryRequest, user_id
+    ) -> AsyncIterator[tuple[str, object]]:
+        # Yields ("sources", list[QuerySource]), then ("token", str) deltas, then ("done", dict).
+        # Headers are already sent once streaming starts, so failures become a final "error" event.
+        knowledge_base = await asyncio.to_thread(self._knowledge_base_repo.get, knowledge_base_id)
+        if not knowledge_base:
+            yield "error", "Knowledge base not found"
+            return
+
+        started = time.perf_counter()
+        timings = _new_timings()
+        usage = None
+        log: QueryLog | None = None
+        try:
+            cache_key = self._answer_cache_key(knowledge_base, knowledge_base_id, payload)
+            cached = self._cached_answer(cache_key, timings)
+            if cached is not None:
+                yield "sources", cached.sources
+                timings["ttft_ms"] = _elapsed_ms(started)
+                yield "token", cached.answer
+                log = self._build_log(knowledge_base_id, payload, user_id, started, timings)
+                yield "done", {
+                    "answer": cached.answer,
+                    "latency_ms": log.latency_ms,
+                    "ttft_ms": log.ttft_ms,
+                    "usage": None,
+                }
+                return
+
+            embed_start = time.perf_counter()
+            embedding = await self._aembed_question(payload.question, timings)
+            timings["embed_ms"] = _elapsed_ms(embed_start)
+
+            retrieve_start = time.perf_counter()
+            results = await self._vector_store.aquery(str(knowledge_base_id), embedding, payload.top_k)
+            timings["retrieve_ms"] = _elapsed_ms(retrieve_start)
+
+            sources, context_blocks = self._build_sources(results)
+            timings["retrieved_count"] = len(sources)
+            yield "sources", sources
+
+            parts: list[str] = []
+            if context_blocks:
+                generate_start = time.perf_counter()
+                async for kind, value in self._openai.astream_answer(
+                    SYSTEM_PROMPT, self._build_user_prompt(payload, context_blocks)
+                ):
+                    if kind == "usage":
+                        usage = value
+                        continue
+                    if timings["ttft_ms"] is None:
+                        # Measured from request start: what the user actually waits for.
+                        timings["ttft_ms"] = _elapsed_ms(started)
+                    parts.append(value)
+                    yield "token", value
+                timings["generate_ms"] = _elapsed_ms(generate_start)
+
+            answer = "".join(parts).strip()
+            if not answer:
+                answer = NO_ANSWER
+                yield "token", answer
+            self._remember_answer(cache_key, QueryResponse(answer=answer, sources=sources))
+
+            log = self._build_log(knowledge_base_id, payload, user_id, started, timings, usage=usage)
+            yield "done", {"answer": answer, "latency_ms": log.latency_ms, "ttft_ms": log.ttft_ms, "usage": usage}
+        except Exception as exc:  # noqa: BLE001
+            log = self._build_log(knowledge_base_id, payload, user_id, started, timings, usage=usage, error=str(exc))
+            yield "error", str(exc)
+        finally:
+            if log is None:
+                # The client went away mid-stream (the generator was closed at a yield).
+                log = self._build_log(
+                    knowledge_base_id, payload, user_id, started, timings, usage=usage, error="Client disconnected"
+                )
+            # Shielded so a cancelled response task still records the query.
+            await asyncio.shield(self._awrite_log(log))
+
+    def _answer_cache_key(self, knowledge_base, knowledge_base_id: str, payload: QueryRequest) -> AnswerCacheKey:
+        return build_answer_cache_key(
+            knowledge_base_id,
+            getattr(knowledge_base, "content_version", 0),
+            payload.question,
+            payload.top_k,
+            self._settings.openai_gen_model,
+        )
+
+    def _cached_answer(self, key: AnswerCacheKey, timings: dict) -> QueryResponse | None:
+        if self._answer_cache is None:
+            return None
+        response = self._answer_cache.get(key)
+        if response is not None:
+            timings["answer_cache_hit"] = True
+            timings["retrieved_count"] = len(response.sources)
+        return response
+
+    def _remember_answer(self, key: AnswerCacheKey, response: QueryResponse) -> None:
+        if self._answer_cache is not None:
+            self._answer_cache.put(key, response)
+
+    def _embed_question(self, question: str, timings: dict) -> list[float]:
+        embedding = self._cached_embedding(question, timings)
+        if embedding is None:
+            embedding = self._openai.embed_texts([question], priority=QUERY_PRIORITY)[0]
+            self._remember_embedding(question, embedding)
+        return embedding
+
+    async def _aembed_question(self, question: str, timings: dict) -> list[float]:
+        embedding = self._cached_embedding(question, timings)
+        if embedding is None:
+            embedding = (await self._openai.aembed_texts([question]))[0]
+            self._remember_embedding(question, embedding)
+        return embedding
+
+    def _cached_embedding(self, question: str, timings: dict) -> list[float] | None:
+        if self._embedding_cache is None:
+            return None
+        embedding = self._embedding_cache.get(self._settings.openai_embed_model, question)
+        timings["embedding_cache_hit"] = embedding is not None
+        return embedding
+
+    def _remember_embedding(self, question: str, embedding: list[float]) -> None:
+        if self._embedding_cache is not None:
+            self._embedding_cache.put(self._settings.openai_embed_model, question, embedding)
+
+    async def _awrite_log(self, log: QueryLog) -> None:
+        await asyncio.to_thread(self._query_log_repo.create, log)
+
+    def _build_sources(self, results: dict) -> tuple[list[QuerySource], list[str]]:
+        documents = results.get("documents", [[]])[0]
+        metadatas = results.get("metadatas", [[]])[0]
+        distances = results.get("distances", [[]])[0]
+
+        sources: list[QuerySource] = []
+        context_blocks: list[str] = []
+
+        for idx, text in enumerate(documents):
+            metadata = metadatas[idx] if idx < len(metadatas) else {}
+            distance = distances[idx] if idx < len(distances) else None
+            score = 0.0
+            if isinstance(distance, (int, float)):
+                # Convert distance to a "higher is better" score for UI display.
+                score = max(0.0, 1.0 - float(distance))
+
+            sources.append(
+                QuerySource(
+                    chunk_id=metadata.get("chunk_id", ""),
+                    document_id=metadata.get("document_id", ""),
+                    filename=metadata.get("filename", ""),
+                    score=score,
+                    excerpt=(text or "")[:240],
+                )
+            )
+            context_blocks.append(f"[{idx + 1}] {text}")
+
+        return sources, context_blocks
+
+    def _build_user_prompt(self, payload: QueryRequest, context_blocks: list[str]) -> str:
+        return (
+            "Answer the question using only the context below. "
+            "Cite sources inline using [1], [2], etc.\n\n"
+            f"Context:\n{chr(10).join(context_blocks)}\n\n"
+            f"Question: {payload.question}"
+        )
+
+    def _build_log(
+        self,
+        knowledge_base_id: str,
+        payload: QueryRequest,
+        user_id,
+        started: float,
+        timings: dict,
+        usage: dict | None = None,
+        error: str | None = None,
+    ) -> QueryLog:
+        prompt_tokens = usage.get("prompt_tokens") if usage else None
+        completion_tokens = usage.get("completion_tokens") if usage else None
+        total_tokens = usage.get("total_tokens") if usage else None
+        cost_usd = None
+        if (
+            usage
+            and self._settings.openai_prompt_cost_per_1k
+            and self._settings.openai_completion_cost_per_1k
+        ):
+            # Cost is derived from token usage when pricing is configured.
+            cost_usd = (
+                (prompt_tokens or 0) * self._settings.openai_prompt_cost_per_1k
+                + (completion_tokens or 0) * self._settings.openai_completion_cost_per_1k
+            ) / 1000
+
+        return QueryLog(
+            knowledge_base_id=knowledge_base_id,
+            user_id=user_id,
+            query_text=payload.question,
+            latency_ms=_elapsed_ms(started),
+            embed_ms=timings["embed_ms"],
+            retrieve_ms=timings["retrieve_ms"],
+            generate_ms=timings["generate_ms"],
+            ttft_ms=timings["ttft_ms"],
+            retrieved_k=payload.top_k,
+            retrieved_count=timings["retrieved_count"],
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=total_tokens,
+            cost_usd=cost_usd,
+            model=self._settings.openai_gen_model or None,
+            embedding_model=self._settings.openai_embed_model,
+            embedding_cache_hit=timings["embedding_cache_hit"],
+            answer_cache_hit=timings["answer_cache_hit"],
+            vector_db="chroma",
+            error=error,
+        )
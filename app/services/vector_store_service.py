@@ -1,7 +1,13 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
 import chromadb
 
 from app.core.config import Settings
 from app.models.chunk import Chunk
+from app.repositories.chunk_repository import ChunkRecord
 from app.utils.files import ensure_directory
 
 
@@ -9,43 +15,125 @@ class VectorStoreService:
     def __init__(self, settings: Settings) -> None:
         ensure_directory(settings.chroma_path)
         self._client = chromadb.PersistentClient(path=settings.chroma_path)
+        # Bounded LRU of open collection handles, keyed by knowledge base id.
+        self._collections: OrderedDict[str, object] = OrderedDict()
+        self._max_collections = max(1, settings.chroma_collection_cache_size)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        # Async callers run Chroma's blocking calls here so they never starve the default threadpool.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.chroma_executor_workers),
+            thread_name_prefix="chroma",
+        )
+
+    def _get_collection(self, knowledge_base_id: str):
+        with self._lock:
+            collection = self._collections.get(knowledge_base_id)
+            if collection is not None:
+                self._collections.move_to_end(knowledge_base_id)
+                self._hits += 1
+                return collection
+            self._misses += 1
+        collection = self._client.get_or_create_collection(name=f"kb_{knowledge_base_id}")
+        with self._lock:
+            self._collections[knowledge_base_id] = collection
+            self._collections.move_to_end(knowledge_base_id)
+            while len(self._collections) > self._max_collections:
+                self._collections.popitem(last=False)
+        return collection
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "collections_cached": len(self._collections),
+                "collection_hits": self._hits,
+                "collection_misses": self._misses,
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            self._collections.clear()
 
     def add_embeddings(
         self,
         knowledge_base_id: str,
-        chunks: list[Chunk],
+        chunks: list[Chunk] | list[ChunkRecord],
         embeddings: list[list[float]],
         filename: str,
     ) -> None:
         if not chunks:
             return
-        collection = self._client.get_or_create_collection(name=f"kb_{knowledge_base_id}")
+        collection = self._get_collection(knowledge_base_id)
         ids = [str(chunk.id) for chunk in chunks]
         documents = [chunk.text for chunk in chunks]
-        metadatas = [
-            {
+        metadatas = []
+        for chunk in chunks:
+            metadata = {
                 "chunk_id": str(chunk.id),
                 "document_id": str(chunk.document_id),
                 "position": int(chunk.position),
                 "filename": filename,
             }
-            for chunk in chunks
-        ]
-        collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+            # Chroma rejects None metadata values, so page numbers are only set for paged formats.
+            if chunk.page_start is not None:
+                metadata["page_start"] = chunk.page_start
+                metadata["page_end"] = chunk.page_end
+            metadatas.append(metadata)
+        # Upsert so a retried batch (rows rolled back, vectors already written) stays idempotent.
+        collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
 
     def query(self, knowledge_base_id: str, embedding: list[float], top_k: int) -> dict:
-        collection = self._client.get_or_create_collection(name=f"kb_{knowledge_base_id}")
+        collection = self._get_collection(knowledge_base_id)
         return collection.query(query_embeddings=[embedding], n_results=top_k, include=["documents", "metadatas", "distances"])
 
+    async def aquery(self, knowledge_base_id: str, embedding: list[float], top_k: int) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.query, knowledge_base_id, embedding, top_k)
+
     def delete_embeddings(
         self,
         knowledge_base_id: str,
         ids: list[str] | None = None,
         where: dict | None = None,
     ) -> None:
-        collection = self._client.get_or_create_collection(name=f"kb_{knowledge_base_id}")
+        collection = self._get_collection(knowledge_base_id)
         if ids:
             collection.delete(ids=ids)
             return
         if where:
             collection.delete(where=where)
+
+
+_shared_vector_store: VectorStoreService | None = None
+_shared_lock = threading.Lock()
+
+
+def init_vector_store(settings: Settings) -> VectorStoreService:
+    global _shared_vector_store
+    with _shared_lock:
+        if _shared_vector_store is None:
+            _shared_vector_store = VectorStoreService(settings)
+        return _shared_vector_store
+
+
+def get_shared_vector_store(settings: Settings) -> VectorStoreService:
+    # One Chroma client per process; settings only apply on first use.
+    if _shared_vector_store is None:
+        return init_vector_store(settings)
+    return _shared_vector_store
+
+
+def get_vector_store_stats() -> dict:
+    if _shared_vector_store is None:
+        return {}
+    return _shared_vector_store.get_stats()
+
+
+def close_vector_store() -> None:
+    global _shared_vector_store
+    with _shared_lock:
+        if _shared_vector_store is not None:
+            _shared_vector_store.close()
+        _shared_vector_store = None
@@ -1,32 +1,83 @@
 import csv
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
+import re
+from typing import BinaryIO
+import zipfile
 
 from docx import Document
+from docx.table import Table
 from openpyxl import load_workbook
 from pypdf import PdfReader
 from pptx import Presentation
 
+from app.utils.text import iter_block_chunks, iter_chunk_windows
+
 
 SUPPORTED_TEXT_TYPES = {"text/plain", "text/markdown"}
 SUPPORTED_TEX_TYPES = {"text/x-tex", "application/x-tex"}
 SUPPORTED_PPTX_TYPES = {"application/vnd.openxmlformats-officedocument.presentationml.presentation"}
 
+_XLSX_SHEET_PART = re.compile(r"^xl/worksheets/sheet\d+\.xml$")
+_PPTX_SLIDE_PART = re.compile(r"^ppt/slides/slide\d+\.xml$")
+_DOCX_PAGES = re.compile(rb"<Pages>(\d+)</Pages>")
+# PDF resume offsets: the page index in the high bits, characters into that page in the low 32.
+_PDF_PAGE_SHIFT = 32
+_PDF_CHARS_MASK = (1 << _PDF_PAGE_SHIFT) - 1
+# Plain-text files are read in blocks of this size.
+_TEXT_READ_BYTES = 1024 * 1024
+
+
+@dataclass(slots=True)
+class TextPart:
+    text: str
+    # Where a resumed ingest restarts reading: a byte offset for text/CSV, a row count for XLSX,
+    # pages plus characters into the next page for PDF (see iter_pdf_chunks), and the number of
+    # slides or DOCX blocks already covered otherwise. None when resuming right after this part
+    # is not possible; the previous part's offset still applies.
+    resume_offset: int | None = None
+    page_start: int | None = None
+    page_end: int | None = None
+    # Raw source span for plain-text files.
+    byte_start: int | None = None
+    byte_end: int | None = None
+    # Set when the chunker already hashed the final text.
+    hash: str | None = None
+
+
+# (path, number of segments to skip) -> (text, 1-based page/slide/block number) pairs.
+SegmentReader = Callable[[str, int], Iterator[tuple[str, int]]]
+# Runs a parsing generator, fn(*args); the ingestion service routes this through its extraction pool.
+ParserRunner = Callable[..., Iterator]
+
+
+def run_inline(fn: Callable[..., Iterator], *args) -> Iterator:
+    return fn(*args)
+
+
+def _table_text(table) -> str:
+    rows: list[str] = []
+    for row in table.rows:
+        cells = [cell.text.strip() for cell in row.cells]
+        line = "\t".join(cell for cell in cells if cell)
+        if line:
+            rows.append(line)
+    return "\n".join(rows)
+
+
+def iter_docx_blocks(path: str, start_block: int = 0) -> Iterator[tuple[str, int]]:
+    # Paragraphs and tables in body order, each as one block with its 1-based number.
+    doc = Document(path)
+    for number, item in enumerate(doc.iter_inner_content(), start=1):
+        if number <= start_block:
+            continue
+        yield (_table_text(item) if isinstance(item, Table) else item.text.strip()), number
+
 
 def _extract_docx_text(file_path: Path) -> str:
-    doc = Document(str(file_path))
-    parts: list[str] = []
-    for paragraph in doc.paragraphs:
-        text = paragraph.text.strip()
-        if text:
-            parts.append(text)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                text = cell.text.strip()
-                if text:
-                    parts.append(text)
-    return "\n".join(parts)
+    return "\n".join(text for text, _ in iter_docx_blocks(str(file_path)) if text)
 
 
 def _extract_csv_text(file_path: Path) -> str:
@@ -51,10 +102,13 @@ def _extract_xlsx_text(file_path: Path) -> str:
     return "\n\n".join(sheets)
 
 
-def _extract_pptx_text(file_path: Path) -> str:
-    presentation = Presentation(str(file_path))
-    parts: list[str] = []
-    for slide in presentation.slides:
+def iter_pptx_slides(path: str, start_slide: int = 0) -> Iterator[tuple[str, int]]:
+    # One block per slide with its 1-based slide number.
+    presentation = Presentation(path)
+    for number, slide in enumerate(presentation.slides, start=1):
+        if number <= start_slide:
+            continue
+        parts: list[str] = []
         for shape in slide.shapes:
             if shape.has_text_frame:
                 for paragraph in shape.text_frame.paragraphs:
@@ -62,13 +116,14 @@ def _extract_pptx_text(file_path: Path) -> str:
                     if text:
                         parts.append(text)
             if getattr(shape, "has_table", False):
-                table = shape.table
-                for row in table.rows:
-                    for cell in row.cells:
-                        text = cell.text.strip()
-                        if text:
-                            parts.append(text)
-    return "\n".join(parts)
+                text = _table_text(shape.table)
+                if text:
+                    parts.append(text)
+        yield "\n".join(parts), number
+
+
+def _extract_pptx_text(file_path: Path) -> str:
+    return "\n".join(text for text, _ in iter_pptx_slides(str(file_path)) if text)
 
 
 def extract_text_from_file(path: str, content_type: str | None = None) -> str:
@@ -102,29 +157,140 @@ def extract_text_from_file(path: str, content_type: str | None = None) -> str:
     raise ValueError("Unsupported document type")
 
 
-def iter_text_chunks(file_path: Path, chunk_size: int) -> Iterator[str]:
-    buffer: list[str] = []
-    current_size = 0
-    with file_path.open("r", encoding="utf-8", errors="ignore") as handle:
-        for line in handle:
-            cleaned = line.rstrip("\n")
-            if not cleaned:
+def _count_zip_parts(file_path: Path, pattern: re.Pattern) -> int:
+    # Only the zip central directory is read, never the part contents.
+    with zipfile.ZipFile(file_path) as archive:
+        return sum(1 for name in archive.namelist() if pattern.match(name))
+
+
+def _docx_page_count(file_path: Path) -> int | None:
+    # Word records the page count it last laid out in docProps/app.xml; other writers may not.
+    with zipfile.ZipFile(file_path) as archive:
+        try:
+            properties = archive.read("docProps/app.xml")
+        except KeyError:
+            return None
+    match = _DOCX_PAGES.search(properties)
+    return int(match.group(1)) if match else None
+
+
+def read_document_metadata(path: str, content_type: str | None = None) -> dict[str, int]:
+    # Structural counts from the OOXML zip directory, cheap enough for the upload request. PDFs
+    # need a parse to count pages, so their count is taken at ingest (read_pdf_metadata).
+    # Best effort: a malformed file is reported by extraction, not here.
+    file_path = Path(path)
+    suffix = file_path.suffix.lower()
+    try:
+        if content_type in {"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"} or suffix == ".xlsx":
+            return {"sheet_count": _count_zip_parts(file_path, _XLSX_SHEET_PART)}
+        if content_type in SUPPORTED_PPTX_TYPES or suffix == ".pptx":
+            return {"slide_count": _count_zip_parts(file_path, _PPTX_SLIDE_PART)}
+        if (
+            content_type in {"application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
+            or suffix == ".docx"
+        ):
+            pages = _docx_page_count(file_path)
+            return {"page_count": pages} if pages is not None else {}
+    except Exception:  # noqa: BLE001
+        return {}
+    return {}
+
+
+def read_pdf_metadata(path: str) -> dict[str, int]:
+    # Walks the page tree without extracting text; run in the extraction pool where there is one.
+    try:
+        return {"page_count": len(PdfReader(path).pages)}
+    except Exception:  # noqa: BLE001
+        return {}
+
+
+class _OffsetLines:
+    # Decodes a binary file line by line while tracking the byte offset just past the last
+    # line handed out, so callers can checkpoint and later seek straight back to it.
+    def __init__(self, handle: BinaryIO, start_offset: int) -> None:
+        handle.seek(start_offset)
+        self._handle = handle
+        self.offset = start_offset
+
+    def __iter__(self) -> "_OffsetLines":
+        return self
+
+    def __next__(self) -> str:
+        raw = self._handle.readline()
+        if not raw:
+            raise StopIteration
+        self.offset += len(raw)
+        return raw.decode("utf-8", errors="ignore")
+
+
+def _text_chunk_end(window: bytearray, start: int, chunk_size: int) -> int:
+    # First line end once chunk_size bytes are covered. A line running past twice that is cut at
+    # its last space (or, failing that, a UTF-8 character boundary) so chunks stay bounded. The
+    # window must hold more than 2 * chunk_size bytes past start unless it ends at end of file.
+    size = len(window)
+    target = start + chunk_size
+    if target >= size:
+        return size
+    limit = min(size, start + 2 * chunk_size)
+    newline = window.find(b"\n", target - 1, limit)
+    if newline != -1:
+        return newline + 1
+    if limit == size:
+        return size
+    space = window.rfind(b" ", start, limit)
+    if space > start:
+        return space + 1
+    end = limit
+    while end > start + 1 and window[end] & 0xC0 == 0x80:
+        end -= 1
+    return end
+
+
+def iter_text_chunks(file_path: Path, chunk_size: int, start_offset: int = 0) -> Iterator[TextPart]:
+    # Boundaries are found with byte searches on a rolling window filled by readinto, so each
+    # chunk is sliced and decoded once instead of line by line; chunk_size counts bytes here.
+    # Registered files are managed outside the service: one truncated mid-read just ends the
+    # stream early, where a memory map would fault. Parts carry their raw [start, end) byte span
+    # and resume just past it.
+    chunk_size = max(1, chunk_size)
+    block = bytearray(max(_TEXT_READ_BYTES, 2 * chunk_size + 1))
+    window = bytearray()
+    # File offset of window[0], and the position of the next chunk in the window.
+    base, start = start_offset, 0
+    eof = False
+    with file_path.open("rb", buffering=0) as handle:
+        handle.seek(start_offset)
+        while True:
+            if not eof and len(window) - start <= 2 * chunk_size:
+                del window[:start]
+                base, start = base + start, 0
+                read = handle.readinto(block)
+                if read:
+                    window += memoryview(block)[:read]
+                else:
+                    eof = True
                 continue
-            buffer.append(cleaned)
-            current_size += len(cleaned)
-            if current_size >= chunk_size:
-                yield "\n".join(buffer)
-                buffer = []
-                current_size = 0
-    if buffer:
-        yield "\n".join(buffer)
+            if start >= len(window):
+                return
+            end = _text_chunk_end(window, start, chunk_size)
+            text = window[start:end].decode("utf-8", errors="ignore").strip()
+            if text:
+                yield TextPart(text, base + end, byte_start=base + start, byte_end=base + end)
+            start = end
 
 
-def iter_csv_chunks(file_path: Path, rows_per_chunk: int = 200, chunk_size: int = 4000) -> Iterator[str]:
+def iter_csv_chunks(
+    file_path: Path,
+    rows_per_chunk: int = 200,
+    chunk_size: int = 4000,
+    start_offset: int = 0,
+) -> Iterator[TextPart]:
     batch: list[str] = []
     current_size = 0
-    with file_path.open("r", encoding="utf-8", errors="ignore", newline="") as handle:
-        reader = csv.reader(handle)
+    with file_path.open("rb") as handle:
+        lines = _OffsetLines(handle, start_offset)
+        # csv pulls physical lines only until a record is complete, so the offset is exact.
+        reader = csv.reader(lines)
         for row in reader:
             if not row:
                 continue
@@ -132,11 +298,109 @@ def iter_csv_chunks(file_path: Path, rows_per_chunk: int = 200, chunk_size: int
             batch.append(line)
             current_size += len(line)
             if len(batch) >= rows_per_chunk or current_size >= chunk_size:
-                yield "\n".join(batch)
+                yield TextPart("\n".join(batch), lines.offset)
                 batch = []
                 current_size = 0
-    if batch:
-        yield "\n".join(batch)
+        if batch:
+            yield TextPart("\n".join(batch), lines.offset)
+
+
+def iter_xlsx_chunks(
+    file_path: Path,
+    rows_per_chunk: int = 200,
+    chunk_size: int = 4000,
+    start_offset: int = 0,
+) -> Iterator[TextPart]:
+    # read_only workbooks stream rows from the sheet XML. Each chunk repeats its sheet name and
+    # header row so it stands on its own; the resume offset counts rows across all sheets.
+    workbook = load_workbook(str(file_path), data_only=True, read_only=True)
+    row_offset = 0
+    try:
+        for sheet in workbook.worksheets:
+            title = f"# Sheet: {sheet.title}"
+            header: str | None = None
+            batch: list[str] = []
+            current_size = 0
+            header_offset = 0
+            has_rows = False
+            for row in sheet.iter_rows(values_only=True):
+                row_offset += 1
+                cells = [str(value) for value in row if value is not None and str(value) != ""]
+                if not cells:
+                    continue
+                line = "\t".join(cells)
+                if header is None:
+                    # Read even when resuming past it, so later chunks still carry it.
+                    header, header_offset = line, row_offset
+                    continue
+                has_rows = True
+                if row_offset <= start_offset:
+                    continue
+                batch.append(line)
+                current_size += len(line)
+                if len(batch) >= rows_per_chunk or current_size >= chunk_size:
+                    yield TextPart("\n".join([title, header, *batch]), row_offset)
+                    batch = []
+                    current_size = 0
+            if batch:
+                yield TextPart("\n".join([title, header, *batch]), row_offset)
+            elif header is not None and not has_rows and header_offset > start_offset:
+                # A header-only sheet still gets one chunk, unless an earlier run already emitted it.
+                yield TextPart(f"{title}\n{header}", row_offset)
+    finally:
+        workbook.close()
+
+
+def iter_pdf_pages(path: str, start_page: int = 0) -> Iterator[tuple[str, int]]:
+    # Pages are parsed one at a time as the consumer asks for them.
+    reader = PdfReader(path)
+    for index in range(start_page, len(reader.pages)):
+        yield reader.pages[index].extract_text() or "", index + 1
+
+
+def iter_pdf_chunks(
+    file_path: Path,
+    chunk_size: int,
+    chunk_overlap: int,
+    start_offset: int = 0,
+    page_reader: SegmentReader = iter_pdf_pages,
+) -> Iterator[TextPart]:
+    # The offset packs the 0-based page the next chunk starts in with how many of that page's
+    # normalized characters earlier chunks covered, so a resume continues mid-page.
+    start_page, skip = start_offset >> _PDF_PAGE_SHIFT, start_offset & _PDF_CHARS_MASK
+    pages = page_reader(str(file_path), start_page)
+    for text, first_page, last_page, resume in iter_chunk_windows(pages, chunk_size, chunk_overlap, skip=skip):
+        resume_offset = None
+        if resume is not None:
+            page, covered = resume
+            resume_offset = (page - 1) << _PDF_PAGE_SHIFT | covered
+        yield TextPart(text, resume_offset, page_start=first_page, page_end=last_page)
+
+
+def iter_docx_chunks(
+    file_path: Path,
+    chunk_size: int,
+    chunk_overlap: int,
+    start_offset: int = 0,
+    block_reader: SegmentReader = iter_docx_blocks,
+) -> Iterator[TextPart]:
+    blocks = block_reader(str(file_path), start_offset)
+    for text, _, _, next_block in iter_block_chunks(blocks, chunk_size, chunk_overlap):
+        yield TextPart(text, next_block - 1 if next_block is not None else None)
+
+
+def iter_pptx_chunks(
+    file_path: Path,
+    chunk_size: int,
+    chunk_overlap: int,
+    start_offset: int = 0,
+    slide_reader: SegmentReader = iter_pptx_slides,
+) -> Iterator[TextPart]:
+    slides = slide_reader(str(file_path), start_offset)
+    for text, first_slide, last_slide, next_slide in iter_block_chunks(slides, chunk_size, chunk_overlap):
+        # Slide numbers go in the page columns, so answers can cite them like PDF pages.
+        resume_offset = next_slide - 1 if next_slide is not None else None
+        yield TextPart(text, resume_offset, page_start=first_slide, page_end=last_slide)
 
 
 def iter_streamable_chunks(
@@ -144,11 +408,33 @@ def iter_streamable_chunks(
     content_type: str | None,
     chunk_size: int,
     rows_per_chunk: int = 200,
-) -> Iterator[str] | None:
+    start_offset: int = 0,
+    chunk_overlap: int = 0,
+    runner: ParserRunner = run_inline,
+) -> Iterator[TextPart] | None:
     file_path = Path(path)
     suffix = file_path.suffix.lower()
+    if content_type == "application/pdf" or suffix == ".pdf":
+        page_reader = partial(runner, iter_pdf_pages)
+        return iter_pdf_chunks(file_path, chunk_size, chunk_overlap, start_offset=start_offset, page_reader=page_reader)
+    if content_type in {"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"} or suffix == ".xlsx":
+        return runner(iter_xlsx_chunks, file_path, rows_per_chunk, chunk_size, start_offset)
+    if content_type in {"application/vnd.openxmlformats-officedocument.wordprocessingml.document"} or suffix == ".docx":
+        block_reader = partial(runner, iter_docx_blocks)
+        return iter_docx_chunks(
+            file_path, chunk_size, chunk_overlap, start_offset=start_offset, block_reader=block_reader
+        )
+    if content_type in SUPPORTED_PPTX_TYPES or suffix == ".pptx":
+        slide_reader = partial(runner, iter_pptx_slides)
+        return iter_pptx_chunks(
+            file_path, chunk_size, chunk_overlap, start_offset=start_offset, slide_reader=slide_reader
+        )
     if content_type == "text/csv" or suffix == ".csv":
-        return iter_csv_chunks(file_path, rows_per_chunk=rows_per_chunk, chunk_size=chunk_size)
-    if content_type in SUPPORTED_TEXT_TYPES or suffix == ".txt":
-        return iter_text_chunks(file_path, chunk_size=chunk_size)
-    return None
\ No newline at end of file
+        return iter_csv_chunks(
+            file_path, rows_per_chunk=rows_per_chunk, chunk_size=chunk_size, start_offset=start_offset
+        )
+    # Markdown keeps the extraction path and its chunk overlap; plain text is chunked by bytes.
+    is_markdown = content_type == "text/markdown" or suffix in {".md", ".markdown"}
+    if not is_markdown and (content_type in SUPPORTED_TEXT_TYPES or suffix == ".txt"):
+        return iter_text_chunks(file_path, chunk_size=chunk_size, start_offset=start_offset)
+    return None
@@ -1,3 +1,5 @@
+from dataclasses import dataclass
+import hashlib
 import os
 from pathlib import Path
 
@@ -13,12 +15,26 @@ def sanitize_filename(filename: str) -> str:
     return name.replace("\\", "_").replace("/", "_")
 
 
-def save_upload_file(upload: UploadFile, destination: str, max_bytes: int) -> int:
+@dataclass(frozen=True, slots=True)
+class SavedUpload:
+    size_bytes: int
+    content_hash: str
+
+
+def save_upload_file(
+    upload: UploadFile,
+    destination: str,
+    max_bytes: int,
+    buffer_size: int = 8 * 1024 * 1024,
+) -> SavedUpload:
+    # Hashes while writing so ingestion never has to read an uploaded file back just to hash it.
     ensure_directory(os.path.dirname(destination))
+    buffer_size = max(64 * 1024, buffer_size)
+    hasher = hashlib.sha256()
     size = 0
-    with open(destination, "wb") as target:
+    with open(destination, "wb", buffering=buffer_size) as target:
         while True:
-            chunk = upload.file.read(1024 * 1024)
+            chunk = upload.file.read(buffer_size)
             if not chunk:
                 break
             size += len(chunk)
@@ -29,5 +45,6 @@ def save_upload_file(upload: UploadFile, destination: str, max_bytes: int) -> in
                 except OSError:
                     pass
                 raise ValueError("File too large")
+            hasher.update(chunk)
             target.write(chunk)
-    return size
+    return SavedUpload(size_bytes=size, content_hash=hasher.hexdigest())
@@ -1,4 +1,5 @@
 import hashlib
+import os
 from pathlib import Path
 
 
@@ -22,3 +23,9 @@ def sha256_file(path: str) -> str:
                 break
             hasher.update(chunk)
     return hasher.hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    # Cheap change detector: any rewrite, append, touch or replace-by-rename alters one of these.
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}"
@@ -1,5 +1,9 @@
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
 import re
 
+from app.utils.hashing import sha256_text
+
 
 def normalize_whitespace(text: str) -> str:
     return re.sub(r"\s+", " ", text).strip()
@@ -21,3 +25,188 @@ def chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> list[str]:
             break
         start = end - chunk_overlap
     return chunks
+
+
+def iter_chunk_windows(
+    segments: Iterable[tuple[str, int]],
+    chunk_size: int,
+    chunk_overlap: int,
+    skip: int = 0,
+) -> Iterator[tuple[str, int, int, tuple[int, int] | None]]:
+    # Streaming counterpart of normalize_whitespace + chunk_text over labelled segments (e.g. PDF
+    # pages): windows run across segment boundaries with the usual overlap, but only about one
+    # window plus one segment of text is held at a time. Yields (chunk, first label, last label,
+    # resume point), where the resume point is (label, characters of that normalized segment
+    # already covered) for where the next chunk starts. Passing those characters back as `skip`,
+    # with segments starting at that label, continues with exactly the same windows. It is None
+    # when the next chunk starts on the space joining two segments, which a resume cannot rebuild.
+    if chunk_size <= 0:
+        return
+    if chunk_overlap >= chunk_size:
+        chunk_overlap = max(0, chunk_size - 1)
+    step = chunk_size - chunk_overlap
+    buffer = ""
+    start = 0
+    # (offset in buffer, label) of each segment still in the buffer, ascending. The first one
+    # may start before the buffer (negative offset) once its beginning has been consumed.
+    spans: list[tuple[int, int]] = []
+
+    def span_at(offset: int) -> tuple[int, int]:
+        span = spans[0]
+        for candidate in spans:
+            if candidate[0] > offset:
+                break
+            span = candidate
+        return span
+
+    def label_at(offset: int) -> int:
+        return span_at(offset)[1]
+
+    def resume_at(offset: int) -> tuple[int, int] | None:
+        if any(span_start == offset + 1 for span_start, _ in spans):
+            return None
+        span_start, label = span_at(offset)
+        return label, offset - span_start
+
+    for text, label in segments:
+        text = normalize_whitespace(text)
+        if not text:
+            continue
+        if start:
+            # Drop consumed text (and segments that ended in it) before appending more.
+            buffer = buffer[start:]
+            kept = [(span_start - start, span_label) for span_start, span_label in spans]
+            first = max(index for index, (span_start, _) in enumerate(kept) if span_start <= 0)
+            spans = kept[first:]
+            start = 0
+        if skip:
+            # Resuming inside the first segment: earlier windows already covered its start.
+            spans.append((-skip, label))
+            buffer, skip = text[skip:], 0
+            if not buffer:
+                continue
+        else:
+            if buffer:
+                buffer += " "
+            spans.append((len(buffer), label))
+            buffer += text
+        # Same windows chunk_text would cut from the joined text: a full window is only emitted
+        # once more text follows it, so the last window is whatever remains at the end.
+        while len(buffer) - start > chunk_size:
+            end = start + chunk_size
+            yield buffer[start:end], label_at(start), label_at(end - 1), resume_at(start + step)
+            start += step
+    if len(buffer) > start:
+        yield buffer[start:], label_at(start), label_at(len(buffer) - 1), resume_at(len(buffer))
+
+
+def iter_block_chunks(
+    blocks: Iterable[tuple[str, int]],
+    chunk_size: int,
+    chunk_overlap: int,
+) -> Iterator[tuple[str, int, int, int | None]]:
+    # Packs whole structural blocks (paragraphs, tables, slides), labelled with consecutive
+    # numbers, into chunks of up to chunk_size, so boundaries fall between blocks. Only a block
+    # longer than chunk_size is cut into overlapping windows. Yields (chunk, first label, last
+    # label, label of the first block not fully emitted yet). That label is None for all but the
+    # last window of a cut block: resuming inside the block would emit its earlier windows again.
+    buffer: list[str] = []
+    size = 0
+    first = last = 0
+    for text, label in blocks:
+        text = normalize_whitespace(text)
+        if not text:
+            continue
+        if buffer and size + 1 + len(text) > chunk_size:
+            yield "\n".join(buffer), first, last, last + 1
+            buffer = []
+        if len(text) > chunk_size:
+            pieces = chunk_text(text, chunk_size, chunk_overlap)
+            for index, piece in enumerate(pieces):
+                yield piece, label, label, label + 1 if index == len(pieces) - 1 else None
+            continue
+        if buffer:
+            size += 1 + len(text)
+        else:
+            first, size = label, len(text)
+        buffer.append(text)
+        last = label
+    if buffer:
+        yield "\n".join(buffer), first, last, last + 1
+
+
+_SENTENCE_ENDS = (". ", "! ", "? ")
+# Large inputs are normalized in blocks of this many characters: splitting a cache-sized block
+# is faster than splitting a whole document, and blocks may end mid-word like any stream piece.
+_BLOCK_CHARS = 64 * 1024
+
+
+@dataclass(slots=True)
+class TextChunk:
+    text: str
+    hash: str
+
+
+def _cut(buffer: str, start: int, chunk_size: int) -> int:
+    # End of the window starting at start: the last sentence end in its second half, else the
+    # last word break, else a hard cut for a single word longer than chunk_size.
+    end = start + chunk_size
+    if buffer[end] == " ":
+        return end
+    floor = start + chunk_size // 2
+    sentence = max(buffer.rfind(mark, floor, end) for mark in _SENTENCE_ENDS)
+    if sentence != -1:
+        return sentence + 1
+    space = buffer.rfind(" ", start + 1, end)
+    return space if space != -1 else end
+
+
+def _next_start(buffer: str, start: int, cut: int, chunk_overlap: int) -> int:
+    # The following window repeats up to chunk_overlap characters, starting on a word.
+    if chunk_overlap > 0:
+        overlap_start = cut - chunk_overlap
+        if overlap_start > start:
+            if buffer[overlap_start - 1] != " ":
+                overlap_start = buffer.find(" ", overlap_start, cut) + 1 or cut
+            if start < overlap_start < cut:
+                return overlap_start
+    return cut + 1 if buffer[cut] == " " else cut
+
+
+def _blocks(pieces: Iterable[str]) -> Iterator[str]:
+    for piece in pieces:
+        for offset in range(0, len(piece), _BLOCK_CHARS):
+            yield piece[offset : offset + _BLOCK_CHARS]
+
+
+def iter_text_windows(pieces: Iterable[str], chunk_size: int, chunk_overlap: int) -> Iterator[TextChunk]:
+    # Normalizes, cuts and hashes in one pass over a stream of text pieces (a whole document, or
+    # blocks read from a file; pieces may split words). Whitespace collapses to single spaces
+    # like normalize_whitespace, chunks end on sentence or word boundaries where possible, and
+    # only about one window of normalized text is buffered. Used for documents extracted whole;
+    # streamed formats keep their own chunkers, which report resume points for checkpoints.
+    if chunk_size <= 0:
+        return
+    if chunk_overlap >= chunk_size:
+        chunk_overlap = max(0, chunk_size - 1)
+    buffer = ""
+    start = 0
+    pending_space = False
+    for piece in _blocks(pieces):
+        words = " ".join(piece.split())
+        if words:
+            if start:
+                buffer = buffer[start:]
+                start = 0
+            if buffer and (pending_space or piece[0].isspace()):
+                buffer += " "
+            buffer += words
+            while len(buffer) - start > chunk_size:
+                cut = _cut(buffer, start, chunk_size)
+                text = buffer[start:cut]
+                yield TextChunk(text, sha256_text(text))
+                start = _next_start(buffer, start, cut, chunk_overlap)
+        pending_space = piece[-1].isspace()
+    if len(buffer) > start:
+        text = buffer[start:]
+        yield TextChunk(text, sha256_text(text))
@@ -0,0 +1,30 @@
+from array import array
+import struct
+import sys
+
+
+VECTOR_DTYPES = {"float32", "float16"}
+
+
+def pack_vector(values: list[float], dtype: str = "float32") -> bytes:
+    # Vectors are always stored little-endian so blobs are portable between hosts.
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError("Unsupported vector dtype")
+    if dtype == "float16":
+        return struct.pack(f"<{len(values)}e", *values)
+    packed = array("f", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_vector(payload: bytes, dtype: str = "float32") -> list[float]:
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError("Unsupported vector dtype")
+    if dtype == "float16":
+        return list(struct.unpack(f"<{len(payload) // 2}e", payload))
+    values = array("f")
+    values.frombytes(payload)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
@@ -0,0 +1,187 @@
+from collections.abc import Callable
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings
+from app.core.database import dispose_engine, get_session_factory, init_engine
+from app.core.logging import configure_logging
+from app.models.ingest_job import IngestJob
+from app.repositories.chunk_embedding_repository import ChunkEmbeddingRepository
+from app.repositories.chunk_repository import ChunkRepository
+from app.repositories.document_repository import DocumentRepository
+from app.repositories.ingest_job_repository import IngestJobRepository
+from app.repositories.ingest_run_repository import IngestRunRepository
+from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
+from app.services.embedding_dispatcher import close_embedding_dispatcher
+from app.services.extraction_pool import close_extraction_pool
+from app.services.ingestion_service import IngestCancelled, IngestionService, session_repository_scope
+from app.services.openai_service import OpenAIService, close_openai_client, init_openai_client
+from app.services.vector_store_service import close_vector_store, get_shared_vector_store, init_vector_store
+
+
+logger = logging.getLogger(__name__)
+
+
+def build_ingestion_service(db: Session, settings: Settings) -> IngestionService:
+    return IngestionService(
+        settings,
+        KnowledgeBaseRepository(db),
+        DocumentRepository(db),
+        ChunkRepository(db),
+        IngestRunRepository(db),
+        OpenAIService(settings),
+        get_shared_vector_store(settings),
+        ChunkEmbeddingRepository(db),
+        repository_scope=session_repository_scope(get_session_factory(settings)),
+    )
+
+
+class IngestWorker:
+    def __init__(
+        self,
+        settings: Settings,
+        session_factory: Callable[[], Session],
+        service_builder: Callable[[Session, Settings], IngestionService] = build_ingestion_service,
+        worker_id: str | None = None,
+    ) -> None:
+        self._settings = settings
+        self._session_factory = session_factory
+        self._service_builder = service_builder
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_forever(self) -> None:
+        logger.info("Ingest worker %s started", self.worker_id)
+        while not self._stop.is_set():
+            try:
+                self._fail_abandoned()
+                processed = self.run_once()
+            except Exception:  # noqa: BLE001
+                logger.exception("Ingest worker loop failed")
+                processed = False
+            if not processed:
+                self._stop.wait(self._settings.ingest_job_poll_seconds)
+        logger.info("Ingest worker %s stopped", self.worker_id)
+
+    def run_once(self) -> bool:
+        db = self._session_factory()
+        try:
+            job = IngestJobRepository(db).lease(self.worker_id, self._settings.ingest_job_lease_seconds)
+        finally:
+            db.close()
+        if job is None:
+            return False
+        self._process(job)
+        return True
+
+    def _process(self, job: IngestJob) -> None:
+        heartbeat_stop = threading.Event()
+        # Set by the heartbeat when the lease is lost, so the ingest stops before its next batch.
+        lease_lost = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job.id, heartbeat_stop, lease_lost), name="ingest-heartbeat", daemon=True
+        )
+        heartbeat.start()
+        db = self._session_factory()
+        try:
+            error = self._ingest(db, job, lease_lost)
+            if lease_lost.is_set():
+                # Another worker may already own the job; its outcome is theirs to record.
+                logger.warning("Ingest job %s stopped after its lease was lost", job.id)
+            elif error is not None:
+                retry = IngestJobRepository(db).fail(
+                    job.id, self.worker_id, error, self._settings.ingest_job_retry_delay_seconds
+                )
+                logger.warning("Ingest job %s attempt %s failed (retry=%s): %s", job.id, job.attempts, retry, error)
+            else:
+                IngestJobRepository(db).complete(job.id, self.worker_id)
+        finally:
+            heartbeat_stop.set()
+            heartbeat.join()
+            db.close()
+
+    def _ingest(self, db: Session, job: IngestJob, cancel: threading.Event) -> str | None:
+        # Returns the error to fail the job with, or None when every document was ingested.
+        try:
+            if job.attempts > 1:
+                IngestRunRepository(db).reopen(job.ingest_run_id)
+            service = self._service_builder(db, self._settings)
+            run = service.ingest(job.knowledge_base_id, user_id=job.user_id, run_id=job.ingest_run_id, cancel=cancel)
+        except IngestCancelled:
+            db.rollback()
+            return None
+        except Exception as exc:  # noqa: BLE001
+            db.rollback()
+            return str(exc)
+        if run.status == "failed":
+            # Per-document failures (e.g. an embedding outage) are retried like a crashed run;
+            # documents that did sync are skipped by their fingerprints next time.
+            return run.error_message or "Ingest run failed"
+        return None
+
+    def _heartbeat(self, job_id: uuid.UUID, stop: threading.Event, lease_lost: threading.Event) -> None:
+        # Own session: the ingest thread's session is busy inside long transactions.
+        while not stop.wait(self._settings.ingest_job_heartbeat_seconds):
+            db = self._session_factory()
+            try:
+                renewed = IngestJobRepository(db).heartbeat(
+                    job_id, self.worker_id, self._settings.ingest_job_lease_seconds
+                )
+                if not renewed:
+                    logger.warning("Ingest job %s lease was lost; another worker may retry it", job_id)
+                    lease_lost.set()
+                    return
+            except Exception:  # noqa: BLE001
+                logger.exception("Ingest job %s heartbeat failed", job_id)
+            finally:
+                db.close()
+
+    def _fail_abandoned(self) -> None:
+        db = self._session_factory()
+        try:
+            run_repo = IngestRunRepository(db)
+            for job in IngestJobRepository(db).fail_abandoned():
+                run = run_repo.get(job.ingest_run_id)
+                if run and run.status == "processing":
+                    run_repo.complete(
+                        run.id,
+                        status="failed",
+                        documents_processed=run.documents_processed,
+                        chunks_created=run.chunks_created,
+                        duration_ms=run.duration_ms,
+                        error_message=job.last_error,
+                    )
+        finally:
+            db.close()
+
+
+def main() -> None:
+    configure_logging()
+    settings = Settings()
+    init_engine(settings)
+    init_vector_store(settings)
+    init_openai_client(settings)
+    worker = IngestWorker(settings, get_session_factory(settings))
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    try:
+        worker.run_forever()
+    finally:
+        close_extraction_pool()
+        close_embedding_dispatcher()
+        close_openai_client()
+        close_vector_store()
+        dispose_engine()
+
+
+if __name__ == "__main__":
+    main()
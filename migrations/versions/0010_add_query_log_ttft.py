@@ -0,0 +1,24 @@
+"""Add query log time-to-first-token.
+
+Revision ID: 0010_add_query_log_ttft
+Revises: 0009_add_document_source_status
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0010_add_query_log_ttft"
+down_revision = "0009_add_document_source_status"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("query_logs", sa.Column("ttft_ms", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("query_logs", "ttft_ms")
@@ -0,0 +1,24 @@
+"""Add query log embedding cache hit flag.
+
+Revision ID: 0011_query_log_embed_cache_hit
+Revises: 0010_add_query_log_ttft
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0011_query_log_embed_cache_hit"
+down_revision = "0010_add_query_log_ttft"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("query_logs", sa.Column("embedding_cache_hit", sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("query_logs", "embedding_cache_hit")
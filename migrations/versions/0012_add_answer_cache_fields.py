@@ -0,0 +1,32 @@
+"""Add knowledge base content version and query log answer cache flag.
+
+Revision ID: 0012_add_answer_cache_fields
+Revises: 0011_query_log_embed_cache_hit
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0012_add_answer_cache_fields"
+down_revision = "0011_query_log_embed_cache_hit"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "knowledge_bases",
+        sa.Column("content_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "query_logs",
+        sa.Column("answer_cache_hit", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("query_logs", "answer_cache_hit")
+    op.drop_column("knowledge_bases", "content_version")
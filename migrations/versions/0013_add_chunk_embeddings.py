@@ -0,0 +1,33 @@
+"""Add persistent chunk embedding cache.
+
+Revision ID: 0013_add_chunk_embeddings
+Revises: 0012_add_answer_cache_fields
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0013_add_chunk_embeddings"
+down_revision = "0012_add_answer_cache_fields"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chunk_embeddings",
+        sa.Column("embed_model", sa.String(length=128), nullable=False),
+        sa.Column("chunk_hash", sa.String(length=64), nullable=False),
+        sa.Column("dtype", sa.String(length=16), nullable=False),
+        sa.Column("dimensions", sa.Integer(), nullable=False),
+        sa.Column("vector", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("embed_model", "chunk_hash"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("chunk_embeddings")
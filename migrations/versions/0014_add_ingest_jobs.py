@@ -0,0 +1,50 @@
+"""Add durable ingestion job queue.
+
+Revision ID: 0014_add_ingest_jobs
+Revises: 0013_add_chunk_embeddings
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0014_add_ingest_jobs"
+down_revision = "0013_add_chunk_embeddings"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ingest_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("knowledge_base_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("ingest_run_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("status", sa.String(length=32), server_default="queued", nullable=False),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("available_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("lease_owner", sa.String(length=128), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["knowledge_base_id"], ["knowledge_bases.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["ingest_run_id"], ["ingest_runs.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="SET NULL"),
+    )
+    op.create_index("ix_ingest_jobs_knowledge_base_id", "ingest_jobs", ["knowledge_base_id"])
+    op.create_index("ix_ingest_jobs_ingest_run_id", "ingest_jobs", ["ingest_run_id"])
+    op.create_index("ix_ingest_jobs_status_available_at", "ingest_jobs", ["status", "available_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ingest_jobs_status_available_at", table_name="ingest_jobs")
+    op.drop_index("ix_ingest_jobs_ingest_run_id", table_name="ingest_jobs")
+    op.drop_index("ix_ingest_jobs_knowledge_base_id", table_name="ingest_jobs")
+    op.drop_table("ingest_jobs")
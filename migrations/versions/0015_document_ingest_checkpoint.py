@@ -0,0 +1,28 @@
+"""Add resumable ingest checkpoints to documents.
+
+Revision ID: 0015_document_ingest_checkpoint
+Revises: 0014_add_ingest_jobs
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0015_document_ingest_checkpoint"
+down_revision = "0014_add_ingest_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("ingest_checkpoint_hash", sa.String(length=64), nullable=True))
+    op.add_column("documents", sa.Column("ingest_checkpoint_offset", sa.BigInteger(), nullable=True))
+    op.add_column("documents", sa.Column("ingest_checkpoint_chunk_index", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "ingest_checkpoint_chunk_index")
+    op.drop_column("documents", "ingest_checkpoint_offset")
+    op.drop_column("documents", "ingest_checkpoint_hash")
@@ -0,0 +1,26 @@
+"""Add stat fingerprint and deep-verify timestamp to documents.
+
+Revision ID: 0016_document_file_fingerprint
+Revises: 0015_document_ingest_checkpoint
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0016_document_file_fingerprint"
+down_revision = "0015_document_ingest_checkpoint"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("file_fingerprint", sa.String(length=64), nullable=True))
+    op.add_column("documents", sa.Column("content_verified_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "content_verified_at")
+    op.drop_column("documents", "file_fingerprint")
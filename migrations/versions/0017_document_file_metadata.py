@@ -0,0 +1,24 @@
+"""Add upload-time file metadata to documents.
+
+Revision ID: 0017_document_file_metadata
+Revises: 0016_document_file_fingerprint
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0017_document_file_metadata"
+down_revision = "0016_document_file_fingerprint"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("file_metadata", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "file_metadata")
@@ -0,0 +1,73 @@
+"""Add indexes for chunk, document and query log hot paths.
+
+Revision ID: 0018_add_hot_path_indexes
+Revises: 0017_document_file_metadata
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0018_add_hot_path_indexes"
+down_revision = "0017_document_file_metadata"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps ingestion and queries running while large tables are indexed.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_chunks_document_id_position",
+            "chunks",
+            ["document_id", "position"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_documents_kb_id_created_at",
+            "documents",
+            ["knowledge_base_id", "created_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_documents_kb_id_filename",
+            "documents",
+            ["knowledge_base_id", "filename"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_query_logs_kb_id_created_at",
+            "query_logs",
+            ["knowledge_base_id", "created_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # The composite index leads with knowledge_base_id, so the single-column one is redundant.
+        op.drop_index("ix_query_logs_kb_id", table_name="query_logs", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_query_logs_kb_id",
+            "query_logs",
+            ["knowledge_base_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_query_logs_kb_id_created_at", table_name="query_logs", postgresql_concurrently=True, if_exists=True
+        )
+        op.drop_index(
+            "ix_documents_kb_id_filename", table_name="documents", postgresql_concurrently=True, if_exists=True
+        )
+        op.drop_index(
+            "ix_documents_kb_id_created_at", table_name="documents", postgresql_concurrently=True, if_exists=True
+        )
+        op.drop_index(
+            "ix_chunks_document_id_position", table_name="chunks", postgresql_concurrently=True, if_exists=True
+        )
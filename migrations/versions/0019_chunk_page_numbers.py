@@ -0,0 +1,26 @@
+"""Add source page numbers to chunks.
+
+Revision ID: 0019_chunk_page_numbers
+Revises: 0018_add_hot_path_indexes
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0019_chunk_page_numbers"
+down_revision = "0018_add_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("chunks", sa.Column("page_start", sa.Integer(), nullable=True))
+    op.add_column("chunks", sa.Column("page_end", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("chunks", "page_end")
+    op.drop_column("chunks", "page_start")
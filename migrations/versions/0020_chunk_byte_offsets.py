@@ -0,0 +1,26 @@
+"""Add source byte offsets to chunks.
+
+Revision ID: 0020_chunk_byte_offsets
+Revises: 0019_chunk_page_numbers
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0020_chunk_byte_offsets"
+down_revision = "0019_chunk_page_numbers"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("chunks", sa.Column("byte_start", sa.BigInteger(), nullable=True))
+    op.add_column("chunks", sa.Column("byte_end", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("chunks", "byte_end")
+    op.drop_column("chunks", "byte_start")
@@ -0,0 +1,36 @@
+from uuid import uuid4
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.chunk import Chunk
+from app.repositories import chunk_repository as chunk_repository_module
+from app.repositories.chunk_repository import ChunkRecord, ChunkRepository
+
+
+def test_bulk_insert_and_batched_delete_round_trip(monkeypatch):
+    engine = create_engine("sqlite://")
+    Chunk.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    monkeypatch.setattr(chunk_repository_module, "DELETE_BATCH_SIZE", 3)
+    repo = ChunkRepository(db)
+    document_id = uuid4()
+    records = [
+        ChunkRecord(id=uuid4(), document_id=document_id, position=index, text=f"chunk {index}", hash=f"h{index}")
+        for index in range(10)
+    ]
+
+    repo.create_many(records, commit=False)
+    repo.rollback()
+    assert repo.list_ids_by_document(document_id) == []
+
+    repo.create_many(records)
+    tail = repo.list_positions_by_document(document_id, from_position=4)
+    assert sorted(position for _, position in tail) == list(range(4, 10))
+    # Core inserts never populate the session's identity map.
+    assert not db.identity_map
+
+    repo.delete_many([str(record.id) for record in records[:7]])
+    assert set(repo.list_ids_by_document(document_id)) == {str(record.id) for record in records[7:]}
+    db.close()
+    engine.dispose()
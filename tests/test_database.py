@@ -0,0 +1,26 @@
+from sqlalchemy import text
+
+from app.core import database
+from app.core.config import Settings
+
+
+def test_engine_is_shared_and_pool_metrics_recorded(tmp_path):
+    database.dispose_engine()
+    database.pool_metrics.reset()
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'pool.db'}", db_pool_size=2, db_max_overflow=0)
+    try:
+        engine = database.init_engine(settings)
+        assert database.get_engine() is engine
+
+        for _ in range(3):
+            for db in database.get_db_session():
+                db.execute(text("SELECT 1"))
+
+        stats = database.get_pool_stats()
+        assert stats["connects"] == 1
+        assert stats["checkouts"] == 3
+        assert stats["checkins"] == 3
+        assert stats["checked_out"] == 0
+        assert stats["size"] == 2
+    finally:
+        database.dispose_engine()
@@ -3,8 +3,18 @@ from pathlib import Path
 from openpyxl import Workbook
 from docx import Document
 from pptx import Presentation
+from pypdf import PdfWriter
 
-from app.utils.documents import extract_text_from_file
+from app.utils import documents as documents_module
+from app.utils.documents import (
+    extract_text_from_file,
+    iter_pdf_chunks,
+    iter_text_chunks,
+    iter_streamable_chunks,
+    read_document_metadata,
+    read_pdf_metadata,
+)
+from app.utils.text import chunk_text, iter_chunk_windows, normalize_whitespace
 
 
 def test_extract_docx_includes_paragraph_and_table(tmp_path: Path) -> None:
@@ -75,3 +85,199 @@ def test_extract_pptx_includes_slide_text(tmp_path: Path) -> None:
     text = extract_text_from_file(str(pptx_path), None)
 
     assert "Hello PPTX" in text
+
+
+def test_read_document_metadata_counts_sheets_and_slides(tmp_path: Path) -> None:
+    xlsx_path = tmp_path / "sample.xlsx"
+    workbook = Workbook()
+    workbook.create_sheet("Second")
+    workbook.create_sheet("Third")
+    workbook.save(xlsx_path)
+
+    pptx_path = tmp_path / "sample.pptx"
+    presentation = Presentation()
+    for _ in range(2):
+        presentation.slides.add_slide(presentation.slide_layouts[5])
+    presentation.save(pptx_path)
+
+    assert read_document_metadata(str(xlsx_path)) == {"sheet_count": 3}
+    assert read_document_metadata(str(pptx_path)) == {"slide_count": 2}
+    assert read_document_metadata(str(tmp_path / "missing.pdf")) == {}
+
+
+def test_pdf_page_count_is_left_to_ingest(tmp_path: Path) -> None:
+    pdf_path = tmp_path / "sample.pdf"
+    writer = PdfWriter()
+    for _ in range(3):
+        writer.add_blank_page(width=200, height=200)
+    writer.write(str(pdf_path))
+
+    assert read_document_metadata(str(pdf_path), "application/pdf") == {}
+    assert read_pdf_metadata(str(pdf_path)) == {"page_count": 3}
+    assert read_pdf_metadata(str(tmp_path / "missing.pdf")) == {}
+
+
+def test_chunk_windows_match_chunk_text_across_segments() -> None:
+    pages = [("alpha  beta\ngamma", 1), ("", 2), ("delta epsilon zeta eta", 3), ("theta", 4)]
+    joined = normalize_whitespace(" ".join(text for text, _ in pages))
+
+    windows = list(iter_chunk_windows(iter(pages), chunk_size=12, chunk_overlap=4))
+
+    assert [window[0] for window in windows] == chunk_text(joined, 12, 4)
+    # Labels follow the text: the first window sits on page 1, the one crossing into page 3 spans both.
+    assert windows[0][1:3] == (1, 1)
+    assert any(window[1] == 1 and window[2] == 3 for window in windows)
+    assert windows[-1][2] == 4
+    # Resume points name the segment the next window starts in and how much of it is covered;
+    # a window starting on the space between two segments has none.
+    assert windows[0][3] == (1, 8)
+    assert windows[-1][3] == (4, 5)
+    assert list(iter_chunk_windows(iter([("abcd", 1), ("efgh", 2)]), 5, 1))[0][3] is None
+
+
+def test_pdf_chunks_stream_pages_and_resume_mid_page(tmp_path: Path) -> None:
+    pages = ["first page text " * 5, "second page text " * 5, "third page text " * 5]
+    requested: list[int] = []
+
+    def page_reader(path: str, start_page: int):
+        requested.append(start_page)
+        for index in range(start_page, len(pages)):
+            yield pages[index], index + 1
+
+    parts = list(iter_pdf_chunks(tmp_path / "doc.pdf", chunk_size=60, chunk_overlap=10, page_reader=page_reader))
+
+    assert requested == [0]
+    assert parts[0].page_start == 1
+    assert parts[-1].page_end == 3
+    assert any(part.page_start < part.page_end for part in parts)
+    # Resuming after any chunk reads from the page the next chunk starts in and emits exactly
+    # the chunks a full run emits after it, with no page text indexed twice.
+    pdf_path = tmp_path / "doc.pdf"
+    for index, part in enumerate(parts):
+        if part.resume_offset is None:
+            continue
+        resumed = iter_pdf_chunks(pdf_path, 60, 10, start_offset=part.resume_offset, page_reader=page_reader)
+        assert [(item.text, item.page_start, item.page_end) for item in resumed] == [
+            (item.text, item.page_start, item.page_end) for item in parts[index + 1 :]
+        ]
+        if index + 1 < len(parts):
+            assert requested[-1] == parts[index + 1].page_start - 1
+
+
+def test_xlsx_streams_row_batches_with_sheet_and_header(tmp_path: Path) -> None:
+    xlsx_path = tmp_path / "export.xlsx"
+    workbook = Workbook()
+    ledger = workbook.active
+    ledger.title = "Ledger"
+    ledger.append(["account", "amount"])
+    for index in range(25):
+        ledger.append([f"acct-{index}", index])
+    summary = workbook.create_sheet("Summary")
+    summary.append(["total"])
+    workbook.save(xlsx_path)
+
+    parts = list(iter_streamable_chunks(str(xlsx_path), None, chunk_size=4000, rows_per_chunk=10))
+
+    assert len(parts) == 4
+    for part in parts[:3]:
+        assert part.text.startswith("# Sheet: Ledger\naccount\tamount\n")
+    assert parts[0].text.count("acct-") == 10
+    assert "acct-24\t24" in parts[2].text
+    assert parts[3].text == "# Sheet: Summary\ntotal"
+
+    resume = parts[0].resume_offset
+    resumed = list(iter_streamable_chunks(str(xlsx_path), None, 4000, rows_per_chunk=10, start_offset=resume))
+    assert [part.text for part in resumed] == [part.text for part in parts[1:]]
+
+
+def test_xlsx_resume_does_not_repeat_a_sheet_header(tmp_path: Path) -> None:
+    xlsx_path = tmp_path / "styled.xlsx"
+    workbook = Workbook()
+    ledger = workbook.active
+    ledger.title = "L"
+    ledger.append(["h1", "h2"])
+    for index in range(10):
+        ledger.append([f"r{index}", index])
+    # A styled but empty row past the data still counts towards the sheet's rows.
+    ledger.cell(row=15, column=1).number_format = "0.00"
+    ledger.cell(row=15, column=1).value = None
+    workbook.create_sheet("S").append(["only", "header"])
+    workbook.save(xlsx_path)
+
+    parts = list(iter_streamable_chunks(str(xlsx_path), None, chunk_size=4000, rows_per_chunk=5))
+    assert [part.text.split("\n")[0] for part in parts] == ["# Sheet: L", "# Sheet: L", "# Sheet: S"]
+    assert parts[-1].text == "# Sheet: S\nonly\theader"
+
+    for index, part in enumerate(parts):
+        resumed = iter_streamable_chunks(str(xlsx_path), None, 4000, rows_per_chunk=5, start_offset=part.resume_offset)
+        assert [item.text for item in resumed] == [item.text for item in parts[index + 1 :]]
+
+
+def test_docx_chunks_break_between_paragraphs_and_tables(tmp_path: Path) -> None:
+    doc_path = tmp_path / "report.docx"
+    doc = Document()
+    doc.add_paragraph("Intro paragraph about the quarter.")
+    doc.add_paragraph("Second paragraph with more detail.")
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "region"
+    table.cell(0, 1).text = "revenue"
+    table.cell(1, 0).text = "north"
+    table.cell(1, 1).text = "42"
+    doc.add_paragraph("Closing " + "words " * 20)
+    doc.save(doc_path)
+
+    parts = list(iter_streamable_chunks(str(doc_path), None, chunk_size=80, chunk_overlap=10))
+
+    assert [part.text for part in parts[:2]] == [
+        "Intro paragraph about the quarter.\nSecond paragraph with more detail.",
+        "region revenue north 42",
+    ]
+    # Only the oversized last paragraph is cut mid-block; only its last window is a resume point.
+    assert [part.text for part in parts[2:]] == chunk_text(normalize_whitespace("Closing " + "words " * 20), 80, 10)
+    assert [part.resume_offset for part in parts] == [2, 3] + [None] * (len(parts) - 3) + [4]
+    assert parts[0].page_start is None
+
+
+def test_pptx_chunks_follow_slides_and_record_slide_numbers(tmp_path: Path) -> None:
+    pptx_path = tmp_path / "deck.pptx"
+    presentation = Presentation()
+    for text in ["Agenda", "Revenue grew", "Questions " * 10]:
+        slide = presentation.slides.add_slide(presentation.slide_layouts[5])
+        slide.shapes.add_textbox(0, 0, 300, 100).text_frame.text = text
+    presentation.save(pptx_path)
+
+    parts = list(iter_streamable_chunks(str(pptx_path), None, chunk_size=40, chunk_overlap=0))
+
+    assert (parts[0].text, parts[0].page_start, parts[0].page_end) == ("Agenda\nRevenue grew", 1, 2)
+    assert {(part.page_start, part.page_end) for part in parts[1:]} == {(3, 3)}
+    # Resuming never repeats windows of the oversized slide.
+    for index, part in enumerate(parts):
+        if part.resume_offset is None:
+            continue
+        resumed = iter_streamable_chunks(str(pptx_path), None, 40, start_offset=part.resume_offset)
+        assert [item.text for item in resumed] == [item.text for item in parts[index + 1 :]]
+
+
+def test_text_chunks_record_byte_spans_and_split_long_lines(tmp_path: Path, monkeypatch) -> None:
+    text_path = tmp_path / "notes.txt"
+    raw = ("línea número uno\n" * 10 + "\n\n" + "ü" * 120 + "\nlast line\n").encode("utf-8")
+    text_path.write_bytes(raw)
+
+    parts = list(iter_streamable_chunks(str(text_path), "text/plain", chunk_size=50))
+
+    for part in parts:
+        assert raw[part.byte_start : part.byte_end].decode("utf-8").strip() == part.text
+        assert part.resume_offset == part.byte_end
+    # The 240-byte line without spaces is cut on character boundaries into bounded pieces.
+    assert all(part.byte_end - part.byte_start <= 100 for part in parts)
+    assert "ü" * 120 + "\nlast line" in "".join(part.text for part in parts)
+    assert parts[-1].byte_end == len(raw)
+    # Reading in small blocks, and resuming mid-file, cut exactly the same chunks.
+    monkeypatch.setattr(documents_module, "_TEXT_READ_BYTES", 7)
+    assert list(iter_text_chunks(text_path, 50)) == parts
+    assert list(iter_text_chunks(text_path, 50, start_offset=parts[2].resume_offset)) == parts[3:]
+    # Markdown is not streamed, so it keeps chunk overlap.
+    assert iter_streamable_chunks(str(text_path), "text/markdown", chunk_size=50) is None
+
+    resumed = list(iter_text_chunks(text_path, 50, start_offset=parts[2].resume_offset))
+    assert [part.text for part in resumed] == [part.text for part in parts[3:]]
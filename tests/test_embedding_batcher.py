@@ -0,0 +1,43 @@
+from app.services.embedding_batcher import EmbeddingBatchSizer, estimate_tokens
+
+
+def make_sizer(**overrides) -> EmbeddingBatchSizer:
+    options = {"max_tokens": 100, "max_items": 50, "min_tokens": 10, "target_latency_ms": 1000}
+    options.update(overrides)
+    return EmbeddingBatchSizer(**options)
+
+
+def test_batches_pack_by_token_budget_and_item_limit():
+    sizer = make_sizer(max_items=4)
+    texts = ["x" * 30] * 10  # 10 tokens each
+
+    batches = list(sizer.batches(texts, lambda text: text))
+
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert sum(batches, []) == texts
+
+
+def test_batches_split_before_overflow_and_isolate_oversized_items():
+    sizer = make_sizer()
+    texts = ["a" * 150, "b" * 600, "c" * 150, "d" * 150]
+
+    batches = list(sizer.batches(texts, lambda text: text))
+
+    assert [sum(estimate_tokens(text) for text in batch) for batch in batches] == [50, 200, 100]
+    assert batches[1] == ["b" * 600]
+
+
+def test_budget_shrinks_on_slow_or_failed_requests_and_recovers():
+    sizer = make_sizer()
+
+    sizer.observe(tokens=100, latency_seconds=2.0)
+    assert sizer.token_budget == 50
+    sizer.observe_failure()
+    sizer.observe_failure()
+    sizer.observe_failure()
+    assert sizer.token_budget == 10
+
+    for _ in range(20):
+        sizer.observe(tokens=sizer.token_budget, latency_seconds=0.1)
+    assert sizer.token_budget == 100
+    assert sizer.get_stats()["shrinks"] == 4
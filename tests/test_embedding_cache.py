@@ -0,0 +1,42 @@
+import time
+
+from app.services.embedding_cache import QueryEmbeddingCache
+
+
+def test_cache_normalizes_question_and_stores_float32():
+    cache = QueryEmbeddingCache(max_entries=10, max_bytes=1024 * 1024, ttl_seconds=60)
+    cache.put("embed-model", "What is the  PTO policy?", [0.1, 0.2, 0.3])
+
+    hit = cache.get("embed-model", "  what is the pto POLICY? ")
+
+    assert hit is not None
+    assert abs(hit[0] - 0.1) < 1e-6
+    assert cache.get("other-model", "What is the PTO policy?") is None
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_cache_evicts_least_recently_used_and_expired_entries():
+    cache = QueryEmbeddingCache(max_entries=2, max_bytes=1024 * 1024, ttl_seconds=60)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    cache.get("m", "a")
+    cache.put("m", "c", [3.0])
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0]
+
+    expiring = QueryEmbeddingCache(max_entries=2, max_bytes=1024 * 1024, ttl_seconds=0.01)
+    expiring.put("m", "a", [1.0])
+    time.sleep(0.02)
+    assert expiring.get("m", "a") is None
+    assert expiring.get_stats()["entries"] == 0
+
+
+def test_cache_respects_memory_budget():
+    cache = QueryEmbeddingCache(max_entries=100, max_bytes=8 * 1024, ttl_seconds=60)
+    for index in range(10):
+        cache.put("m", f"question {index}", [0.0] * 512)
+
+    stats = cache.get_stats()
+    assert stats["bytes"] <= 8 * 1024
+    assert stats["entries"] == 3
@@ -0,0 +1,110 @@
+import threading
+
+import httpx
+from openai import APITimeoutError, InternalServerError, RateLimitError
+import pytest
+
+from app.services import embedding_dispatcher
+from app.services.embedding_dispatcher import INGEST_PRIORITY, QUERY_PRIORITY, EmbeddingDispatcher, TokenBucket
+
+
+def test_token_bucket_delays_once_budget_is_spent():
+    bucket = TokenBucket(per_minute=60)
+
+    assert bucket.delay(60, now=bucket._updated) == 0.0
+    bucket.take(60, now=bucket._updated)
+    assert bucket.delay(1, now=bucket._updated) == 1.0
+    assert bucket.delay(1, now=bucket._updated + 1) == 0.0
+    assert TokenBucket(per_minute=0).delay(10**6, now=0.0) == 0.0
+
+
+def test_query_embeddings_are_dispatched_before_queued_ingestion():
+    dispatcher = EmbeddingDispatcher(concurrency=1, requests_per_minute=0, tokens_per_minute=0, max_retries=0)
+    release = threading.Event()
+    order: list[str] = []
+    try:
+        blocker = dispatcher.submit(release.wait, tokens=1, priority=INGEST_PRIORITY)
+        futures = [
+            dispatcher.submit(lambda name=name: order.append(name), tokens=1, priority=priority)
+            for name, priority in [("bulk-1", INGEST_PRIORITY), ("bulk-2", INGEST_PRIORITY), ("query", QUERY_PRIORITY)]
+        ]
+        release.set()
+        blocker.result(timeout=5)
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        dispatcher.close()
+
+    assert order == ["query", "bulk-1", "bulk-2"]
+
+
+def test_rate_limited_requests_are_retried_after_retry_after():
+    dispatcher = EmbeddingDispatcher(concurrency=2, requests_per_minute=0, tokens_per_minute=0, max_retries=2)
+    attempts: list[int] = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            response = httpx.Response(
+                429, headers={"retry-after-ms": "20"}, request=httpx.Request("POST", "https://api.test/embeddings")
+            )
+            raise RateLimitError("rate limited", response=response, body=None)
+        return [[0.1]]
+
+    try:
+        assert dispatcher.submit(call, tokens=1).result(timeout=5) == [[0.1]]
+        stats = dispatcher.get_stats()
+    finally:
+        dispatcher.close()
+
+    assert len(attempts) == 2
+    assert stats["rate_limited"] == 1
+    assert stats["completed"] == 1
+
+
+def _request() -> httpx.Request:
+    return httpx.Request("POST", "https://api.test/embeddings")
+
+
+def test_transient_errors_are_retried_without_sdk_retries(monkeypatch):
+    monkeypatch.setattr(embedding_dispatcher, "_TRANSIENT_BACKOFF_SECONDS", 0.0)
+    dispatcher = EmbeddingDispatcher(concurrency=1, requests_per_minute=0, tokens_per_minute=0, max_retries=0)
+    errors = [
+        InternalServerError("boom", response=httpx.Response(500, request=_request()), body=None),
+        APITimeoutError(request=_request()),
+    ]
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return [[0.1]]
+
+    try:
+        assert dispatcher.submit(call, tokens=1).result(timeout=5) == [[0.1]]
+        stats = dispatcher.get_stats()
+    finally:
+        dispatcher.close()
+
+    assert stats["transient_retries"] == 2
+    assert stats["rate_limited"] == 0
+
+
+def test_insufficient_quota_fails_without_requeue_or_cooldown():
+    dispatcher = EmbeddingDispatcher(concurrency=1, requests_per_minute=0, tokens_per_minute=0, max_retries=5)
+    attempts: list[int] = []
+
+    def call():
+        attempts.append(1)
+        response = httpx.Response(429, headers={"retry-after": "30"}, request=_request())
+        raise RateLimitError("quota", response=response, body={"code": "insufficient_quota"})
+
+    try:
+        with pytest.raises(RateLimitError):
+            dispatcher.submit(call, tokens=1).result(timeout=5)
+        stats = dispatcher.get_stats()
+    finally:
+        dispatcher.close()
+
+    assert len(attempts) == 1
+    assert stats["cooldown_ms"] == 0
+    assert stats["failed"] == 1
@@ -0,0 +1,63 @@
+import time
+
+from docx import Document
+import pytest
+
+from app.services.extraction_pool import ExtractionPool
+from app.utils.documents import extract_text_from_file
+
+
+def hang_on_slow_files(path: str, content_type: str | None) -> str:
+    if "slow" in path:
+        time.sleep(60)
+    return f"text of {path}"
+
+
+def allocate_too_much(path: str, content_type: str | None) -> str:
+    if "huge" in path:
+        return "x" * (1024 * 1024 * 1024)
+    return "small"
+
+
+def test_pool_extracts_documents_in_worker_processes(tmp_path):
+    doc_path = tmp_path / "sample.docx"
+    doc = Document()
+    doc.add_paragraph("Hello from a worker process")
+    doc.save(doc_path)
+    pool = ExtractionPool(workers=2, timeout_seconds=60, memory_limit_mb=0)
+    try:
+        assert pool.extract(str(doc_path), None) == extract_text_from_file(str(doc_path), None)
+        with pytest.raises(ValueError, match="^File not found$"):
+            pool.extract(str(tmp_path / "missing.pdf"), None)
+        stats = pool.get_stats()
+    finally:
+        pool.close()
+
+    assert stats["completed"] == 1
+    assert stats["failed"] == 1
+    # A parser error is reported without discarding the worker process.
+    assert stats["processes"] == 1
+
+
+def test_pool_kills_workers_that_exceed_time_or_memory_limits():
+    # The limit also covers starting the replacement worker, which can take over a second on a busy machine.
+    pool = ExtractionPool(workers=1, timeout_seconds=5, memory_limit_mb=512, extract_fn=hang_on_slow_files)
+    try:
+        started = time.perf_counter()
+        with pytest.raises(ValueError, match="timed out"):
+            pool.extract("slow.pdf", None)
+        assert time.perf_counter() - started < 20
+        # The replacement worker serves the next document.
+        assert pool.extract("fast.pdf", None) == "text of fast.pdf"
+        stats = pool.get_stats()
+    finally:
+        pool.close()
+    assert stats["timed_out"] == 1
+
+    pool = ExtractionPool(workers=1, timeout_seconds=60, memory_limit_mb=512, extract_fn=allocate_too_much)
+    try:
+        with pytest.raises(ValueError, match="memory limit"):
+            pool.extract("huge.pdf", None)
+        assert pool.extract("ok.pdf", None) == "small"
+    finally:
+        pool.close()
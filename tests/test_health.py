@@ -2,3 +2,9 @@ def test_health(client):
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_metrics_exposes_db_pool(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "checkouts" in response.json()["db_pool"]
@@ -21,18 +21,18 @@ class FakeIngestion:
 
 
 class FakeIngestionService:
-    def ingest(self, knowledge_base_id: UUID, user_id: UUID | None = None):
+    def enqueue(self, knowledge_base_id: UUID, user_id: UUID | None = None):
         return FakeIngestion(
             id=uuid4(),
             knowledge_base_id=knowledge_base_id,
             user_id=user_id,
-            status="completed",
+            status="processing",
             error_message=None,
-            documents_processed=1,
-            chunks_created=3,
-            duration_ms=123,
+            documents_processed=0,
+            chunks_created=0,
+            duration_ms=None,
             created_at=datetime.now(timezone.utc),
-            finished_at=datetime.now(timezone.utc),
+            finished_at=None,
         )
 
 
@@ -49,4 +49,4 @@ def test_ingest(client, monkeypatch):
 
     assert response.status_code == 202
     data = response.json()
-    assert data["status"] == "completed"
+    assert data["status"] == "processing"
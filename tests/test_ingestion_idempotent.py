@@ -1,24 +1,34 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
+import os
+import threading
 from typing import Iterable
 from uuid import UUID, uuid4
 
+from docx import Document as DocxDocument
 from fastapi import UploadFile
+from pypdf import PdfWriter
+import pytest
 
 from app.core.config import Settings
 from app.models.chunk import Chunk
 from app.models.document import Document
 from app.services.document_service import DocumentService
-from app.services.ingestion_service import IngestionService
+from app.services.embedding_batcher import EmbeddingBatchSizer
+from app.services import ingestion_service as ingestion_module
+from app.services.ingestion_service import IngestCancelled, IngestionRepositories, IngestionService
+from app.utils.hashing import sha256_bytes
 
 
 @dataclass
 class FakeKnowledgeBase:
     id: UUID
     name: str = "KB"
+    content_version: int = 0
 
 
 class FakeKnowledgeBaseRepo:
@@ -28,6 +38,11 @@ class FakeKnowledgeBaseRepo:
     def get(self, knowledge_base_id: UUID):
         return self.items.get(knowledge_base_id)
 
+    def bump_content_version(self, knowledge_base_id: UUID) -> None:
+        item = self.items.get(knowledge_base_id)
+        if item:
+            item.content_version += 1
+
 
 class FakeDocumentRepo:
     def __init__(self) -> None:
@@ -61,11 +76,44 @@ class FakeDocumentRepo:
     def delete(self, document: Document) -> None:
         self.items.pop(document.id, None)
 
-    def update_ingestion_state(self, document_id: UUID, content_hash: str, last_ingested_at: datetime) -> None:
+    def update_ingestion_state(
+        self,
+        document_id: UUID,
+        content_hash: str,
+        last_ingested_at: datetime,
+        file_fingerprint: str | None = None,
+        file_metadata: dict | None = None,
+    ) -> None:
         doc = self.items.get(document_id)
         if doc:
+            if file_metadata is not None:
+                doc.file_metadata = file_metadata
             doc.content_hash = content_hash
             doc.last_ingested_at = last_ingested_at
+            doc.file_fingerprint = file_fingerprint
+            doc.content_verified_at = last_ingested_at
+            doc.ingest_checkpoint_hash = None
+            doc.ingest_checkpoint_offset = None
+            doc.ingest_checkpoint_chunk_index = None
+
+    def mark_content_verified(self, document_id: UUID, file_fingerprint: str, verified_at: datetime) -> None:
+        doc = self.items[document_id]
+        doc.file_fingerprint = file_fingerprint
+        doc.content_verified_at = verified_at
+
+    def save_ingest_checkpoint(
+        self,
+        document_id: UUID,
+        content_hash: str | None,
+        offset: int,
+        chunk_index: int,
+        file_fingerprint: str | None = None,
+    ) -> None:
+        doc = self.items[document_id]
+        doc.ingest_checkpoint_hash = content_hash
+        doc.ingest_checkpoint_offset = offset
+        doc.ingest_checkpoint_chunk_index = chunk_index
+        doc.file_fingerprint = file_fingerprint
 
 
 class FakeChunkRepo:
@@ -73,14 +121,33 @@ class FakeChunkRepo:
         self.by_id: dict[UUID, Chunk] = {}
         self.by_document: dict[UUID, list[Chunk]] = {}
 
-    def create_many(self, chunks: list[Chunk]) -> None:
+    def create_many(self, chunks: list[Chunk], commit: bool = True) -> None:
         for chunk in chunks:
             self.by_id[chunk.id] = chunk
             self.by_document.setdefault(chunk.document_id, []).append(chunk)
 
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
     def list_ids_by_document(self, document_id: UUID) -> list[UUID]:
         return [chunk.id for chunk in self.by_document.get(document_id, [])]
 
+    def list_positions_by_document(self, document_id: UUID, from_position: int = 0) -> list[tuple[UUID, int]]:
+        return [
+            (chunk.id, chunk.position)
+            for chunk in self.by_document.get(document_id, [])
+            if chunk.position >= from_position
+        ]
+
+    def delete_many(self, chunk_ids: list[str], commit: bool = True) -> None:
+        for chunk_id in chunk_ids:
+            chunk = self.by_id.pop(UUID(str(chunk_id)), None)
+            if chunk is not None:
+                self.by_document[chunk.document_id].remove(chunk)
+
     def delete_by_document(self, document_id: UUID) -> None:
         for chunk in self.by_document.get(document_id, []):
             self.by_id.pop(chunk.id, None)
@@ -120,6 +187,11 @@ class FakeIngestRunRepo:
         self.items[run.id] = run
         return run
 
+    def update_progress(self, run_id: UUID, documents_processed: int, chunks_created: int) -> None:
+        run = self.items[run_id]
+        run.documents_processed = documents_processed
+        run.chunks_created = chunks_created
+
     def complete(
         self,
         run_id: UUID,
@@ -142,10 +214,50 @@ class FakeIngestRunRepo:
 
 
 class FakeOpenAIService:
+    def __init__(self) -> None:
+        self.embedded: list[str] = []
+
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
         return [[0.1, 0.2, 0.3] for _ in texts]
 
 
+class FailingOpenAIService(FakeOpenAIService):
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        if any("broken" in text for text in texts):
+            raise RuntimeError("embedding failed")
+        return super().embed_texts(texts)
+
+
+class FlakyOpenAIService(FakeOpenAIService):
+    def __init__(self, fail_on_call: int) -> None:
+        super().__init__()
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("transient OpenAI error")
+        return super().embed_texts(texts)
+
+
+class FakeChunkEmbeddingRepo:
+    def __init__(self) -> None:
+        self.items: dict[tuple[str, str], list[float]] = {}
+        self.commits = 0
+
+    def get_many(self, embed_model: str, chunk_hashes: list[str]) -> dict[str, list[float]]:
+        return {h: self.items[(embed_model, h)] for h in chunk_hashes if (embed_model, h) in self.items}
+
+    def put_many(self, embed_model: str, embeddings: dict[str, list[float]], dtype: str = "float32") -> None:
+        for chunk_hash, vector in embeddings.items():
+            self.items[(embed_model, chunk_hash)] = vector
+
+    def commit(self) -> None:
+        self.commits += 1
+
+
 class FakeVectorStore:
     def __init__(self) -> None:
         self.ids_by_kb: dict[str, set[UUID]] = {}
@@ -161,12 +273,23 @@ class FakeVectorStore:
         self.delete_calls.append(ids)
         store = self.ids_by_kb.setdefault(knowledge_base_id, set())
         for chunk_id in ids:
-            store.discard(chunk_id)
+            store.discard(UUID(str(chunk_id)))
 
     def get_ids(self, knowledge_base_id: UUID) -> set[UUID]:
         return set(self.ids_by_kb.get(str(knowledge_base_id), set()))
 
 
+class FailingDeleteVectorStore(FakeVectorStore):
+    def __init__(self) -> None:
+        super().__init__()
+        self.fail_deletes = False
+
+    def delete_embeddings(self, knowledge_base_id: str, ids: list[UUID]) -> None:
+        if self.fail_deletes:
+            raise RuntimeError("chroma unavailable")
+        super().delete_embeddings(knowledge_base_id, ids)
+
+
 def test_ingestion_idempotent_and_delete_cleans(tmp_path):
     settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt")
     kb_id = uuid4()
@@ -229,3 +352,554 @@ def test_ingestion_idempotent_and_delete_cleans(tmp_path):
     # Ensure vector delete was called with the correct IDs
     assert vector_store.delete_calls
     assert set(vector_store.delete_calls[-1]) == set(chunk_ids_first)
+
+
+def test_reingest_only_embeds_changed_chunks(tmp_path):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt", chunk_size=10)
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    openai = FakeOpenAIService()
+    vector_store = FakeVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    lines = [f"paragraph number {index}" for index in range(20)]
+    document = document_service.upload(
+        kb_id, UploadFile(filename="notes.txt", file=BytesIO("\n".join(lines).encode("utf-8")))
+    )
+    ingestion_service = IngestionService(
+        settings,
+        kb_repo,
+        document_repo,
+        chunk_repo,
+        FakeIngestRunRepo(),
+        openai,
+        vector_store,
+        FakeChunkEmbeddingRepo(),
+    )
+
+    ingestion_service.ingest(kb_id)
+    assert len(openai.embedded) == 20
+
+    lines[7] = "an edited paragraph"
+    with open(document.storage_path, "w", encoding="utf-8") as handle:
+        handle.write("\n".join(lines))
+    openai.embedded.clear()
+    vector_store.add_calls.clear()
+    ingestion_service.ingest(kb_id)
+
+    assert openai.embedded == ["an edited paragraph"]
+    assert chunk_repo.count_by_document(document.id) == 20
+    # Only the edited chunk is rewritten; the other 19 keep their rows and vectors.
+    assert sum(len(ids) for ids in vector_store.add_calls) == 1
+    assert len(vector_store.delete_calls) == 1 and len(vector_store.delete_calls[0]) == 1
+    assert vector_store.get_ids(kb_id) == set(chunk_repo.list_ids_by_document(document.id))
+
+
+def test_failed_vector_delete_keeps_document_pending(tmp_path):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt", chunk_size=10)
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    vector_store = FailingDeleteVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    lines = [f"paragraph number {index}" for index in range(5)]
+    document = document_service.upload(
+        kb_id, UploadFile(filename="notes.txt", file=BytesIO("\n".join(lines).encode("utf-8")))
+    )
+    ingestion_service = IngestionService(
+        settings, kb_repo, document_repo, chunk_repo, FakeIngestRunRepo(), FakeOpenAIService(), vector_store
+    )
+    ingestion_service.ingest(kb_id)
+    ingested_hash = document.content_hash
+
+    lines[2] = "an edited paragraph"
+    with open(document.storage_path, "w", encoding="utf-8") as handle:
+        handle.write("\n".join(lines))
+    vector_store.fail_deletes = True
+    run = ingestion_service.ingest(kb_id)
+
+    # The delete runs before the commit, so neither the checkpoint nor the content hash moved on
+    # and the next run reconciles the document again.
+    assert run.status == "failed"
+    assert document.content_hash == ingested_hash
+    assert document.ingest_checkpoint_offset is None
+
+
+def test_failed_non_streamed_ingest_leaves_no_orphaned_vectors(tmp_path):
+    settings = Settings(
+        storage_path=str(tmp_path), allowed_file_types="md", chunk_size=20, extract_process_pool_enabled=False
+    )
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    vector_store = FakeVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    document = document_service.upload(
+        kb_id, UploadFile(filename="notes.md", file=BytesIO(" ".join(f"word{i:02d}" for i in range(20)).encode()))
+    )
+    written = threading.Event()
+
+    class WaitingVectorStore(FakeVectorStore):
+        def add_embeddings(self, knowledge_base_id: str, chunks: list[Chunk], embeddings, filename: str) -> None:
+            super().add_embeddings(knowledge_base_id, chunks, embeddings, filename)
+            if len(self.add_calls) == 3:
+                written.set()
+
+    class LateFailingOpenAIService(FlakyOpenAIService):
+        def embed_texts(self, texts: list[str]) -> list[list[float]]:
+            if self.calls + 1 == self.fail_on_call:
+                # Fail only once the earlier batches have reached the vector store.
+                written.wait(5)
+            return super().embed_texts(texts)
+
+    # Markdown is extracted whole, so its rows only commit at the end, after every batch's vectors.
+    vector_store = WaitingVectorStore()
+    ingestion_service = IngestionService(
+        settings,
+        kb_repo,
+        document_repo,
+        chunk_repo,
+        FakeIngestRunRepo(),
+        LateFailingOpenAIService(fail_on_call=4),
+        vector_store,
+        batch_sizer=EmbeddingBatchSizer(max_tokens=1000, max_items=1, min_tokens=1000, target_latency_ms=0),
+    )
+
+    assert ingestion_service.ingest(kb_id).status == "failed"
+    assert len(vector_store.add_calls) == 3
+    assert vector_store.get_ids(kb_id) == set()
+
+    with open(document.storage_path, "w", encoding="utf-8") as handle:
+        handle.write(" ".join(f"edited{i:02d}" for i in range(20)))
+    assert ingestion_service.ingest(kb_id).status == "completed"
+
+    assert vector_store.get_ids(kb_id) == set(chunk_repo.list_ids_by_document(document.id))
+
+
+def test_parallel_ingest_isolates_document_failures(tmp_path):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt", ingest_embed_workers=4)
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    ingest_run_repo = FakeIngestRunRepo()
+    vector_store = FakeVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    documents = [
+        document_service.upload(
+            kb_id, UploadFile(filename=f"doc{index}.txt", file=BytesIO(f"document {index}".encode("utf-8")))
+        )
+        for index in range(8)
+    ]
+    broken = document_service.upload(kb_id, UploadFile(filename="broken.txt", file=BytesIO(b"a broken document")))
+
+    @contextmanager
+    def scope():
+        yield IngestionRepositories(document_repo, chunk_repo, None)
+
+    ingestion_service = IngestionService(
+        settings,
+        kb_repo,
+        document_repo,
+        chunk_repo,
+        ingest_run_repo,
+        FailingOpenAIService(),
+        vector_store,
+        repository_scope=scope,
+    )
+
+    run = ingestion_service.ingest(kb_id)
+
+    assert run.status == "failed"
+    assert run.error_message.startswith("1 of 9 documents failed: broken.txt")
+    assert run.documents_processed == 8
+    assert run.chunks_created == 8
+    assert all(chunk_repo.count_by_document(document.id) == 1 for document in documents)
+    assert document_repo.get(broken.id).last_ingested_at is None
+    assert kb_repo.get(kb_id).content_version == 1
+
+
+def test_parallel_ingest_drops_vectors_of_a_document_failing_after_several_batches(tmp_path):
+    settings = Settings(
+        storage_path=str(tmp_path),
+        allowed_file_types="md",
+        chunk_size=20,
+        ingest_embed_workers=3,
+        extract_process_pool_enabled=False,
+    )
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, FakeVectorStore(), settings)
+    healthy = [
+        document_service.upload(kb_id, UploadFile(filename=f"doc{index}.md", file=BytesIO(f"doc {index}".encode())))
+        for index in range(3)
+    ]
+    text = " ".join(f"word{index:02d}" for index in range(12)) + " broken"
+    document_service.upload(kb_id, UploadFile(filename="long.md", file=BytesIO(text.encode())))
+    written = threading.Event()
+
+    class WaitingVectorStore(FakeVectorStore):
+        def __init__(self) -> None:
+            super().__init__()
+            self.long_batches = 0
+
+        def add_embeddings(self, knowledge_base_id: str, chunks: list[Chunk], embeddings, filename: str) -> None:
+            super().add_embeddings(knowledge_base_id, chunks, embeddings, filename)
+            if filename == "long.md":
+                self.long_batches += 1
+                if self.long_batches == 3:
+                    written.set()
+
+    class LateFailingOpenAIService(FailingOpenAIService):
+        def embed_texts(self, texts: list[str]) -> list[list[float]]:
+            if any("broken" in text for text in texts):
+                # The pipeline has written several of this document's batches by now.
+                written.wait(5)
+            return super().embed_texts(texts)
+
+    @contextmanager
+    def scope():
+        yield IngestionRepositories(document_repo, chunk_repo, None)
+
+    vector_store = WaitingVectorStore()
+    ingestion_service = IngestionService(
+        settings,
+        kb_repo,
+        document_repo,
+        chunk_repo,
+        FakeIngestRunRepo(),
+        LateFailingOpenAIService(),
+        vector_store,
+        repository_scope=scope,
+        batch_sizer=EmbeddingBatchSizer(max_tokens=1000, max_items=1, min_tokens=1000, target_latency_ms=0),
+    )
+
+    run = ingestion_service.ingest(kb_id)
+
+    assert run.error_message.startswith("1 of 4 documents failed: long.md")
+    assert written.is_set()
+    healthy_ids = {chunk_id for document in healthy for chunk_id in chunk_repo.list_ids_by_document(document.id)}
+    assert vector_store.get_ids(kb_id) == healthy_ids
+
+
+def test_cancelled_ingest_stops_before_writing_and_leaves_the_run_alone(tmp_path):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt", chunk_size=10)
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    ingest_run_repo = FakeIngestRunRepo()
+    vector_store = FakeVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    first = document_service.upload(
+        kb_id, UploadFile(filename="first.txt", file=BytesIO(b"paragraph one\nparagraph two"))
+    )
+    second = document_service.upload(kb_id, UploadFile(filename="second.txt", file=BytesIO(b"another one")))
+    cancel = threading.Event()
+
+    class CancellingOpenAIService(FakeOpenAIService):
+        def embed_texts(self, texts: list[str]) -> list[list[float]]:
+            # The lease is lost while the first batch is being embedded.
+            cancel.set()
+            return super().embed_texts(texts)
+
+    ingestion_service = IngestionService(
+        settings, kb_repo, document_repo, chunk_repo, ingest_run_repo, CancellingOpenAIService(), vector_store
+    )
+
+    with pytest.raises(IngestCancelled):
+        ingestion_service.ingest(kb_id, cancel=cancel)
+
+    assert vector_store.add_calls == []
+    assert chunk_repo.count_by_document(first.id) == 0
+    assert document_repo.get(second.id).last_ingested_at is None
+    assert [run.status for run in ingest_run_repo.list()] == ["running"]
+
+
+def test_embed_stage_uses_its_own_repository_scope(tmp_path):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt", ingest_embed_workers=2)
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    vector_store = FakeVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    for index in range(3):
+        document_service.upload(
+            kb_id, UploadFile(filename=f"doc{index}.txt", file=BytesIO(f"document {index}".encode("utf-8")))
+        )
+    cache_repos: list[FakeChunkEmbeddingRepo] = []
+
+    @contextmanager
+    def scope():
+        cache_repos.append(FakeChunkEmbeddingRepo())
+        yield IngestionRepositories(document_repo, chunk_repo, cache_repos[-1])
+
+    ingestion_service = IngestionService(
+        settings,
+        kb_repo,
+        document_repo,
+        chunk_repo,
+        FakeIngestRunRepo(),
+        FakeOpenAIService(),
+        vector_store,
+        repository_scope=scope,
+    )
+    run = ingestion_service.ingest(kb_id)
+
+    assert run.status == "completed"
+    # One scope per document worker plus one per embed stage; only the latter touch the cache.
+    assert len(cache_repos) == 6
+    used = [repo for repo in cache_repos if repo.items]
+    assert len(used) == 3
+    assert all(repo.commits == 1 for repo in used)
+
+
+def test_streamed_ingest_resumes_from_checkpoint(tmp_path):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt", chunk_size=10)
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    vector_store = FakeVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    lines = [f"row number {index:02d}" for index in range(12)]
+    document = document_service.upload(
+        kb_id, UploadFile(filename="big.txt", file=BytesIO("\r\n".join(lines).encode("utf-8")))
+    )
+    openai = FlakyOpenAIService(fail_on_call=4)
+    ingestion_service = IngestionService(
+        settings,
+        kb_repo,
+        document_repo,
+        chunk_repo,
+        FakeIngestRunRepo(),
+        openai,
+        vector_store,
+        batch_sizer=EmbeddingBatchSizer(max_tokens=1000, max_items=2, min_tokens=1000, target_latency_ms=0),
+    )
+
+    first = ingestion_service.ingest(kb_id)
+    assert first.status == "failed"
+    resume_index = document.ingest_checkpoint_chunk_index
+    assert resume_index and resume_index % 2 == 0
+    assert document.ingest_checkpoint_offset == len("\r\n".join(lines[:resume_index]).encode("utf-8")) + 2
+
+    openai.embedded.clear()
+    second = ingestion_service.ingest(kb_id)
+
+    assert second.status == "completed"
+    assert openai.embedded == lines[resume_index:]
+    assert sorted(chunk.text for chunk in chunk_repo.by_document[document.id]) == lines
+    assert vector_store.get_ids(kb_id) == set(chunk_repo.list_ids_by_document(document.id))
+    assert document.ingest_checkpoint_offset is None
+
+
+def test_resume_never_starts_inside_an_oversized_block(tmp_path):
+    settings = Settings(
+        storage_path=str(tmp_path), allowed_file_types="docx", chunk_size=40, extract_process_pool_enabled=False
+    )
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    vector_store = FakeVectorStore()
+    docx = DocxDocument()
+    docx.add_paragraph("Short opening paragraph.")
+    docx.add_paragraph(" ".join(f"word{index:02d}" for index in range(30)))
+    buffer = BytesIO()
+    docx.save(buffer)
+    buffer.seek(0)
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    document = document_service.upload(kb_id, UploadFile(filename="report.docx", file=buffer))
+    openai = FlakyOpenAIService(fail_on_call=4)
+    ingestion_service = IngestionService(
+        settings,
+        kb_repo,
+        document_repo,
+        chunk_repo,
+        FakeIngestRunRepo(),
+        openai,
+        vector_store,
+        batch_sizer=EmbeddingBatchSizer(max_tokens=1000, max_items=1, min_tokens=1000, target_latency_ms=0),
+    )
+
+    assert ingestion_service.ingest(kb_id).status == "failed"
+    # Windows of the long paragraph were written, but the checkpoint stays at the block boundary.
+    assert (document.ingest_checkpoint_offset, document.ingest_checkpoint_chunk_index) == (1, 1)
+
+    assert ingestion_service.ingest(kb_id).status == "completed"
+    texts = [chunk.text for chunk in sorted(chunk_repo.by_document[document.id], key=lambda chunk: chunk.position)]
+    assert texts[0] == "Short opening paragraph."
+    assert len(texts) == len(set(texts))
+    assert vector_store.get_ids(kb_id) == set(chunk_repo.list_ids_by_document(document.id))
+
+
+def test_upload_hash_is_reused_by_first_ingest(tmp_path, monkeypatch):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt")
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    vector_store = FakeVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    document = document_service.upload(kb_id, UploadFile(filename="notes.txt", file=BytesIO(b"hello world")))
+
+    assert document.size_bytes == 11
+    assert document.content_hash == sha256_bytes(b"hello world")
+
+    def fail_sha256_file(path: str) -> str:
+        raise AssertionError("uploaded file was hashed again")
+
+    monkeypatch.setattr(ingestion_module, "sha256_file", fail_sha256_file)
+    ingestion_service = IngestionService(
+        settings, kb_repo, document_repo, chunk_repo, FakeIngestRunRepo(), FakeOpenAIService(), vector_store
+    )
+    run = ingestion_service.ingest(kb_id)
+
+    assert run.status == "completed"
+    assert run.documents_processed == 1
+    assert document.last_ingested_at is not None
+
+
+def test_stat_fingerprint_skips_hashing_until_file_is_touched(tmp_path, monkeypatch):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt")
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    openai = FakeOpenAIService()
+    vector_store = FakeVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    document = document_service.upload(kb_id, UploadFile(filename="notes.txt", file=BytesIO(b"hello world")))
+    ingestion_service = IngestionService(
+        settings, kb_repo, document_repo, chunk_repo, FakeIngestRunRepo(), openai, vector_store
+    )
+    ingestion_service.ingest(kb_id)
+    assert document.file_fingerprint
+    assert kb_repo.get(kb_id).content_version == 1
+
+    hashed: list[str] = []
+    real_sha256_file = ingestion_module.sha256_file
+
+    def counting_sha256_file(path: str) -> str:
+        hashed.append(path)
+        return real_sha256_file(path)
+
+    monkeypatch.setattr(ingestion_module, "sha256_file", counting_sha256_file)
+    ingestion_service.ingest(kb_id)
+    assert hashed == []
+
+    # Touched but identical: re-hashed, recognised as unchanged, nothing re-embedded.
+    stat = os.stat(document.storage_path)
+    os.utime(document.storage_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    openai.embedded.clear()
+    run = ingestion_service.ingest(kb_id)
+    assert hashed == [document.storage_path]
+    assert openai.embedded == []
+    assert run.documents_processed == 0
+    assert kb_repo.get(kb_id).content_version == 1
+    assert document.file_fingerprint.endswith(f":{stat.st_mtime_ns + 1_000_000_000}:{stat.st_ino}")
+
+    # A due deep verify re-hashes even though the fingerprint matches.
+    document.content_verified_at = datetime.utcnow() - timedelta(hours=2)
+    deep_service = IngestionService(
+        settings.model_copy(update={"ingest_deep_verify_hours": 1}),
+        kb_repo,
+        document_repo,
+        chunk_repo,
+        FakeIngestRunRepo(),
+        openai,
+        vector_store,
+    )
+    deep_service.ingest(kb_id)
+    assert len(hashed) == 2
+    assert datetime.utcnow() - document.content_verified_at < timedelta(minutes=1)
+
+
+def test_edited_file_is_embedded_before_its_hash_finishes(tmp_path, monkeypatch):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="txt", chunk_size=20)
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    vector_store = FakeVectorStore()
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    document = document_service.upload(
+        kb_id, UploadFile(filename="notes.txt", file=BytesIO(b"first paragraph\nsecond paragraph"))
+    )
+    embedded = threading.Event()
+
+    class SignallingOpenAIService(FakeOpenAIService):
+        def embed_texts(self, texts: list[str]) -> list[list[float]]:
+            embedded.set()
+            return super().embed_texts(texts)
+
+    ingestion_service = IngestionService(
+        settings, kb_repo, document_repo, chunk_repo, FakeIngestRunRepo(), SignallingOpenAIService(), vector_store
+    )
+    ingestion_service.ingest(kb_id)
+    embedded.clear()
+
+    with open(document.storage_path, "w", encoding="utf-8") as handle:
+        handle.write("first paragraph\nan edited paragraph")
+    hash_waits: list[bool] = []
+    real_sha256_file = ingestion_module.sha256_file
+
+    def slow_sha256_file(path: str) -> str:
+        # Only finishes once the edited chunk has reached the embed stage.
+        hash_waits.append(embedded.wait(5))
+        return real_sha256_file(path)
+
+    monkeypatch.setattr(ingestion_module, "sha256_file", slow_sha256_file)
+    run = ingestion_service.ingest(kb_id)
+
+    assert run.status == "completed"
+    assert hash_waits == [True]
+    assert document.content_hash == sha256_bytes(b"first paragraph\nan edited paragraph")
+
+
+def test_ingest_records_the_pdf_page_count_skipped_at_upload(tmp_path):
+    settings = Settings(storage_path=str(tmp_path), allowed_file_types="pdf")
+    kb_id = uuid4()
+
+    kb_repo = FakeKnowledgeBaseRepo([FakeKnowledgeBase(id=kb_id)])
+    document_repo = FakeDocumentRepo()
+    chunk_repo = FakeChunkRepo()
+    vector_store = FakeVectorStore()
+    writer = PdfWriter()
+    for _ in range(2):
+        writer.add_blank_page(width=200, height=200)
+    buffer = BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+    document_service = DocumentService(document_repo, kb_repo, chunk_repo, vector_store, settings)
+    document = document_service.upload(
+        kb_id, UploadFile(filename="scan.pdf", file=buffer, headers={"content-type": "application/pdf"})
+    )
+    assert document.file_metadata is None
+
+    ingestion_service = IngestionService(
+        settings, kb_repo, document_repo, chunk_repo, FakeIngestRunRepo(), FakeOpenAIService(), vector_store
+    )
+    run = ingestion_service.ingest(kb_id)
+
+    assert run.status == "completed"
+    assert document.file_metadata == {"page_count": 2}
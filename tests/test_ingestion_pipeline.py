@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from app.services.ingestion_pipeline import PipelineMetrics, StagedPipeline
+
+
+def test_pipeline_runs_stages_in_order_and_records_stats():
+    metrics = PipelineMetrics()
+    written: list[int] = []
+
+    def double(items):
+        for item in items:
+            yield item * 2
+
+    def batch(items):
+        chunk: list[int] = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == 3:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    StagedPipeline(queue_size=2, metrics=metrics).run(
+        ("extract", range(10)),
+        [("double", double), ("batch", batch)],
+        ("write", written.extend),
+    )
+
+    assert written == [item * 2 for item in range(10)]
+    stats = metrics.snapshot()
+    assert stats["extract"]["items"] == 10
+    assert stats["batch"]["items"] == 4
+    assert stats["write"]["items"] == 4
+
+
+def test_pipeline_overlaps_stages():
+    sink_started = threading.Event()
+    source_saw_sink: list[bool] = []
+
+    def source():
+        yield 0
+        # Only reachable in time if the sink runs while the source is still producing.
+        source_saw_sink.append(sink_started.wait(timeout=5))
+        yield 1
+
+    def passthrough(items):
+        yield from items
+
+    written: list[int] = []
+
+    def write(item: int) -> None:
+        written.append(item)
+        sink_started.set()
+
+    StagedPipeline(queue_size=4, metrics=PipelineMetrics()).run(
+        ("extract", source()),
+        [("embed", passthrough)],
+        ("write", write),
+    )
+
+    assert source_saw_sink == [True]
+    assert written == [0, 1]
+
+
+def test_pipeline_propagates_stage_errors():
+    written: list[int] = []
+
+    def failing(items):
+        for item in items:
+            if item == 3:
+                raise RuntimeError("embedding failed")
+            yield item
+
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        StagedPipeline(queue_size=1, metrics=PipelineMetrics()).run(
+            ("extract", range(100)),
+            [("embed", failing)],
+            ("write", written.append),
+        )
+    assert written == [0, 1, 2][: len(written)]
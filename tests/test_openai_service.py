@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from app.core.config import Settings
+from app.services.embedding_dispatcher import QUERY_PRIORITY, EmbeddingDispatcher
+from app.services.openai_service import HttpPoolMetrics, OpenAIService
+
+
+def test_embed_texts_uses_embed_timeouts_and_counts_requests():
+    metrics = HttpPoolMetrics()
+    seen: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(
+            200,
+            json={
+                "object": "list",
+                "data": [{"object": "embedding", "index": 0, "embedding": [0.1, 0.2]}],
+                "model": "text-embedding-3-small",
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            },
+        )
+
+    http_client = httpx.Client(
+        transport=httpx.MockTransport(handler),
+        event_hooks={"request": [metrics.on_request], "response": [metrics.on_response]},
+    )
+    settings = Settings(
+        openai_api_key="test",
+        openai_connect_timeout_seconds=2.0,
+        openai_embed_read_timeout_seconds=7.0,
+    )
+    service = OpenAIService(settings, client=OpenAI(api_key="test", http_client=http_client, max_retries=0))
+
+    assert service.embed_texts(["hello"]) == [[0.1, 0.2]]
+    assert service.embed_texts(["hello"]) == [[0.1, 0.2]]
+
+    timeout = seen[0].extensions["timeout"]
+    assert timeout["connect"] == 2.0
+    assert timeout["read"] == 7.0
+    stats = metrics.snapshot()
+    assert stats["requests"] == 2
+    assert stats["responses"] == 2
+    assert stats["connections_reused"] == 2
+
+
+def _embedding_response(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        200,
+        json={
+            "object": "list",
+            "data": [{"object": "embedding", "index": 0, "embedding": [0.3]}],
+            "model": "text-embedding-3-small",
+            "usage": {"prompt_tokens": 1, "total_tokens": 1},
+        },
+    )
+
+
+def test_query_embeddings_skip_a_busy_dispatcher_and_use_the_async_client():
+    dispatcher = EmbeddingDispatcher(concurrency=1, requests_per_minute=0, tokens_per_minute=0, max_retries=0)
+    release = threading.Event()
+    busy = dispatcher.submit(release.wait, tokens=100_000)
+    try:
+        service = OpenAIService(
+            Settings(openai_api_key="test"),
+            client=OpenAI(api_key="test", http_client=httpx.Client(transport=httpx.MockTransport(_embedding_response))),
+            async_client=AsyncOpenAI(
+                api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(_embedding_response))
+            ),
+            dispatcher=dispatcher,
+        )
+
+        # The only dispatcher worker is held by an ingest batch; queries still complete.
+        assert asyncio.run(service.aembed_texts(["question"])) == [[0.3]]
+        assert service.embed_texts(["question"], priority=QUERY_PRIORITY) == [[0.3]]
+        assert dispatcher.get_stats()["direct_requests"] == 2
+    finally:
+        release.set()
+        busy.result(timeout=5)
+        dispatcher.close()
@@ -11,7 +11,7 @@ class FakeRagService:
     def __init__(self) -> None:
         self.last_user_id = None
 
-    def query(self, knowledge_base_id: str, payload, user_id=None):
+    async def aquery(self, knowledge_base_id: str, payload, user_id=None):
         self.last_user_id = user_id
         return QueryResponse(
             answer="Answer from docs [1]",
@@ -26,6 +26,12 @@ class FakeRagService:
             ],
         )
 
+    async def astream_query(self, knowledge_base_id: str, payload, user_id=None):
+        yield "sources", []
+        yield "token", "Answer"
+        yield "token", " from docs"
+        yield "done", {"answer": "Answer from docs"}
+
 
 class FakeDb:
     def get(self, model, identity):
@@ -52,6 +58,25 @@ def test_query(client, monkeypatch):
     assert service.last_user_id is None
 
 
+def test_query_stream(client, monkeypatch):
+    service = FakeRagService()
+    client.app.dependency_overrides[get_service] = lambda: service
+    client.app.dependency_overrides[query_route.get_db] = lambda: FakeDb()
+    monkeypatch.setattr(query_route, "require_kb_access", lambda *args, **kwargs: None)
+
+    kb_id = uuid4()
+    response = client.post(
+        f"/api/v1/knowledge-bases/{kb_id}/query/stream",
+        headers={"X-API-Key": "test-key"},
+        json={"question": "What is EKS?", "top_k": 3},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert events == ["event: sources", "event: token", "event: token", "event: done"]
+
+
 def test_query_rbac_blocks(client, monkeypatch):
     service = FakeRagService()
     client.app.dependency_overrides[get_service] = lambda: service
@@ -0,0 +1,237 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import Session
+
+from app.models.document import Document
+from app.models.ingest_run import IngestRun
+from app.models.knowledge_base import KnowledgeBase
+from app.models.knowledge_base_member import KnowledgeBaseMember
+from app.models.query_log import QueryLog
+from app.models.user import User
+from app.repositories.chunk_embedding_repository import ChunkEmbeddingRepository
+from app.repositories.chunk_repository import ChunkRecord, ChunkRepository
+from app.repositories.document_repository import DocumentRepository
+from app.repositories.ingest_job_repository import IngestJobRepository
+from app.repositories.ingest_run_repository import IngestRunRepository
+from app.repositories.knowledge_base_member_repository import KnowledgeBaseMemberRepository
+from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
+from app.repositories.query_log_repository import QueryLogRepository
+
+
+# Must point at a disposable Postgres database: migrations are applied to it and every test
+# runs inside a transaction that is rolled back afterwards.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+ROOT = Path(__file__).resolve().parent.parent
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL.startswith("postgresql"), reason="TEST_DATABASE_URL does not point at Postgres"
+)
+
+KNOWLEDGE_BASES = 20
+DOCUMENTS_PER_KB = 50
+CHUNKS_PER_DOCUMENT = 20
+QUERY_LOGS_PER_KB = 500
+
+
+def _filtered_seq_scans(plan: dict) -> list[str]:
+    # A Seq Scan without a Filter reads the whole table on purpose (list-all, count-all);
+    # one with a Filter means a predicate had no usable index.
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and "Filter" in plan:
+        found.append(f"{plan['Relation Name']}: {plan['Filter']}")
+    for child in plan.get("Plans", []):
+        found.extend(_filtered_seq_scans(child))
+    return found
+
+
+class PlanRecorder:
+    def __init__(self) -> None:
+        self.explained = 0
+        self.violations: list[str] = []
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if executemany or verb not in {"SELECT", "UPDATE", "DELETE"}:
+            return
+        # Plain EXPLAIN plans without executing, on the same cursor and bound parameters.
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = cursor.fetchone()[0][0]["Plan"]
+        self.explained += 1
+        for scan in _filtered_seq_scans(plan):
+            self.violations.append(f"{scan}\n    {' '.join(statement.split())}")
+
+
+@pytest.fixture(scope="module")
+def engine():
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "migrations"))
+    with pytest.MonkeyPatch.context() as patch:
+        # migrations/env.py reads the URL from Settings.
+        patch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+        command.upgrade(config, "head")
+    engine = create_engine(TEST_DATABASE_URL)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    connection = engine.connect()
+    transaction = connection.begin()
+    # Repository commits become savepoint releases, so the seed data is rolled back at the end.
+    session = Session(bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False)
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+def _seed(db: Session) -> dict:
+    user_id = uuid.uuid4()
+    db.execute(insert(User), [{"id": user_id, "email": f"{user_id}@plans.test", "hashed_password": "x"}])
+    kb_ids = [uuid.uuid4() for _ in range(KNOWLEDGE_BASES)]
+    db.execute(
+        insert(KnowledgeBase),
+        [{"id": kb_id, "name": f"kb {index}", "owner_user_id": user_id} for index, kb_id in enumerate(kb_ids)],
+    )
+    db.execute(
+        insert(KnowledgeBaseMember),
+        [{"knowledge_base_id": kb_id, "user_id": user_id, "role": "owner"} for kb_id in kb_ids],
+    )
+    documents = []
+    for kb_id in kb_ids:
+        for index in range(DOCUMENTS_PER_KB):
+            documents.append(
+                {
+                    "id": uuid.uuid4(),
+                    "knowledge_base_id": kb_id,
+                    "filename": f"doc-{index}.txt",
+                    "content_type": "text/plain",
+                    "storage_path": f"/tmp/{kb_id}/doc-{index}.txt",
+                    "size_bytes": 100,
+                }
+            )
+    db.execute(insert(Document), documents)
+    ChunkRepository(db).create_many(
+        [
+            ChunkRecord(uuid.uuid4(), document["id"], position, f"chunk {position}", f"{position:064d}")
+            for document in documents
+            for position in range(CHUNKS_PER_DOCUMENT)
+        ],
+        commit=False,
+    )
+    now = datetime.utcnow()
+    db.execute(
+        insert(QueryLog),
+        [
+            {
+                "knowledge_base_id": kb_id,
+                "query_text": "q",
+                "latency_ms": index,
+                "cost_usd": 0.001,
+                "created_at": now - timedelta(hours=index),
+            }
+            for kb_id in kb_ids
+            for index in range(QUERY_LOGS_PER_KB)
+        ],
+    )
+    db.execute(
+        insert(IngestRun),
+        [
+            {"knowledge_base_id": kb_id, "status": "completed", "finished_at": now - timedelta(days=day)}
+            for kb_id in kb_ids
+            for day in range(10)
+        ],
+    )
+    db.flush()
+    for table in ("users", "knowledge_bases", "knowledge_base_members", "documents", "chunks", "query_logs"):
+        db.execute(text(f"ANALYZE {table}"))
+    return {"user_id": user_id, "kb_ids": kb_ids, "documents": documents}
+
+
+def _exercise_repositories(db: Session, seed: dict) -> None:
+    user_id, kb_ids, documents = seed["user_id"], seed["kb_ids"], seed["documents"]
+    kb_id = kb_ids[0]
+    document_id = documents[0]["id"]
+
+    knowledge_bases = KnowledgeBaseRepository(db)
+    knowledge_bases.list_for_user(user_id)
+    knowledge_bases.get(kb_id)
+    knowledge_bases.bump_content_version(kb_id)
+
+    members = KnowledgeBaseMemberRepository(db)
+    members.get_role(kb_id, user_id)
+    members.list_by_kb(kb_id)
+    members.find_by_user(kb_id, user_id)
+    members.count_owners(kb_id)
+
+    document_repo = DocumentRepository(db)
+    document_repo.list_by_knowledge_base(kb_id)
+    document_repo.get_by_filename(kb_id, "doc-1.txt")
+    document_repo.list_by_filename(kb_id, "doc-1.txt")
+    document_repo.save_ingest_checkpoint(document_id, "0" * 64, 10, 1, "1:2:3")
+    document_repo.update_ingestion_state(document_id, "0" * 64, datetime.utcnow(), "1:2:3")
+    document_repo.mark_content_verified(document_id, "1:2:3", datetime.utcnow())
+
+    chunk_repo = ChunkRepository(db)
+    chunk_ids = chunk_repo.list_ids_by_document(document_id)
+    chunk_repo.list_positions_by_document(document_id, from_position=5)
+    chunk_repo.delete_many(chunk_ids[:5])
+    chunk_repo.delete_by_document(documents[1]["id"])
+    document_repo.delete_by_filename(kb_id, "doc-2.txt")
+    # ORM delete loads the document's chunks through the relationship before cascading.
+    document_repo.delete(document_repo.get(documents[3]["id"]))
+
+    ChunkEmbeddingRepository(db).get_many("text-embedding-3-small", ["0" * 64, "1" * 64])
+
+    query_logs = QueryLogRepository(db)
+    query_logs.list_recent(kb_id, 20)
+    query_logs.aggregate_volume_by_day(kb_id, 7)
+    query_logs.aggregate_latency_by_day(kb_id, 7)
+    query_logs.aggregate_cost_by_day(kb_id, 7)
+    query_logs.aggregate_workspace_overview(user_id, 7)
+
+    runs = IngestRunRepository(db)
+    run = runs.create(kb_id, user_id)
+    runs.update_progress(run.id, 1, 10)
+    runs.complete(run.id, status="completed", documents_processed=1, chunks_created=10, duration_ms=5)
+    runs.reopen(run.id)
+    runs.get(run.id)
+    runs.list_recent(kb_id, 10)
+    runs.get_last_finished_at(knowledge_base_id=kb_id)
+    runs.get_last_finished_at(knowledge_base_ids=kb_ids[:3])
+
+    jobs = IngestJobRepository(db)
+    job = jobs.enqueue(kb_id, run.id, user_id, max_attempts=2)
+    leased = jobs.lease("plans-worker", lease_seconds=60)
+    assert leased is not None and leased.id == job.id
+    jobs.heartbeat(job.id, "plans-worker", lease_seconds=60)
+    jobs.fail(job.id, "plans-worker", "boom", retry_delay_seconds=0)
+    jobs.fail_abandoned()
+    jobs.complete(job.id, "plans-worker")
+
+
+def test_repository_queries_avoid_filtered_sequential_scans(db):
+    seed = _seed(db)
+    # With sequential scans priced out, the planner only falls back to one when no index can
+    # serve the predicate, which makes the check independent of table sizes and statistics.
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+    recorder = PlanRecorder()
+    connection = db.connection()
+    event.listen(connection, "before_cursor_execute", recorder.before_cursor_execute)
+    try:
+        _exercise_repositories(db, seed)
+    finally:
+        event.remove(connection, "before_cursor_execute", recorder.before_cursor_execute)
+
+    assert recorder.explained >= 30
+    assert not recorder.violations, "Sequential scans on filtered queries:\n" + "\n".join(recorder.violations)
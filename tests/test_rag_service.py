@@ -1,7 +1,10 @@
+import asyncio
 from uuid import uuid4
 
 from app.core.config import Settings
 from app.schemas.query import QueryRequest
+from app.services.answer_cache import AnswerCache
+from app.services.embedding_cache import QueryEmbeddingCache
 from app.services.rag_service import RagService
 
 
@@ -11,16 +14,39 @@ class FakeKnowledgeBaseRepo:
 
 
 class FakeOpenAIService:
-    def embed_texts(self, texts):
+    def __init__(self):
+        self.embed_calls = 0
+
+    def embed_texts(self, texts, priority=None):
+        self.embed_calls += 1
         return [[0.1, 0.2, 0.3] for _ in texts]
 
     def generate_answer(self, system_prompt, user_prompt):
         return "Answer"
 
+    async def aembed_texts(self, texts):
+        return self.embed_texts(texts)
+
+    async def agenerate_answer(self, system_prompt, user_prompt):
+        return "Answer [1]", {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+    async def astream_answer(self, system_prompt, user_prompt):
+        yield "token", "Answer"
+        yield "token", " [1]"
+        yield "usage", {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
 
 class FakeVectorStore:
+    def __init__(self, documents=None):
+        self.documents = documents or []
+
     def query(self, knowledge_base_id, embedding, top_k):
-        return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+        metadatas = [{"chunk_id": "c1", "document_id": "d1", "filename": "notes.txt"} for _ in self.documents]
+        distances = [0.25 for _ in self.documents]
+        return {"documents": [self.documents], "metadatas": [metadatas], "distances": [distances]}
+
+    async def aquery(self, knowledge_base_id, embedding, top_k):
+        return self.query(knowledge_base_id, embedding, top_k)
 
 
 class FakeQueryLogRepo:
@@ -49,3 +75,136 @@ def test_rag_service_logs_query():
 
     assert response.answer
     assert len(log_repo.logged) == 1
+
+
+def test_rag_service_aquery_generates_and_logs_timings():
+    settings = Settings(openai_gen_model="gpt-test")
+    log_repo = FakeQueryLogRepo()
+    service = RagService(
+        settings=settings,
+        knowledge_base_repo=FakeKnowledgeBaseRepo(),
+        openai_service=FakeOpenAIService(),
+        vector_store=FakeVectorStore(documents=["EKS is a knowledge service."]),
+        query_log_repo=log_repo,
+    )
+
+    payload = QueryRequest(question="What is EKS?", top_k=3)
+    response = asyncio.run(service.aquery(str(uuid4()), payload, user_id=None))
+
+    assert response.answer == "Answer [1]"
+    assert response.sources[0].score == 0.75
+    log = log_repo.logged[0]
+    assert log.embed_ms is not None
+    assert log.retrieve_ms is not None
+    assert log.generate_ms is not None
+    assert log.total_tokens == 15
+    assert log.retrieved_count == 1
+
+
+def test_rag_service_astream_query_sends_sources_first_and_logs_ttft():
+    settings = Settings(openai_gen_model="gpt-test")
+    log_repo = FakeQueryLogRepo()
+    service = RagService(
+        settings=settings,
+        knowledge_base_repo=FakeKnowledgeBaseRepo(),
+        openai_service=FakeOpenAIService(),
+        vector_store=FakeVectorStore(documents=["EKS is a knowledge service."]),
+        query_log_repo=log_repo,
+    )
+
+    async def collect():
+        payload = QueryRequest(question="What is EKS?", top_k=3)
+        return [event async for event in service.astream_query(str(uuid4()), payload, user_id=None)]
+
+    events = asyncio.run(collect())
+
+    assert [kind for kind, _ in events] == ["sources", "token", "token", "done"]
+    assert events[-1][1]["answer"] == "Answer [1]"
+    log = log_repo.logged[0]
+    assert log.ttft_ms is not None
+    assert log.generate_ms is not None
+    assert log.total_tokens == 15
+
+
+def test_rag_service_reuses_cached_query_embedding():
+    settings = Settings()
+    log_repo = FakeQueryLogRepo()
+    openai = FakeOpenAIService()
+    service = RagService(
+        settings=settings,
+        knowledge_base_repo=FakeKnowledgeBaseRepo(),
+        openai_service=openai,
+        vector_store=FakeVectorStore(),
+        query_log_repo=log_repo,
+        embedding_cache=QueryEmbeddingCache(max_entries=10, max_bytes=1024 * 1024, ttl_seconds=60),
+    )
+
+    kb_id = str(uuid4())
+    service.query(kb_id, QueryRequest(question="What is EKS?", top_k=3), user_id=None)
+    service.query(kb_id, QueryRequest(question="what is  eks?", top_k=3), user_id=None)
+
+    assert openai.embed_calls == 1
+    assert [log.embedding_cache_hit for log in log_repo.logged] == [False, True]
+
+
+class VersionedKnowledgeBase:
+    content_version = 1
+
+
+class VersionedKnowledgeBaseRepo:
+    def __init__(self):
+        self.knowledge_base = VersionedKnowledgeBase()
+
+    def get(self, knowledge_base_id):
+        return self.knowledge_base
+
+
+def test_rag_service_answer_cache_hits_until_content_version_changes():
+    settings = Settings(openai_gen_model="gpt-test")
+    log_repo = FakeQueryLogRepo()
+    openai = FakeOpenAIService()
+    kb_repo = VersionedKnowledgeBaseRepo()
+    service = RagService(
+        settings=settings,
+        knowledge_base_repo=kb_repo,
+        openai_service=openai,
+        vector_store=FakeVectorStore(documents=["EKS is a knowledge service."]),
+        query_log_repo=log_repo,
+        answer_cache=AnswerCache(max_entries=10, ttl_seconds=60),
+    )
+    kb_id = str(uuid4())
+    payload = QueryRequest(question="What is EKS?", top_k=3)
+
+    first = asyncio.run(service.aquery(kb_id, payload, user_id=None))
+    second = asyncio.run(service.aquery(kb_id, QueryRequest(question="what is eks?", top_k=3), user_id=None))
+    kb_repo.knowledge_base.content_version = 2
+    asyncio.run(service.aquery(kb_id, payload, user_id=None))
+
+    assert second == first
+    assert openai.embed_calls == 2
+    assert [log.answer_cache_hit for log in log_repo.logged] == [False, True, False]
+    assert log_repo.logged[1].total_tokens is None
+
+
+def test_rag_service_astream_query_logs_when_client_disconnects():
+    log_repo = FakeQueryLogRepo()
+    service = RagService(
+        settings=Settings(openai_gen_model="gpt-test"),
+        knowledge_base_repo=FakeKnowledgeBaseRepo(),
+        openai_service=FakeOpenAIService(),
+        vector_store=FakeVectorStore(documents=["EKS is a knowledge service."]),
+        query_log_repo=log_repo,
+    )
+
+    async def disconnect_after_first_token():
+        stream = service.astream_query(str(uuid4()), QueryRequest(question="What is EKS?", top_k=3), user_id=None)
+        async for kind, _ in stream:
+            if kind == "token":
+                break
+        await stream.aclose()
+
+    asyncio.run(disconnect_after_first_token())
+
+    assert len(log_repo.logged) == 1
+    assert log_repo.logged[0].error == "Client disconnected"
+    assert log_repo.logged[0].ttft_ms is not None
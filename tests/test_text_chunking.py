@@ -0,0 +1,78 @@
+import os
+import random
+import time
+
+import pytest
+
+from app.utils.hashing import sha256_text
+from app.utils.text import chunk_text, iter_text_windows, normalize_whitespace
+
+
+def _sample_text(words: int, seed: int = 0) -> str:
+    vocabulary = "the quick brown fox jumps over lazy dogs. Revenue grew 12% year over year! Why?\n\n\tcafé".split(" ")
+    rnd = random.Random(seed)
+    return " ".join(rnd.choice(vocabulary) for _ in range(words))
+
+
+def test_windows_end_on_sentence_or_word_boundaries() -> None:
+    text = "First sentence here.  Second one\tfollows   closely. Third   sentence is a bit longer than the rest."
+
+    chunks = list(iter_text_windows([text], chunk_size=30, chunk_overlap=0))
+
+    assert [chunk.text for chunk in chunks] == [
+        "First sentence here.",
+        "Second one follows closely.",
+        "Third sentence is a bit longer",
+        "than the rest.",
+    ]
+    assert all(chunk.hash == sha256_text(chunk.text) for chunk in chunks)
+
+
+def test_windows_overlap_on_whole_words_and_hard_cut_long_words() -> None:
+    chunks = [chunk.text for chunk in iter_text_windows(["alpha beta gamma delta epsilon zeta"], 18, 8)]
+
+    assert chunks == ["alpha beta gamma", "gamma delta", "delta epsilon zeta"]
+    assert [chunk.text for chunk in iter_text_windows(["x" * 25], 10, 0)] == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_streamed_pieces_match_whole_text() -> None:
+    text = _sample_text(5000, seed=3)
+    # Piece edges fall mid-word and mid-whitespace run.
+    pieces = [text[start : start + 997] for start in range(0, len(text), 997)]
+
+    whole = list(iter_text_windows([text], 300, 60))
+    streamed = list(iter_text_windows(iter(pieces), 300, 60))
+
+    assert streamed == whole
+    normalized = normalize_whitespace(text)
+    assert all(0 < len(chunk.text) <= 300 and chunk.text in normalized for chunk in whole)
+    assert normalized.startswith(whole[0].text) and normalized.endswith(whole[-1].text)
+
+
+def _best_of(runs: int, fn) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+# Wall-clock comparisons are noisy on shared CI machines, so this only runs when asked for.
+@pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run timing benchmarks")
+def test_benchmark_single_pass_engine_beats_normalize_and_chunk_text() -> None:
+    # Micro-benchmark on a ~2 MB document: the previous path (regex normalize, window slicing,
+    # then hashing each chunk) against the single-pass engine doing all three.
+    text = _sample_text(350_000)
+    assert len(text) > 2_000_000
+
+    def baseline() -> list[tuple[str, str]]:
+        return [(part, sha256_text(part)) for part in chunk_text(normalize_whitespace(text), 1000, 200)]
+
+    def engine() -> list[tuple[str, str]]:
+        return [(chunk.text, chunk.hash) for chunk in iter_text_windows([text], 1000, 200)]
+
+    baseline_seconds = _best_of(3, baseline)
+    engine_seconds = _best_of(3, engine)
+
+    assert engine_seconds < baseline_seconds, f"engine {engine_seconds:.3f}s vs baseline {baseline_seconds:.3f}s"
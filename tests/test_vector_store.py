@@ -0,0 +1,38 @@
+from app.core.config import Settings
+from app.services import vector_store_service
+from app.services.vector_store_service import VectorStoreService
+
+
+class FakeCollection:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def query(self, query_embeddings, n_results, include):
+        return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+
+class FakeClient:
+    def __init__(self, path: str) -> None:
+        self.lookups: list[str] = []
+
+    def get_or_create_collection(self, name: str) -> FakeCollection:
+        self.lookups.append(name)
+        return FakeCollection(name)
+
+
+def test_collection_handles_are_cached_and_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store_service.chromadb, "PersistentClient", FakeClient)
+    settings = Settings(chroma_path=str(tmp_path), chroma_collection_cache_size=2)
+    service = VectorStoreService(settings)
+
+    service.query("a", [0.1], 3)
+    service.query("a", [0.1], 3)
+    service.query("b", [0.1], 3)
+    service.query("c", [0.1], 3)
+    service.query("a", [0.1], 3)
+
+    assert service._client.lookups == ["kb_a", "kb_b", "kb_c", "kb_a"]
+    stats = service.get_stats()
+    assert stats["collections_cached"] == 2
+    assert stats["collection_hits"] == 1
+    assert stats["collection_misses"] == 4
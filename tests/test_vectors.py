@@ -0,0 +1,9 @@
+from app.utils.vectors import pack_vector, unpack_vector
+
+
+def test_pack_vector_round_trips_float32_and_float16():
+    values = [0.5, -1.25, 3.0]
+
+    assert unpack_vector(pack_vector(values), "float32") == values
+    assert len(pack_vector(values, "float16")) == 6
+    assert unpack_vector(pack_vector(values, "float16"), "float16") == values
@@ -0,0 +1,140 @@
+from dataclasses import dataclass
+import threading
+from uuid import UUID, uuid4
+
+from app import worker as worker_module
+from app.core.config import Settings
+from app.services.ingestion_service import IngestCancelled
+from app.worker import IngestWorker
+
+
+@dataclass
+class FakeRun:
+    status: str
+    error_message: str | None = None
+
+
+@dataclass
+class FakeJob:
+    id: UUID
+    knowledge_base_id: UUID
+    ingest_run_id: UUID
+    user_id: UUID | None
+    attempts: int = 1
+
+
+class FakeSession:
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class FakeJobRepo:
+    queued: list[FakeJob] = []
+    completed: list[UUID] = []
+    failed: list[tuple[UUID, str]] = []
+
+    def __init__(self, db) -> None:
+        pass
+
+    def lease(self, worker_id: str, lease_seconds: float):
+        return self.queued.pop(0) if self.queued else None
+
+    def heartbeat(self, job_id: UUID, worker_id: str, lease_seconds: float) -> bool:
+        return True
+
+    def complete(self, job_id: UUID, worker_id: str) -> None:
+        self.completed.append(job_id)
+
+    def fail(self, job_id: UUID, worker_id: str, error: str, retry_delay_seconds: float) -> bool:
+        self.failed.append((job_id, error))
+        return True
+
+
+class FakeIngestionService:
+    def __init__(self, fail_for: set[UUID], documents_fail_for: set[UUID] = frozenset()) -> None:
+        self.fail_for = fail_for
+        self.documents_fail_for = documents_fail_for
+        self.ingested: list[UUID] = []
+
+    def ingest(
+        self,
+        knowledge_base_id: UUID,
+        user_id: UUID | None = None,
+        run_id: UUID | None = None,
+        cancel: threading.Event | None = None,
+    ):
+        if knowledge_base_id in self.fail_for:
+            raise RuntimeError("storage unavailable")
+        if knowledge_base_id in self.documents_fail_for:
+            return FakeRun("failed", "1 of 2 documents failed: a.pdf: rate limited")
+        self.ingested.append(run_id)
+        return FakeRun("completed")
+
+
+def test_worker_completes_and_retries_leased_jobs(monkeypatch):
+    monkeypatch.setattr(worker_module, "IngestJobRepository", FakeJobRepo)
+    ok_job = FakeJob(id=uuid4(), knowledge_base_id=uuid4(), ingest_run_id=uuid4(), user_id=None)
+    bad_job = FakeJob(id=uuid4(), knowledge_base_id=uuid4(), ingest_run_id=uuid4(), user_id=None)
+    FakeJobRepo.queued = [ok_job, bad_job]
+    FakeJobRepo.completed = []
+    FakeJobRepo.failed = []
+    service = FakeIngestionService({bad_job.knowledge_base_id})
+    worker = IngestWorker(Settings(), FakeSession, service_builder=lambda db, settings: service, worker_id="w1")
+
+    assert worker.run_once() is True
+    assert worker.run_once() is True
+    assert worker.run_once() is False
+
+    assert service.ingested == [ok_job.ingest_run_id]
+    assert FakeJobRepo.completed == [ok_job.id]
+    assert FakeJobRepo.failed == [(bad_job.id, "storage unavailable")]
+
+
+def test_worker_retries_runs_with_failed_documents(monkeypatch):
+    monkeypatch.setattr(worker_module, "IngestJobRepository", FakeJobRepo)
+    job = FakeJob(id=uuid4(), knowledge_base_id=uuid4(), ingest_run_id=uuid4(), user_id=None)
+    FakeJobRepo.queued = [job]
+    FakeJobRepo.completed = []
+    FakeJobRepo.failed = []
+    service = FakeIngestionService(set(), {job.knowledge_base_id})
+    worker = IngestWorker(Settings(), FakeSession, service_builder=lambda db, settings: service, worker_id="w1")
+
+    assert worker.run_once() is True
+
+    assert FakeJobRepo.completed == []
+    assert FakeJobRepo.failed == [(job.id, "1 of 2 documents failed: a.pdf: rate limited")]
+
+
+class LostLeaseJobRepo(FakeJobRepo):
+    def heartbeat(self, job_id: UUID, worker_id: str, lease_seconds: float) -> bool:
+        return False
+
+
+class LeaseWaitingIngestionService:
+    def __init__(self) -> None:
+        self.cancelled = False
+
+    def ingest(self, knowledge_base_id: UUID, user_id=None, run_id=None, cancel: threading.Event | None = None):
+        # Stands in for a long ingest that checks the event between batches.
+        self.cancelled = cancel.wait(5)
+        raise IngestCancelled("Ingest run was cancelled")
+
+
+def test_worker_cancels_ingest_and_records_nothing_when_lease_is_lost(monkeypatch):
+    monkeypatch.setattr(worker_module, "IngestJobRepository", LostLeaseJobRepo)
+    job = FakeJob(id=uuid4(), knowledge_base_id=uuid4(), ingest_run_id=uuid4(), user_id=None)
+    LostLeaseJobRepo.queued = [job]
+    LostLeaseJobRepo.completed = []
+    LostLeaseJobRepo.failed = []
+    service = LeaseWaitingIngestionService()
+    settings = Settings(ingest_job_heartbeat_seconds=0)
+    worker = IngestWorker(settings, FakeSession, service_builder=lambda db, settings: service, worker_id="w1")
+
+    assert worker.run_once() is True
+
+    assert service.cancelled is True
+    assert LostLeaseJobRepo.completed == []
+    assert LostLeaseJobRepo.failed == []